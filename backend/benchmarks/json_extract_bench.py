@@ -0,0 +1,103 @@
+"""Compares the chunked JSON extractor with the previous per-character scan.
+
+Run from the backend directory: python -m benchmarks.json_extract_bench
+"""
+import json
+import random
+import re
+import timeit
+
+from utils.ai.data_format import parseResponseToJson
+from utils.ai.json_extract import JsonObjectExtractor, extract_json_object
+
+
+def legacy_extract(text):
+    start = text.find("{")
+    if start == -1:
+        return None, text
+
+    stack = []
+    end = start
+
+    for i in range(start, len(text)):
+        if text[i] == "{":
+            stack.append("{")
+        elif text[i] == "}":
+            stack.pop()
+            if not stack:
+                end = i
+                break
+
+    if stack:
+        return None, text
+
+    return text[start : end + 1]
+
+
+def legacy_parse(input_str):
+    input_str = re.sub(r"```json|```", "", input_str)
+    json_match = legacy_extract(input_str)
+    if json_match:
+        try:
+            return json.loads(json_match)
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def finance_response(transactions: int) -> str:
+    rng = random.Random(42)
+    categories = ["Food", "Rent", "Travel", "Shopping", "Salary", "Utilities"]
+    data = {
+        "transactions": [
+            {
+                "transaction_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "description": f"UPI/{rng.randint(10**9, 10**10)}/MERCHANT NAME {i}/REF {rng.random()}",
+                "amount": round(rng.uniform(10, 5000), 2),
+                "category": rng.choice(categories),
+                "is_credit": rng.random() < 0.2,
+            }
+            for i in range(transactions)
+        ]
+    }
+    return "```json\n" + json.dumps(data, indent=2) + "\n```"
+
+
+def chunked(text: str, size: int):
+    extractor = JsonObjectExtractor()
+    for i in range(0, len(text), size):
+        if extractor.feed(text[i : i + size]):
+            break
+    return extractor.result
+
+
+def best_of(func, runs: int) -> float:
+    return min(timeit.repeat(func, number=runs, repeat=5)) / runs
+
+
+def main():
+    for transactions in (100, 1000, 5000):
+        text = finance_response(transactions)
+        stripped = re.sub(r"```json|```", "", text)
+        assert extract_json_object(text) == legacy_extract(stripped)
+        assert chunked(text, 256) == legacy_extract(stripped)
+        assert parseResponseToJson(text) == legacy_parse(text)
+
+        runs = max(3, 2000 // transactions)
+        legacy = best_of(lambda: legacy_extract(re.sub(r"```json|```", "", text)), runs)
+        current = best_of(lambda: extract_json_object(text), runs)
+        streamed = best_of(lambda: chunked(text, 256), runs)
+        legacy_full = best_of(lambda: legacy_parse(text), runs)
+        current_full = best_of(lambda: parseResponseToJson(text), runs)
+        print(
+            f"{transactions:>5} transactions ({len(text) / 1024:.0f} KiB) | "
+            f"extract: legacy {legacy * 1000:.2f} ms, "
+            f"current {current * 1000:.2f} ms ({legacy / current:.1f}x), "
+            f"256B chunks {streamed * 1000:.2f} ms | "
+            f"extract+json.loads: legacy {legacy_full * 1000:.2f} ms, "
+            f"current {current_full * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,13 +8,16 @@ logger = logging.getLogger(__name__)
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
 from models.pg_models import Base
 from utils.database.pg_database import engine
 
-from routers import players, habits, tasks, routines, chat, jobs, finance
+from routers import players, habits, tasks, routines, chat, jobs, finance, leaderboard, sync, events
+from utils.database import change_log
 from utils.general import scheduler as app_scheduler
+from utils.general.event_hub import event_hub
 from utils.general.get_env import getenv
 
 app = FastAPI(
@@ -35,9 +38,27 @@ app.add_middleware(
     
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "HEAD", "PATCH"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
 
+
+class ChangeOriginMiddleware:
+    # Plain ASGI so the origin is set in the task that runs the endpoint and
+    # streaming responses are passed through untouched.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            change_log.set_change_origin(headers.get(change_log.CLIENT_ID_HEADER))
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(ChangeOriginMiddleware)
+
+
 app.include_router(players.router)
 app.include_router(habits.router)
 app.include_router(tasks.router)
@@ -45,6 +66,9 @@ app.include_router(routines.router)
 app.include_router(chat.router)
 app.include_router(jobs.router)
 app.include_router(finance.router)
+app.include_router(leaderboard.router)
+app.include_router(sync.router)
+app.include_router(events.router)
 
 
 @app.on_event("startup")
@@ -61,4 +85,5 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Server shutting down...")
-    app_scheduler.stop_scheduler()
+    await app_scheduler.stop_scheduler()
+    await event_hub.stop()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field, validator
 
 
@@ -45,3 +45,10 @@ class UploadResponse(BaseModel):
     added: int
     skipped: int
     failed: int
+
+
+class FinanceUploadStatus(BaseModel):
+    job_id: str
+    status: str
+    result: Optional[UploadResponse] = None
+    error: Optional[str] = None
@@ -10,6 +10,8 @@ from sqlalchemy import (
     Numeric,
     Boolean,
     Date,
+    Integer,
+    Float,
 )
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.dialects.postgresql import UUID, JSONB
@@ -69,3 +71,38 @@ class Transaction(Base):
 
     def __repr__(self):
         return f"<Transaction(id={self.id}, user_id='{self.user_id}', date='{self.transaction_date}', amount={self.amount}, category='{self.category}')>"
+
+
+class JobRunStatus(PyEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_id = Column(String, nullable=False, index=True)
+    job_type = Column(String, nullable=False)
+    queued_job_id = Column(String, nullable=True)
+    status = Column(
+        SQLEnum(JobRunStatus, name="job_run_status_enum"),
+        nullable=False,
+        default=JobRunStatus.QUEUED,
+        index=True,
+    )
+    triggered_by = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    players_processed = Column(Integer, nullable=True)
+    player_errors = Column(JSONB, nullable=True)
+    throughput = Column(Float, nullable=True)
+    stats = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+
+    def __repr__(self):
+        return f"<JobRun(id={self.id}, job_id='{self.job_id}', status='{self.status.name}', created_at='{self.created_at}')>"
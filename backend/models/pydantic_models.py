@@ -1,10 +1,10 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional, Any, Union
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
-from models.redis_models import Player, Habit, Task, Routine
-from models.pg_models import HistoryType
+from models.redis_models import Player, Habit, Task, Routine, Occurence, ChecklistItem
+from models.pg_models import HistoryType, JobRunStatus
 
 class PlayerFullInfo(BaseModel):
     player: Player
@@ -35,3 +35,208 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: str | None = None
+
+
+class BatchWriteReport(BaseModel):
+    touched: List[str] = []
+    missing: List[str] = []
+    failed: Dict[str, str] = {}
+    # The written model for each touched key.
+    items: Dict[str, Any] = {}
+
+
+class FeedStatus(BaseModel):
+    status: str
+    created: int = 0
+    skipped: int = 0
+    error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+
+class QueuedJobResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class ScheduledJobStatus(BaseModel):
+    id: str
+    name: str
+    next_run_time: Optional[datetime] = None
+    last_run: Optional[Dict[str, Any]] = None
+
+
+class SchedulerStatus(BaseModel):
+    instance_id: str
+    is_leader: bool
+    leader_id: Optional[str] = None
+    lease_ttl_ms: Optional[int] = None
+    running: bool
+    paused: bool
+    jobs: List[ScheduledJobStatus] = []
+
+
+class JobTriggerResponse(BaseModel):
+    run_id: uuid.UUID
+    job_id: str
+    status: JobRunStatus
+
+
+class JobRunResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: uuid.UUID
+    job_id: str
+    job_type: str
+    queued_job_id: Optional[str] = None
+    status: JobRunStatus
+    triggered_by: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_ms: Optional[int] = None
+    players_processed: Optional[int] = None
+    player_errors: Optional[Dict[str, int]] = None
+    throughput: Optional[float] = None
+    stats: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class AgendaEntry(BaseModel):
+    due: date
+    type: HistoryType
+    id: str
+    name: str
+    aura: int
+    completed: bool = False
+
+
+class Agenda(BaseModel):
+    start: date
+    end: date
+    entries: List[AgendaEntry] = []
+
+
+class PlayerPage(BaseModel):
+    players: List[Player] = []
+    next_cursor: Optional[str] = None
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    username: str
+    score: int
+
+
+class Leaderboard(BaseModel):
+    by: str
+    total_players: int
+    entries: List[LeaderboardEntry] = []
+
+
+class LeaderboardStanding(BaseModel):
+    by: str
+    total_players: int
+    player: LeaderboardEntry
+    neighbors: List[LeaderboardEntry] = []
+
+
+class AuraChange(BaseModel):
+    delta: int
+    reason: str = "manual"
+
+
+class AuraLedgerEntry(BaseModel):
+    id: str
+    at: int
+    delta: int
+    requested: int
+    reason: str
+    source: Optional[str] = None
+    balance: int
+
+
+class AuraLedger(BaseModel):
+    balance: int
+    entries: List[AuraLedgerEntry] = []
+
+
+class CompletionResult(BaseModel):
+    item: Union[Task, Habit, Routine]
+    completed: bool
+    # Aura requested by this call; 0 when the item was already in that state.
+    awarded: int
+    aura: Optional[int] = None
+
+
+class HabitStreak(BaseModel):
+    habit_id: str
+    occurence: Occurence
+    x_occurence: int
+    # Streaks are counted in the habit's periods, the current one included
+    # once it is completed.
+    current_streak: int
+    longest_streak: int
+    first_completed: Optional[date] = None
+    last_completed: Optional[date] = None
+    total_completed_days: int
+    window_start: date
+    window_end: date
+    window_days: int
+    window_completed_days: int
+    window_periods: int
+    window_completed_periods: int
+    completion_rate: float
+
+
+class BatchItemResult(BaseModel):
+    id: Optional[str] = None
+    status: str
+    detail: Optional[str] = None
+    item: Optional[Union[Task, Habit, Routine]] = None
+
+
+class BatchResult(BaseModel):
+    succeeded: int = 0
+    failed: int = 0
+    results: List[BatchItemResult] = []
+
+
+class Tombstone(BaseModel):
+    type: str
+    id: str
+
+
+class SyncResponse(BaseModel):
+    # Pass back as since on the next call.
+    version: int
+    # True when the cursor could not be served as a delta and the lists
+    # hold the player's full data set.
+    full: bool
+    player: Player
+    habits: List[Habit] = []
+    tasks: List[Task] = []
+    routines: List[Routine] = []
+    deleted: List[Tombstone] = []
+
+
+class ChecklistNodeCreate(BaseModel):
+    text: str
+    completed: bool = False
+    # Top level when unset; appended when position is unset.
+    parent_id: Optional[str] = None
+    position: Optional[int] = Field(None, ge=0)
+
+
+class ChecklistNodeUpdate(BaseModel):
+    text: Optional[str] = None
+    completed: Optional[bool] = None
+
+
+class ChecklistNodeMove(BaseModel):
+    parent_id: Optional[str] = None
+    position: Optional[int] = Field(None, ge=0)
+
+
+class ChecklistResult(BaseModel):
+    routine_id: str
+    node: Optional[ChecklistItem] = None
+    checklist: List[ChecklistItem] = []
@@ -1,9 +1,13 @@
-from pydantic import BaseModel, Field, field_validator, field_serializer
-from typing import Optional, Union
+from pydantic import BaseModel, Field, field_validator, field_serializer, model_validator
+from typing import Any, List, Optional, Union
 from enum import Enum
+import ast
+import json
 import uuid
 from datetime import date, datetime
 
+from utils.general import recurrence
+
 
 class Occurence(str, Enum):
     WEEKS = "weeks"
@@ -27,6 +31,31 @@ def validate_date_format(v: Union[str, date]) -> date:
     return None
 
 
+def parse_checklist(v: Any) -> Any:
+    """Accept checklists stored as JSON strings, including Python reprs
+    written by older AI edits, alongside plain lists."""
+    if not isinstance(v, str):
+        return v
+    if not v.strip():
+        return []
+    try:
+        return json.loads(v)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(v)
+    except (ValueError, SyntaxError):
+        raise ValueError("Checklist is not a valid JSON list")
+
+
+class ChecklistItem(BaseModel):
+    id: str = Field(default_factory=generate_uuid)
+    text: str
+    completed: bool = False
+    level: int = 0
+    children: List["ChecklistItem"] = []
+
+
 class Player(BaseModel):
     username: str
     level: int = 0
@@ -45,8 +74,8 @@ class Player(BaseModel):
 
 
 class PlayerUpdate(BaseModel):
+    # No aura: it only changes through completions, penalties and admins.
     level: Optional[int] = None
-    aura: Optional[int] = None
     description: Optional[str] = None
     obsidian_notes: Optional[str] = None
     mentor: Optional[str] = None
@@ -66,11 +95,20 @@ class Habit(BaseModel):
     last_completed: date
     occurence: Occurence
     x_occurence: int
+    next_due: Optional[date] = None
     _validate_habit_dates = field_validator(
-        "start_date", "last_completed", mode="before"
+        "start_date", "last_completed", "next_due", mode="before"
     )(validate_date_format)
 
-    @field_serializer("start_date", "last_completed")
+    @model_validator(mode="after")
+    def fill_next_due(self):
+        # Only for records written before next_due was stored; writes set it
+        # through recurrence.set_next_due.
+        if self.next_due is None:
+            recurrence.set_next_due(self)
+        return self
+
+    @field_serializer("start_date", "last_completed", "next_due")
     def serialize_date(self, v: date):
         return v.strftime("%d-%m-%y")
 
@@ -136,13 +174,23 @@ class Routine(BaseModel):
     occurence: Occurence
     x_occurence: int
     last_completed: date
-    checklist: str
+    checklist: List[ChecklistItem] = []
+    next_due: Optional[date] = None
 
     _validate_routine_dates = field_validator(
-        "start_date", "last_completed", mode="before"
+        "start_date", "last_completed", "next_due", mode="before"
     )(validate_date_format)
+    _validate_checklist = field_validator("checklist", mode="before")(parse_checklist)
 
-    @field_serializer("start_date", "last_completed")
+    @model_validator(mode="after")
+    def fill_next_due(self):
+        # Only for records written before next_due was stored; writes set it
+        # through recurrence.set_next_due.
+        if self.next_due is None:
+            recurrence.set_next_due(self)
+        return self
+
+    @field_serializer("start_date", "last_completed", "next_due")
     def serialize_date(self, v: date):
         return v.strftime("%d-%m-%y")
 
@@ -154,12 +202,13 @@ class RoutineUpdate(BaseModel):
     start_date: Optional[date] = None
     occurence: Optional[Occurence] = None
     x_occurence: Optional[int] = None
-    checklist: Optional[str] = None
+    checklist: Optional[List[ChecklistItem]] = None
     last_completed: Optional[date] = None
 
     _validate_routine_dates = field_validator(
         "start_date", "last_completed", mode="before"
     )(validate_date_format)
+    _validate_checklist = field_validator("checklist", mode="before")(parse_checklist)
 
     @field_serializer("start_date", "last_completed")
     def serialize_date(self, v: date):
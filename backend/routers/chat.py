@@ -1,15 +1,27 @@
+import asyncio
 import logging
+import uuid
 from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from sqlalchemy.orm import Session
-import logging
 import redis.asyncio as redis
 
 from models.chat_models import ChatHistoryEntry
 from routers import players
-from utils.ai import gemini, prompts, data_format
+from utils.ai import chat_sessions, llm_gateway, prompts, data_format
+from utils.ai.chat_sessions import ChatSession
 from utils.ai.handle_ai_action import handle_create_action, handle_edit_action
-from utils.database import pg_database, redis_database
+from utils.database import aura_ledger, change_log, pg_database, redis_database
+from utils.general import change_tracker
 from models import pg_models, redis_models
 from utils.operations import auth
 from models.pg_models import ChatHistory
@@ -67,10 +79,134 @@ async def get_gemini_history(
 
 async def handle_mentor(message: str):
     mentor_prompt = prompts.get_mentor(message)
-    gemini_model = gemini.get_gemini_model()
-    chat_session = gemini_model.start_chat()
-    response = await chat_session.send_message_async(mentor_prompt)
-    return response.text
+    mentor = await llm_gateway.generate(mentor_prompt, purpose="mentor")
+    return mentor.strip()
+
+
+async def get_chat_context(db: redis.Redis, pg_db: Session, username: str):
+    player = await aura_ledger.get_player(db, username)
+    habits, tasks, routines = await players.get_all_redis(db, username)
+    history = await get_player_history_records(username, pg_db)
+    return player, habits, tasks, routines, history
+
+
+async def load_session_context(
+    session: ChatSession, db: redis.Redis, pg_db: Session
+):
+    # The version is read first, so changes made while loading are replayed
+    # on the next refresh rather than missed.
+    version = await change_tracker.get_data_version(db, session.username)
+    player, habits, tasks, routines, history = await get_chat_context(
+        db, pg_db, session.username
+    )
+    items = {
+        "habit": {habit.id: habit for habit in habits},
+        "task": {task.id: task for task in tasks},
+        "routine": {routine.id: routine for routine in routines},
+    }
+    session.set_context(version, player, items, history)
+
+
+async def refresh_session_context(
+    session: ChatSession, db: redis.Redis, pg_db: Session
+):
+    # Reloads only the entities logged since the snapshot, and the history
+    # only when something changed. A snapshot older than the retained log
+    # is loaded again in full.
+    username = session.username
+    version, changed = await change_log.read_changes(db, username, session.version)
+    if changed is None:
+        await load_session_context(session, db, pg_db)
+        return
+    if not changed:
+        return
+    entries = change_log.changed_keys(username, changed)
+    raw_items = await db.mget([key for _, _, key in entries]) if entries else []
+    for (entity_type, entity_id, key), raw in zip(entries, raw_items):
+        items = session.items.setdefault(entity_type, {})
+        if raw is None:
+            items.pop(entity_id, None)
+            continue
+        try:
+            items[entity_id] = change_log.ENTITY_MODELS[entity_type].model_validate_json(raw)
+        except Exception as e:
+            logger.error(f"Chat context skipped unreadable {key}: {e}")
+    if (change_log.PLAYER_TYPE, username) in changed:
+        session.player = await aura_ledger.get_player(db, username)
+    session.history = await get_player_history_records(username, pg_db)
+    session.version = version
+
+
+async def get_ai_reply(
+    response_text: str,
+    db: redis.Redis,
+    pg_db: Session,
+    username: str,
+    habits: List[redis_models.Habit],
+    tasks: List[redis_models.Task],
+    routines: List[redis_models.Routine],
+) -> str:
+    parsed_response = data_format.parseResponseToJson(response_text)
+    if not parsed_response or "action" not in parsed_response:
+        return f"My brain is not working, wait a few seconds and try again."
+
+    action_type = parsed_response.get("action")
+    entity_type = parsed_response.get("type")
+    details = parsed_response.get("details")
+
+    if action_type == "create" and entity_type in ["task", "habit", "routine"] and details:
+        success, message_or_entity = await handle_create_action(
+            db, pg_db, username, entity_type, details
+        )
+        if success:
+            entity_name = getattr(message_or_entity, "name", "")
+            return f"Okay, I've created the {entity_type}: '{entity_name}'."
+        return f"Sorry, I couldn't create the {entity_type}. Reason: {message_or_entity}"
+
+    if action_type == "edit" and entity_type in ["task", "habit", "routine"] and details:
+        entity_list: List[Any] = []
+        if entity_type == "task":
+            entity_list = tasks
+        elif entity_type == "habit":
+            entity_list = habits
+        elif entity_type == "routine":
+            entity_list = routines
+
+        success, message = await handle_edit_action(
+            db,
+            pg_db,
+            username,
+            entity_type,
+            details,
+            entity_list,
+        )
+        if success:
+            return f"Okay, I've updated the {entity_type} '{message}'."
+        return f"Sorry, I couldn't update the {entity_type}, '{message}'"
+
+    if action_type == "response" and details and details.get("message"):
+        return f"{details['message']}"
+
+    return f"I do not understand what you are asking me, its beyond my current capabilities. I can Create or Edit a Task, Habit, or Routine. I can even pull up a great analysis of you and your tasks, habits, and routines."
+
+
+def save_chat_turn(
+    pg_db: Session, username: str, user_message: str, ai_reply: str, mentor: str
+):
+    ai_chat_entry = ChatHistory(
+        user_id=username,
+        role="assistant",
+        content=ai_reply,
+        mentor=mentor
+    )
+    user_chat_entry = ChatHistory(
+        user_id=username,
+        role="user",
+        content=user_message,
+    )
+    pg_db.add(user_chat_entry)
+    pg_db.add(ai_chat_entry)
+    pg_db.commit()
 
 
 @router.post("/chat", response_model=ChatResponse)
@@ -81,14 +217,9 @@ async def handle_chat_message(
     pg_db: Session = Depends(pg_database.get_pg_db),
 ):
     try:
-        gemini_model = gemini.get_gemini_model()
-
-        player = await redis_database.redis_get(
-            db, f"player:{current_user.username}", redis_models.Player
+        player, habits, tasks, routines, history = await get_chat_context(
+            db, pg_db, current_user.username
         )
-        habits, tasks, routines = await players.get_all_redis(db, current_user.username)
-        history = await get_player_history_records(current_user.username, pg_db)
-
         base_prompt = data_format.get_base_formatted_data(
             player, habits, tasks, routines, history
         )
@@ -100,81 +231,15 @@ async def handle_chat_message(
         logger.info(
             f"Sending request to Gemini chat for user {current_user.username}..."
         )
-        chat_session = gemini_model.start_chat(history=gemini_api_history)
-        response = await chat_session.send_message_async(
+        chat_session = llm_gateway.start_chat(history=gemini_api_history)
+        response_text = await chat_session.send(
             user_message
             + ". Always respond in a valid JSON format as specified in the instructions in the start of the conversation."
         )
-        parsed_response = data_format.parseResponseToJson(response.text)
-        if "action" in parsed_response:
-            action_type = parsed_response.get("action")
-            entity_type = parsed_response.get("type")
-            details = parsed_response.get("details")
-
-            if (
-                action_type == "create"
-                and entity_type in ["task", "habit", "routine"]
-                and details
-            ):
-                success, message_or_entity = await handle_create_action(
-                    db, pg_db, current_user.username, entity_type, details
-                )
-                if success:
-                    entity_name = getattr(message_or_entity, "name", "")
-                    ai_reply = f"Okay, I've created the {entity_type}: '{entity_name}'."
-                else:
-                    ai_reply = f"Sorry, I couldn't create the {entity_type}. Reason: {message_or_entity}"
-
-            elif (
-                action_type == "edit"
-                and entity_type in ["task", "habit", "routine"]
-                and details
-            ):
-
-                entity_list: List[Any] = []
-                if entity_type == "task":
-                    entity_list = tasks
-                elif entity_type == "habit":
-                    entity_list = habits
-                elif entity_type == "routine":
-                    entity_list = routines
-
-                success, message = await handle_edit_action(
-                    db,
-                    pg_db,
-                    current_user.username,
-                    entity_type,
-                    details,
-                    entity_list,
-                )
-                if success:
-                    ai_reply = f"Okay, I've updated the {entity_type} '{message}'."
-                else:
-                    ai_reply = (
-                        f"Sorry, I couldn't update the {entity_type}, '{message}'"
-                    )
-            elif action_type == "response" and details["message"]:
-                ai_reply = f"{details['message']}"
-            else:
-                ai_reply = f"I do not understand what you are asking me, its beyond my current capabilities. I can Create or Edit a Task, Habit, or Routine. I can even pull up a great analysis of you and your tasks, habits, and routines."
-
-        else:
-            ai_reply = f"My brain is not working, wait a few seconds and try again."
-
-        ai_chat_entry = ChatHistory(
-            user_id=current_user.username,
-            role="assistant",
-            content=ai_reply,
-            mentor=mentor
-        )
-        user_chat_entry = ChatHistory(
-            user_id=current_user.username,
-            role="user",
-            content=user_message,
+        ai_reply = await get_ai_reply(
+            response_text, db, pg_db, current_user.username, habits, tasks, routines
         )
-        pg_db.add(user_chat_entry)
-        pg_db.add(ai_chat_entry)
-        pg_db.commit()
+        save_chat_turn(pg_db, current_user.username, user_message, ai_reply, mentor)
         return ChatResponse(reply=ai_reply, mentor=mentor)
 
     except Exception as e:
@@ -188,6 +253,126 @@ async def handle_chat_message(
         )
 
 
+async def handle_session_message(
+    session: ChatSession, user_message: str, db: redis.Redis, pg_db: Session
+) -> ChatResponse:
+    username = session.username
+    await refresh_session_context(session, db, pg_db)
+    habits = session.item_list("habit")
+    tasks = session.item_list("task")
+    routines = session.item_list("routine")
+    sections = data_format.get_context_sections(
+        session.player, habits, tasks, routines, session.history
+    )
+    mentor = await handle_mentor(user_message)
+
+    turn = ""
+    context_delta = data_format.get_context_delta(session.sections, sections)
+    if context_delta:
+        turn += context_delta + "\n"
+        session.sections = sections
+    if mentor != session.mentor:
+        turn += f"From now on talk like you are {mentor}.\n"
+        session.mentor = mentor
+    turn += (
+        user_message
+        + ". Always respond in a valid JSON format as specified in the instructions in the start of the conversation."
+    )
+
+    logger.info(
+        f"Sending message on chat session {session.session_id} for user {username} (context changed: {bool(context_delta)})"
+    )
+    response_text = await session.model_session.send(turn)
+    ai_reply = await get_ai_reply(
+        response_text, db, pg_db, username, habits, tasks, routines
+    )
+    save_chat_turn(pg_db, username, user_message, ai_reply, mentor)
+    return ChatResponse(reply=ai_reply, mentor=mentor)
+
+
+@router.websocket("/chat/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    token: str = Query(...),
+    db: redis.Redis = Depends(redis_database.get_redis_connection),
+):
+    # Postgres sessions are opened per message rather than held for the
+    # life of the socket, so idle chats do not pin pool connections.
+    username = auth.get_username_from_token(token)
+    if username is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not chat_sessions.session_manager.has_capacity():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    session_id = str(uuid.uuid4())
+    try:
+        session = chat_sessions.session_manager.open(session_id, username, None, {})
+        if session is None:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        pg_db = pg_database.SessionLocal()
+        try:
+            await load_session_context(session, db, pg_db)
+            session.sections = data_format.get_context_sections(
+                session.player,
+                session.item_list("habit"),
+                session.item_list("task"),
+                session.item_list("routine"),
+                session.history,
+            )
+            full_user_prompt = prompts.get_chat_prompt(
+                "".join(session.sections.values()), "your assigned mentor"
+            )
+            gemini_api_history: list = await get_gemini_history(
+                auth.TokenData(username=username), pg_db, full_user_prompt
+            )
+        finally:
+            pg_db.close()
+        session.model_session = llm_gateway.start_chat(history=gemini_api_history)
+
+        while True:
+            try:
+                user_message = await asyncio.wait_for(
+                    websocket.receive_text(),
+                    timeout=chat_sessions.session_manager.idle_timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.info(f"Chat session {session_id} for {username} idled out.")
+                await websocket.close(code=status.WS_1000_NORMAL_CLOSURE)
+                break
+
+            user_message = user_message.strip()
+            if not user_message:
+                continue
+            session.touch()
+            pg_db = pg_database.SessionLocal()
+            try:
+                chat_response = await handle_session_message(
+                    session, user_message, db, pg_db
+                )
+                await websocket.send_json(chat_response.model_dump())
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Error processing chat session message for {username}: {e}",
+                    exc_info=True,
+                )
+                pg_db.rollback()
+                await websocket.send_json(
+                    {"error": "Internal server error processing chat message."}
+                )
+            finally:
+                pg_db.close()
+    except WebSocketDisconnect:
+        logger.info(f"Chat session {session_id} for {username} disconnected.")
+    finally:
+        chat_sessions.session_manager.close(session_id)
+
+
 @router.delete("/chat/history", status_code=status.HTTP_204_NO_CONTENT)
 async def clear_chat_history(
     current_user: redis_models.Player = Depends(auth.get_current_user),
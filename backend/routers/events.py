@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from utils.database import change_log, redis_database
+from utils.general import change_tracker
+from utils.general.event_hub import STREAM_LOST, event_hub
+from utils.general.get_env import getenv
+from utils.operations import auth
+
+logger = logging.getLogger(__name__)
+
+EVENTS_HEARTBEAT_SECONDS = float(getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+EVENTS_RETRY_MS = int(getenv("EVENTS_RETRY_MS", 3000))
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+)
+
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    if value is None or not value.strip():
+        return None
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        return None
+
+
+async def event_stream(
+    request: Request,
+    username: str,
+    last_event_id: Optional[int],
+) -> AsyncIterator[str]:
+    # The stream is only opened once the response starts, so a client that
+    # drops before then never holds a slot. The channel is subscribed before
+    # the log is replayed, so anything written meanwhile arrives on the
+    # queue too and is skipped by version.
+    yield f"retry: {EVENTS_RETRY_MS}\n\n"
+    connection = await event_hub.open(username)
+    if connection is None:
+        # The limit was reached after the request was admitted; the client
+        # reconnects after the retry delay.
+        return
+    try:
+        r = await redis_database.get_redis_connection()
+        if last_event_id is None:
+            last_version = await change_tracker.get_data_version(r, username)
+            yield format_event("ready", {"version": last_version}, last_version)
+        else:
+            last_version, entries = await change_log.read_entries(r, username, last_event_id)
+            if entries is None:
+                logger.info(
+                    f"Event cursor {last_event_id} for {username} is outside the change log, asking for a resync."
+                )
+                yield format_event("resync", {"version": last_version}, last_version)
+            else:
+                last_version = last_event_id
+                for entry in entries:
+                    yield format_event("change", entry, entry["version"])
+                    last_version = entry["version"]
+
+        while True:
+            if await request.is_disconnected():
+                break
+            try:
+                event = await asyncio.wait_for(
+                    connection.queue.get(), timeout=EVENTS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if event is STREAM_LOST:
+                # Ending the stream makes the client reconnect with its
+                # Last-Event-ID, which replays whatever was missed.
+                break
+            if event["version"] <= last_version:
+                continue
+            yield format_event("change", event, event["version"])
+            last_version = event["version"]
+    finally:
+        await event_hub.close(connection)
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    token: str = Query(...),
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    # EventSource cannot send an Authorization header, so the token comes
+    # in the query string as it does for the chat websocket.
+    username = auth.get_username_from_token(token)
+    if username is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+    if not event_hub.has_capacity():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open event streams, try again later",
+            headers={"Retry-After": str(EVENTS_RETRY_MS // 1000 or 1)},
+        )
+    cursor = parse_last_event_id(last_event_id_header or last_event_id)
+    return StreamingResponse(
+        event_stream(request, username, cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -12,21 +12,28 @@ from models.finance_models import (
     FinanceDataResponse,
     GeminiResponse,
     UploadResponse,
+    FinanceUploadStatus,
 )
-from utils.ai import gemini
+from models.pydantic_models import QueuedJobResponse
+from utils.ai import llm_gateway
 from utils.ai.data_format import parseResponseToJson
+from utils.database import redis_database
 from utils.database.pg_database import get_pg_db
+from utils.jobs import job_queue
 from utils.general.check_transaction_dup import add_transaction
 from models.pg_models import Transaction as DBTransaction
 from utils.operations.auth import get_current_user
 from models.redis_models import Player
 from utils.ai.prompts import get_finance_data_prompt
+from utils.general.get_env import getenv
 
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/finance", tags=["Finance"])
 
+LLM_FINANCE_TIMEOUT_SECONDS = float(getenv("LLM_FINANCE_TIMEOUT_SECONDS", 180))
+
 
 def generate_hash(data: str) -> str:
     return hashlib.sha256(data.encode("utf-8")).hexdigest()
@@ -41,55 +48,41 @@ async def read_pdf(file):
     
     return text.strip()
 
-@router.post("/upload-raw", response_model=UploadResponse)
-async def upload_finance_data(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_pg_db),
-    current_user: Player = Depends(get_current_user),
-):
-    user_id = current_user.username
-    logger.info(f"Received transaction file upload from user: {user_id}")
-
-    try:
-        raw_text = await read_pdf(file)
-        gemini_model = gemini.get_gemini_model()
-        chat_session = gemini_model.start_chat()
-        response = await chat_session.send_message_async(
-            get_finance_data_prompt(raw_text)
-        )
-        response_data = parseResponseToJson(response.text)
-        print(response_data)
-        gemini_data = GeminiResponse.model_validate(response_data)
-
-        added_count = 0
-        skipped_count = 0
-        failed_count = 0
+async def process_statement_text(raw_text: str, user_id: str, db: Session) -> UploadResponse:
+    response_text = await llm_gateway.generate(
+        get_finance_data_prompt(raw_text),
+        purpose="finance",
+        timeout=LLM_FINANCE_TIMEOUT_SECONDS,
+    )
+    response_data = parseResponseToJson(response_text)
+    gemini_data = GeminiResponse.model_validate(response_data)
 
-        for tx_data in gemini_data.transactions:
-            tx_data_str = tx_data.model_dump_json()
-            data_hash = generate_hash(tx_data_str)
+    added_count = 0
+    skipped_count = 0
+    failed_count = 0
 
-            transaction_date_obj = datetime.strptime(
-                tx_data.transaction_date, "%Y-%m-%d"
-            ).date()
+    for tx_data in gemini_data.transactions:
+        tx_data_str = tx_data.model_dump_json()
+        data_hash = generate_hash(tx_data_str)
 
-            db_data = {
-                "transaction_date": transaction_date_obj,
-                "description": tx_data.description,
-                "amount": tx_data.amount,
-                "category": tx_data.category,
-                "is_credit": tx_data.is_credit,
-            }
+        transaction_date_obj = datetime.strptime(
+            tx_data.transaction_date, "%Y-%m-%d"
+        ).date()
 
-            result = add_transaction(db_data, user_id, data_hash, db)
-            if result:
-                added_count += 1
-            else:
+        db_data = {
+            "transaction_date": transaction_date_obj,
+            "description": tx_data.description,
+            "amount": tx_data.amount,
+            "category": tx_data.category,
+            "is_credit": tx_data.is_credit,
+        }
 
-                skipped_count += 1
+        result = add_transaction(db_data, user_id, data_hash, db)
+        if result:
+            added_count += 1
+        else:
 
-    except Exception as e:
-        return HTTPException(status_code=500, detail=str(e))
+            skipped_count += 1
 
     logger.info(
         f"File processing complete for user {user_id}. Added: {added_count}, Skipped/Duplicate: {skipped_count}, Failed: {failed_count}"
@@ -102,6 +95,58 @@ async def upload_finance_data(
     )
 
 
+@router.post("/upload-raw", response_model=UploadResponse)
+async def upload_finance_data(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_pg_db),
+    current_user: Player = Depends(get_current_user),
+):
+    user_id = current_user.username
+    logger.info(f"Received transaction file upload from user: {user_id}")
+
+    try:
+        raw_text = await read_pdf(file)
+        return await process_statement_text(raw_text, user_id, db)
+    except Exception as e:
+        return HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/upload-raw/async", response_model=QueuedJobResponse, status_code=202)
+async def upload_finance_data_async(
+    file: UploadFile = File(...),
+    current_user: Player = Depends(get_current_user),
+):
+    user_id = current_user.username
+    logger.info(f"Received transaction file upload for background processing from user: {user_id}")
+    raw_text = await read_pdf(file)
+    r = await redis_database.get_redis_connection()
+    job_id = await job_queue.enqueue(
+        r, "finance_statement", {"user_id": user_id}, blob=raw_text
+    )
+    return QueuedJobResponse(job_id=job_id, status=job_queue.STATUS_QUEUED)
+
+
+@router.get("/uploads/{job_id}", response_model=FinanceUploadStatus)
+async def get_finance_upload_status(
+    job_id: str,
+    current_user: Player = Depends(get_current_user),
+):
+    r = await redis_database.get_redis_connection()
+    job = await job_queue.get_job(r, job_id)
+    if (
+        not job
+        or job["type"] != "finance_statement"
+        or job["payload"].get("user_id") != current_user.username
+    ):
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return FinanceUploadStatus(
+        job_id=job_id,
+        status=job["status"],
+        result=job.get("result"),
+        error=job.get("last_error"),
+    )
+
+
 @router.get("/data", response_model=FinanceDataResponse)
 def get_finance_data(
     db: Session = Depends(get_pg_db),
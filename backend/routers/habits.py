@@ -1,7 +1,14 @@
 import logging
+from datetime import date
+from typing import Optional
 
-from models import redis_models
+import redis.asyncio as redis
+from fastapi import Depends, HTTPException, status
+
+from models import pydantic_models, redis_models
+from utils.database import habit_streaks, redis_database
 from utils.operations.auth import get_current_username
+from utils.operations.crud_func import generic_read_item
 from utils.operations.crud_obj import create_crud_router
 
 logger = logging.getLogger(__name__)
@@ -21,3 +28,21 @@ router = create_crud_router(
     update_model_class=redis_models.HabitUpdate, 
     get_username_dependency=get_current_username
 )
+
+
+@router.get("/{item_id}/streak", response_model=pydantic_models.HabitStreak)
+async def read_habit_streak(
+    item_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_username: str = Depends(get_current_username),
+    db: redis.Redis = Depends(redis_database.get_redis_connection),
+):
+    habit = await generic_read_item(
+        item_id, current_username, db, habit_key, redis_models.Habit
+    )
+    try:
+        streak = await habit_streaks.get_streak(db, habit, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return pydantic_models.HabitStreak(**streak)
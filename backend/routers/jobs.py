@@ -1,12 +1,24 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict
-import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
 
+from apscheduler.schedulers.base import STATE_PAUSED
+
+from utils.general import scheduler as app_scheduler
 from utils.general.scheduler import scheduler
 from utils.operations.auth import get_current_user 
-from utils.jobs import penalise, gemini_analyzer
+from utils.jobs import job_queue, job_runs
+from utils.database import redis_database
+from utils.database.pg_database import get_pg_db
+from utils.ai import llm_gateway
 from models.redis_models import Player
+from models.pydantic_models import (
+    JobRunResponse,
+    JobTriggerResponse,
+    ScheduledJobStatus,
+    SchedulerStatus,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -16,43 +28,90 @@ router = APIRouter(
     dependencies=[Depends(get_current_user)] 
 )
 
-JOB_FUNCTION_MAP = {
-    "overdue_check_job": penalise.check_overdue_and_penalize,
-    "daily_gemini_analysis": gemini_analyzer.run_daily_analysis_job,
-}
-
-@router.post("/trigger/{job_id}", status_code=status.HTTP_200_OK)
-async def trigger_job_manually(job_id: str, current_user: Player = Depends(get_current_user)) -> Dict[str, str]:
+@router.post(
+    "/trigger/{job_id}",
+    response_model=JobTriggerResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def trigger_job_manually(
+    job_id: str,
+    current_user: Player = Depends(get_current_user),
+    pg_db: Session = Depends(get_pg_db),
+) -> JobTriggerResponse:
     logger.info(f"Manual trigger requested for job ID: {job_id} by user {current_user.username}")
-    
-    job_function = JOB_FUNCTION_MAP.get(job_id)
-    if not job_function:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal configuration error: No function mapped for job ID '{job_id}'."
-        )
-    
-    job = scheduler.get_job(job_id)
-    if not job:
+
+    job_type = app_scheduler.SCHEDULED_JOB_TYPES.get(job_id)
+    if not job_type or not scheduler.get_job(job_id):
         logger.warning(f"Manual trigger failed: Job ID '{job_id}' not found.")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Job with ID '{job_id}' not found."
         )
 
+    r = await redis_database.get_redis_connection()
     try:
-        if asyncio.iscoroutinefunction(job_function):
-            await job_function()
-        else:
-             job_function() 
-
-        logger.info(f"Job '{job_id}' executed successfully via manual trigger.")
-        return {"message": f"Job '{job_id}' triggered successfully."}
-
+        run = await job_runs.enqueue_run(r, pg_db, job_id, job_type, current_user.username)
     except Exception as e:
-        logger.error(f"Manual trigger failed: Error executing job '{job_id}': {e}", exc_info=True)
+        logger.error(f"Manual trigger failed: Could not enqueue job '{job_id}': {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to execute job '{job_id}': {str(e)}"
+            detail=f"Failed to enqueue job '{job_id}': {str(e)}"
         )
 
+    logger.info(f"Job '{job_id}' queued as run {run.id} via manual trigger.")
+    return JobTriggerResponse(run_id=run.id, job_id=job_id, status=run.status.value)
+
+
+@router.get("/runs", response_model=List[JobRunResponse])
+async def list_job_runs(
+    job_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    pg_db: Session = Depends(get_pg_db),
+) -> List[JobRunResponse]:
+    return job_runs.list_runs(pg_db, job_id, limit)
+
+
+@router.get("/runs/{run_id}", response_model=JobRunResponse)
+async def get_job_run(run_id: str, pg_db: Session = Depends(get_pg_db)) -> JobRunResponse:
+    run = job_runs.get_run(pg_db, run_id)
+    if run is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job run '{run_id}' not found."
+        )
+    return run
+
+
+@router.get("/llm/metrics")
+async def get_llm_metrics() -> Dict[str, Dict[str, float]]:
+    return llm_gateway.get_metrics()
+
+
+@router.get("/queue/stats")
+async def get_queue_stats(queue: str = job_queue.DEFAULT_QUEUE) -> Dict[str, int]:
+    r = await redis_database.get_redis_connection()
+    return await job_queue.queue_stats(r, queue)
+
+
+@router.get("/scheduler/status", response_model=SchedulerStatus)
+async def get_scheduler_status() -> SchedulerStatus:
+    election = app_scheduler.election
+    last_runs = await app_scheduler.get_last_runs()
+    lease_ttl_ms = await election.lease_ttl_ms()
+    return SchedulerStatus(
+        instance_id=election.instance_id,
+        is_leader=election.is_leader,
+        leader_id=await election.current_leader(),
+        lease_ttl_ms=lease_ttl_ms if lease_ttl_ms >= 0 else None,
+        running=scheduler.running,
+        paused=scheduler.state == STATE_PAUSED,
+        jobs=[
+            ScheduledJobStatus(
+                id=job.id,
+                name=job.name,
+                next_run_time=job.next_run_time,
+                last_run=last_runs.get(job.id),
+            )
+            for job in scheduler.get_jobs()
+        ],
+    )
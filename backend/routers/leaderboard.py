@@ -0,0 +1,61 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from models.pydantic_models import Leaderboard, LeaderboardStanding
+from utils.database import leaderboard, redis_database
+from utils.operations.auth import get_current_username
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/leaderboard",
+    tags=["leaderboard"],
+)
+
+LeaderboardField = Query("aura", pattern="^(aura|level)$")
+
+
+@router.get("/", response_model=Leaderboard)
+async def read_leaderboard(
+    by: str = LeaderboardField,
+    limit: int = Query(10, ge=1, le=100),
+    current_username: str = Depends(get_current_username),
+):
+    r = await redis_database.get_redis_connection()
+    entries = await leaderboard.get_top(r, by, limit)
+    total = await r.zcard(leaderboard.leaderboard_key(by))
+    return Leaderboard(by=by, total_players=total, entries=entries)
+
+
+@router.get("/me", response_model=LeaderboardStanding)
+async def read_my_standing(
+    by: str = LeaderboardField,
+    neighbors: int = Query(2, ge=0, le=25),
+    current_username: str = Depends(get_current_username),
+):
+    return await read_standing(current_username, by, neighbors)
+
+
+@router.get("/players/{username}", response_model=LeaderboardStanding)
+async def read_player_standing(
+    username: str,
+    by: str = LeaderboardField,
+    neighbors: int = Query(2, ge=0, le=25),
+    current_username: str = Depends(get_current_username),
+):
+    return await read_standing(username, by, neighbors)
+
+
+async def read_standing(username: str, by: str, neighbors: int) -> LeaderboardStanding:
+    r = await redis_database.get_redis_connection()
+    standing = await leaderboard.get_standing(r, by, username, neighbors)
+    if standing is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found on the leaderboard",
+        )
+    player_entry, around, total = standing
+    return LeaderboardStanding(
+        by=by, total_players=total, player=player_entry, neighbors=around
+    )
@@ -1,9 +1,10 @@
 import logging
 import random
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import List
+from datetime import date, timedelta
+from typing import List, Optional
 from fastapi import Query
 from sqlalchemy.orm import Session
 
@@ -12,21 +13,24 @@ import redis.asyncio as redis
 from utils.general import notes_utils
 from models import pydantic_models, redis_models
 
-from models.pydantic_models import NotesEntry, Token
-from utils.ai.data_format import parseResponseToJson
-from utils.ai.handle_ai_action import handle_create_action
-from utils.ai import prompts, gemini
+from models.pydantic_models import FeedStatus, NotesEntry, Token
+from utils.ai import initial_feed
+from utils.jobs import job_queue
 
-from utils.database import pg_database, redis_database
+from utils.database import aura_ledger, pg_database, player_registry, redis_database
 from utils.operations import auth
 from utils.general.history_logger import log_history, HistoryType
+from utils.general import change_tracker, recurrence
 from utils.operations import crud_func
 from routers.habits import habit_key
-from routers.routines import routine_key
+from utils.database.routine_checklists import routine_key
 from routers.tasks import task_key
 
 logger = logging.getLogger(__name__)
 
+AGENDA_DEFAULT_DAYS = 30
+AGENDA_MAX_DAYS = 366
+
 router = APIRouter(
     prefix="/players",
     tags=["players"],
@@ -37,7 +41,8 @@ router = APIRouter(
     "/signup", response_model=redis_models.Player, status_code=status.HTTP_201_CREATED
 )
 async def signup_player(
-    player_data: redis_models.Player, pg_db: Session = Depends(pg_database.get_pg_db)
+    player_data: redis_models.Player,
+    pg_db: Session = Depends(pg_database.get_pg_db),
 ):
     r = await redis_database.get_redis_connection()
 
@@ -54,36 +59,8 @@ async def signup_player(
     player_to_save = player_data.model_copy(update={"password": hashed_password})
 
     await redis_database.redis_set(r, f"player:{player_data.username}", player_to_save)
+    await change_tracker.mark_changed(r, player_data.username)
 
-    try:
-        logger.info(f"Generating initial feed for player: {player_data.username}")
-        profile_data = {
-            "current_problems": player_to_save.current_problems,
-            "ideal_future": player_to_save.ideal_future,
-            "biggest_fears": player_to_save.biggest_fears,
-            "past_issues": player_to_save.past_issues,
-        }
-        gemini_model = gemini.get_gemini_model()
-        chat_session = gemini_model.start_chat()
-        initial_prompt: str = prompts.generate_initial_feed(
-            profile_data, player_to_save.mentor
-        )
-        response = await chat_session.send_message_async(initial_prompt)
-        feed_objects = parseResponseToJson(response.text).get("objects", [])
-        for feed_object in feed_objects:
-            feed: dict = feed_object
-            entity_type = feed.get("type", None)
-            details = feed.get("details", None)
-            if entity_type and details:
-                await handle_create_action(
-                    r, pg_db, player_data.username, entity_type, details
-                )
-
-    except Exception as e:
-        logger.error(
-            f"Error generating initial feed for player {player_data.username}: {e}",
-            exc_info=True,
-        )
     log_history(
         db=pg_db,
         user_id=player_data.username,
@@ -91,6 +68,10 @@ async def signup_player(
         data=player_to_save,
         comments="Player account created.",
     )
+    await initial_feed.set_feed_status(
+        r, player_data.username, initial_feed.FEED_PENDING
+    )
+    await job_queue.enqueue(r, "initial_feed", {"username": player_data.username})
     return player_data.model_copy(update={"password": "hidden"})
 
 
@@ -117,6 +98,17 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
 
 
+async def require_admin(r: redis.Redis, username: str):
+    current_player_profile = await redis_database.redis_get(
+        r, f"player:{username}", redis_models.Player
+    )
+    if not current_player_profile or not current_player_profile.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required.",
+        )
+
+
 @router.get("/", response_model=List[redis_models.Player])
 async def read_all_players(
     current_user: auth.TokenData = Depends(auth.get_current_user),
@@ -126,33 +118,63 @@ async def read_all_players(
     ),
 ):
     r = await redis_database.get_redis_connection()
-    current_player_profile = await redis_database.redis_get(
-        r, f"player:{current_user.username}", redis_models.Player
-    )
-    if not current_player_profile or not current_player_profile.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Administrator privileges required.",
-        )
-    all_players = await redis_database.redis_get_all_by_prefix(
-        r, "player:*", redis_models.Player
-    )
-    paginated_players = all_players[skip : skip + limit]
+    await require_admin(r, current_user.username)
+    usernames = await player_registry.get_username_page(r, skip, limit)
+    paginated_players = await player_registry.load_players(r, usernames)
     players_out = [
         p.model_copy(update={"password": "hidden"}) for p in paginated_players
     ]
     return players_out
 
 
+@router.get("/registry", response_model=pydantic_models.PlayerPage)
+async def read_player_registry(
+    current_user: auth.TokenData = Depends(auth.get_current_user),
+    sort: str = Query(
+        player_registry.SORT_USERNAME,
+        description=f"One of {', '.join(player_registry.SORT_FIELDS)}",
+    ),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    prefix: Optional[str] = Query(None, min_length=1, description="Username prefix"),
+):
+    r = await redis_database.get_redis_connection()
+    await require_admin(r, current_user.username)
+    try:
+        players, next_cursor = await player_registry.get_player_page(
+            r,
+            sort=sort,
+            descending=order == "desc",
+            limit=limit,
+            cursor=cursor,
+            prefix=prefix,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return pydantic_models.PlayerPage(
+        players=[p.model_copy(update={"password": "hidden"}) for p in players],
+        next_cursor=next_cursor,
+    )
+
+
 @router.get("/me", response_model=redis_models.Player)
-async def read_players_me(current_username: str = Depends(auth.get_current_username)):
+async def read_players_me(
+    request: Request,
+    response: Response,
+    current_username: str = Depends(auth.get_current_username),
+):
     r = await redis_database.get_redis_connection()
-    player = await redis_database.redis_get(
-        r, f"player:{current_username}", redis_models.Player
+    etag, not_modified = await change_tracker.check_etag(
+        r, current_username, request.headers.get("if-none-match")
     )
+    if not_modified:
+        return Response(status_code=304, headers=change_tracker.cache_headers(etag))
+    player = await aura_ledger.get_player(r, current_username)
     if player is None:
         raise HTTPException(status_code=404, detail="Player not found")
 
+    response.headers.update(change_tracker.cache_headers(etag))
     return player.model_copy(update={"password": "hidden"})
 
 
@@ -167,18 +189,35 @@ async def get_player_history(
     return history_records
 
 
+@router.get("/me/feed", response_model=FeedStatus)
+async def read_initial_feed_status(
+    current_username: str = Depends(auth.get_current_username),
+):
+    r = await redis_database.get_redis_connection()
+    feed_status = await initial_feed.get_feed_status(r, current_username)
+    if not feed_status:
+        raise HTTPException(status_code=404, detail="No initial feed for this player")
+    return FeedStatus(**feed_status)
+
+
 @router.get("/me/full", response_model=pydantic_models.PlayerFullInfo)
 async def read_player_full_info(
+    request: Request,
+    response: Response,
     current_username: str = Depends(auth.get_current_username),
 ):
     r = await redis_database.get_redis_connection()
-    player = await redis_database.redis_get(
-        r, f"player:{current_username}", redis_models.Player
+    etag, not_modified = await change_tracker.check_etag(
+        r, current_username, request.headers.get("if-none-match")
     )
+    if not_modified:
+        return Response(status_code=304, headers=change_tracker.cache_headers(etag))
+    player = await aura_ledger.get_player(r, current_username)
     if player is None:
         raise HTTPException(status_code=404, detail="Player not found")
 
     habits, tasks, routines = await get_all_redis(r, current_username)
+    response.headers.update(change_tracker.cache_headers(etag))
     return pydantic_models.PlayerFullInfo(
         player=player.model_copy(update={"password": "hidden"}),
         habits=habits,
@@ -187,6 +226,77 @@ async def read_player_full_info(
     )
 
 
+@router.get("/me/agenda", response_model=pydantic_models.Agenda)
+async def read_player_agenda(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_username: str = Depends(auth.get_current_username),
+):
+    start = start or date.today()
+    end = end or start + timedelta(days=AGENDA_DEFAULT_DAYS)
+    if end < start or (end - start).days > AGENDA_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Agenda range must be between 0 and {AGENDA_MAX_DAYS} days.",
+        )
+
+    r = await redis_database.get_redis_connection()
+    habits, tasks, routines = await get_all_redis(r, current_username)
+
+    entries = []
+    for task in tasks:
+        if start <= task.due_date <= end:
+            entries.append(
+                pydantic_models.AgendaEntry(
+                    due=task.due_date,
+                    type=HistoryType.TASK,
+                    id=task.id,
+                    name=task.name,
+                    aura=task.aura,
+                    completed=task.completed,
+                )
+            )
+    today = date.today()
+    for history_type, items in ((HistoryType.HABIT, habits), (HistoryType.ROUTINE, routines)):
+        for item in items:
+            _, current_due = recurrence.current_period(
+                item.start_date, item.occurence, item.x_occurence, today
+            )
+            current_done = recurrence.is_period_completed(
+                item.start_date, item.occurence, item.x_occurence, item.last_completed, today
+            )
+            for due in recurrence.occurrences_between(
+                item.start_date, item.occurence, item.x_occurence, start, end
+            ):
+                entries.append(
+                    pydantic_models.AgendaEntry(
+                        due=due,
+                        type=history_type,
+                        id=item.id,
+                        name=item.name,
+                        aura=item.aura,
+                        # Only the current period can already be completed.
+                        completed=due == current_due and current_done,
+                    )
+                )
+
+    entries.sort(key=lambda entry: (entry.due, entry.type.value, entry.name))
+    return pydantic_models.Agenda(start=start, end=end, entries=entries)
+
+
+@router.get("/me/aura", response_model=pydantic_models.AuraLedger)
+async def read_aura_ledger(
+    limit: int = Query(50, ge=1, le=500),
+    current_username: str = Depends(auth.get_current_username),
+):
+    r = await redis_database.get_redis_connection()
+    player = await aura_ledger.get_player(r, current_username)
+    if player is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    entries = await aura_ledger.get_ledger(r, current_username, limit)
+    return pydantic_models.AuraLedger(balance=player.aura, entries=entries)
+
+
 @router.put("/me", response_model=redis_models.Player)
 async def update_player_me(
     player_update: redis_models.PlayerUpdate,
@@ -194,18 +304,21 @@ async def update_player_me(
     pg_db: Session = Depends(pg_database.get_pg_db),
 ):
     r = await redis_database.get_redis_connection()
-    existing_player = await redis_database.redis_get(
-        r, f"player:{current_username}", redis_models.Player
-    )
+    existing_player = await aura_ledger.get_player(r, current_username)
     if not existing_player:
         raise HTTPException(status_code=404, detail="Player not found")
 
     update_data = player_update.model_dump(exclude_unset=True)
-    updated_player_data = await redis_database.redis_update(
-        r, f"player:{current_username}", update_data, redis_models.Player
-    )
+    if update_data:
+        updated = await redis_database.redis_update(
+            r, f"player:{current_username}", update_data, redis_models.Player
+        )
+        if not updated:
+            raise HTTPException(status_code=404, detail="Player not found during update")
+    updated_player_data = await aura_ledger.get_player(r, current_username)
     if not updated_player_data:
         raise HTTPException(status_code=404, detail="Player not found during update")
+    await change_tracker.mark_changed(r, current_username)
 
     update_details = player_update.model_dump(exclude_unset=True)
     log_history(
@@ -245,23 +358,34 @@ async def read_player(
     username: str, current_user: auth.TokenData = Depends(auth.get_current_user)
 ):
     r = await redis_database.get_redis_connection()
-    current_player_profile = await redis_database.redis_get(
-        r, f"player:{current_user.username}", redis_models.Player
-    )
-    if not current_player_profile or not current_player_profile.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Administrator privileges required.",
-        )
+    await require_admin(r, current_user.username)
 
-    player = await redis_database.redis_get(
-        r, f"player:{username}", redis_models.Player
-    )
+    player = await aura_ledger.get_player(r, username)
     if player is None:
         raise HTTPException(status_code=404, detail="Player not found")
     return player.model_copy(update={"password": "hidden"})
 
 
+@router.post("/{username}/aura", response_model=redis_models.Player)
+async def change_player_aura(
+    username: str,
+    change: pydantic_models.AuraChange,
+    current_user: auth.TokenData = Depends(auth.get_current_user),
+):
+    # Manual adjustments are admin-only and always credited to the admin
+    # who made them.
+    r = await redis_database.get_redis_connection()
+    await require_admin(r, current_user.username)
+    balance = await aura_ledger.apply_delta(
+        r, username, change.delta, change.reason, f"admin:{current_user.username}"
+    )
+    if balance is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    await change_tracker.mark_changed(r, username)
+    player = await aura_ledger.get_player(r, username)
+    return player.model_copy(update={"password": "hidden"})
+
+
 @router.get("/me/notes", response_model=NotesEntry)
 async def get_random_note(
     current_user: auth.TokenData = Depends(auth.get_current_user),
@@ -1,14 +1,16 @@
 import logging
 
-from models import redis_models
+import redis.asyncio as redis
+from fastapi import Depends
+
+from models import pydantic_models, redis_models
+from utils.database import redis_database, routine_checklists
+from utils.database.routine_checklists import routine_key
 from utils.operations.auth import get_current_username
 from utils.operations.crud_obj import create_crud_router
 
 logger = logging.getLogger(__name__)
 
-def routine_key(user_id: str, routine_id: str) -> str:
-    return f"routine:{user_id}:{routine_id}"
-
 def user_routines_pattern(user_id: str) -> str:
     return f"routine:{user_id}"
 
@@ -21,3 +23,87 @@ router = create_crud_router(
     update_model_class=redis_models.RoutineUpdate, 
     get_username_dependency=get_current_username
 )
+
+
+# Single-node checklist edits; each one rewrites only the checklist of the
+# stored routine instead of going through a full PUT.
+@router.post("/{item_id}/checklist", response_model=pydantic_models.ChecklistResult)
+async def add_checklist_node(
+    item_id: str,
+    node_data: pydantic_models.ChecklistNodeCreate,
+    current_username: str = Depends(get_current_username),
+    db: redis.Redis = Depends(redis_database.get_redis_connection),
+):
+    checklist, node = await routine_checklists.update_checklist(
+        db,
+        current_username,
+        item_id,
+        lambda items: routine_checklists.add_node(
+            items,
+            node_data.text,
+            node_data.completed,
+            node_data.parent_id,
+            node_data.position,
+        ),
+    )
+    return pydantic_models.ChecklistResult(routine_id=item_id, node=node, checklist=checklist)
+
+
+@router.patch(
+    "/{item_id}/checklist/{node_id}", response_model=pydantic_models.ChecklistResult
+)
+async def update_checklist_node(
+    item_id: str,
+    node_id: str,
+    node_update: pydantic_models.ChecklistNodeUpdate,
+    current_username: str = Depends(get_current_username),
+    db: redis.Redis = Depends(redis_database.get_redis_connection),
+):
+    checklist, node = await routine_checklists.update_checklist(
+        db,
+        current_username,
+        item_id,
+        lambda items: routine_checklists.update_node(
+            items, node_id, node_update.text, node_update.completed
+        ),
+    )
+    return pydantic_models.ChecklistResult(routine_id=item_id, node=node, checklist=checklist)
+
+
+@router.post(
+    "/{item_id}/checklist/{node_id}/move", response_model=pydantic_models.ChecklistResult
+)
+async def move_checklist_node(
+    item_id: str,
+    node_id: str,
+    move: pydantic_models.ChecklistNodeMove,
+    current_username: str = Depends(get_current_username),
+    db: redis.Redis = Depends(redis_database.get_redis_connection),
+):
+    checklist, node = await routine_checklists.update_checklist(
+        db,
+        current_username,
+        item_id,
+        lambda items: routine_checklists.move_node(
+            items, node_id, move.parent_id, move.position
+        ),
+    )
+    return pydantic_models.ChecklistResult(routine_id=item_id, node=node, checklist=checklist)
+
+
+@router.delete(
+    "/{item_id}/checklist/{node_id}", response_model=pydantic_models.ChecklistResult
+)
+async def delete_checklist_node(
+    item_id: str,
+    node_id: str,
+    current_username: str = Depends(get_current_username),
+    db: redis.Redis = Depends(redis_database.get_redis_connection),
+):
+    checklist, _ = await routine_checklists.update_checklist(
+        db,
+        current_username,
+        item_id,
+        lambda items: routine_checklists.remove_node(items, node_id),
+    )
+    return pydantic_models.ChecklistResult(routine_id=item_id, checklist=checklist)
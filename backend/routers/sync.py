@@ -0,0 +1,64 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from models.pydantic_models import SyncResponse, Tombstone
+from routers.players import get_all_redis
+from utils.database import aura_ledger, change_log, redis_database
+from utils.general import change_tracker
+from utils.operations.auth import get_current_username
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"],
+)
+
+@router.get("", response_model=SyncResponse)
+async def sync_changes(
+    since: Optional[int] = Query(
+        None, ge=0, description="version from the previous sync; omit for a full snapshot"
+    ),
+    current_username: str = Depends(get_current_username),
+):
+    r = await redis_database.get_redis_connection()
+    changed = None
+    if since is not None:
+        version, changed = await change_log.read_changes(r, current_username, since)
+        if changed is None:
+            logger.info(
+                f"Sync cursor {since} for {current_username} is outside the change log, sending a full snapshot."
+            )
+    if changed is None:
+        version = await change_tracker.get_data_version(r, current_username)
+
+    player = await aura_ledger.get_player(r, current_username)
+    if player is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    response = SyncResponse(
+        version=version,
+        full=changed is None,
+        player=player.model_copy(update={"password": "hidden"}),
+    )
+
+    if changed is None:
+        response.habits, response.tasks, response.routines = await get_all_redis(
+            r, current_username
+        )
+        return response
+
+    entries = change_log.changed_keys(current_username, changed)
+    raw_items = await r.mget([key for _, _, key in entries]) if entries else []
+    for (entity_type, entity_id, key), raw in zip(entries, raw_items):
+        if raw is None:
+            response.deleted.append(Tombstone(type=entity_type, id=entity_id))
+            continue
+        try:
+            item = change_log.ENTITY_MODELS[entity_type].model_validate_json(raw)
+        except Exception as e:
+            logger.error(f"Sync skipped unreadable {key}: {e}")
+            continue
+        getattr(response, f"{entity_type}s").append(item)
+    return response
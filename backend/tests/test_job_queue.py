@@ -0,0 +1,156 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from utils.jobs import job_queue
+
+QUEUE = "test"
+
+
+@pytest.fixture
+def r():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_reserve_marks_job_in_flight(r):
+    async def scenario():
+        job_id = await job_queue.enqueue(r, "noop", {"value": 1}, queue=QUEUE)
+        assert await job_queue.reserve(r, QUEUE) == job_id
+        assert await job_queue.reserve(r, QUEUE) is None
+        job = await job_queue.get_job(r, job_id)
+        assert job["status"] == job_queue.STATUS_RUNNING
+        assert job["attempts"] == "1"
+        assert job["payload"] == {"value": 1}
+        assert await job_queue.queue_stats(r, QUEUE) == {
+            "pending": 0, "inflight": 1, "delayed": 0, "dead": 0
+        }
+
+    run(scenario())
+
+
+def test_release_due_requeues_expired_jobs(r, monkeypatch):
+    async def scenario():
+        job_id = await job_queue.enqueue(r, "noop", queue=QUEUE)
+        await job_queue.reserve(r, QUEUE)
+        assert await job_queue.release_due(r, QUEUE) == []
+        now = job_queue._now_ms()
+        monkeypatch.setattr(
+            job_queue, "_now_ms",
+            lambda: now + job_queue.JOB_VISIBILITY_TIMEOUT_SECONDS * 1000 + 1,
+        )
+        assert await job_queue.release_due(r, QUEUE) == [job_id]
+        assert await job_queue.reserve(r, QUEUE) == job_id
+        assert (await job_queue.get_job(r, job_id))["attempts"] == "2"
+
+    run(scenario())
+
+
+def test_fail_retries_then_dead_letters(r, monkeypatch):
+    async def scenario():
+        job_id = await job_queue.enqueue(r, "noop", queue=QUEUE, max_attempts=2, blob="text")
+        await job_queue.reserve(r, QUEUE)
+        await job_queue.fail(r, QUEUE, job_id, "boom")
+        job = await job_queue.get_job(r, job_id)
+        assert job["status"] == job_queue.STATUS_RETRYING
+        assert await r.zscore(job_queue.delayed_key(QUEUE), job_id) is not None
+
+        now = job_queue._now_ms()
+        monkeypatch.setattr(
+            job_queue, "_now_ms", lambda: now + job_queue.JOB_RETRY_BASE_SECONDS * 1000 + 1
+        )
+        assert await job_queue.release_due(r, QUEUE) == [job_id]
+        await job_queue.reserve(r, QUEUE)
+        await job_queue.fail(r, QUEUE, job_id, "boom again")
+
+        job = await job_queue.get_job(r, job_id)
+        assert job["status"] == job_queue.STATUS_DEAD
+        assert job["last_error"] == "boom again"
+        assert await r.lrange(job_queue.dead_key(QUEUE), 0, -1) == [job_id]
+        assert 0 < await r.ttl(job_queue.job_key(job_id)) <= job_queue.JOB_DEAD_TTL_SECONDS
+        assert not await r.exists(job_queue.blob_key(job_id))
+
+    run(scenario())
+
+
+def test_requeue_dead_resets_attempts(r):
+    async def scenario():
+        job_id = await job_queue.enqueue(r, "noop", queue=QUEUE, max_attempts=1)
+        await job_queue.reserve(r, QUEUE)
+        await job_queue.fail(r, QUEUE, job_id, "boom")
+
+        assert await job_queue.requeue_dead(r, QUEUE, job_id)
+        assert not await job_queue.requeue_dead(r, QUEUE, job_id)
+        job = await job_queue.get_job(r, job_id)
+        assert job["status"] == job_queue.STATUS_QUEUED
+        assert job["attempts"] == "0"
+        assert await r.ttl(job_queue.job_key(job_id)) == -1
+        assert await job_queue.reserve(r, QUEUE) == job_id
+
+    run(scenario())
+
+
+def test_requeue_dead_skips_expired_jobs(r):
+    async def scenario():
+        job_id = await job_queue.enqueue(r, "noop", queue=QUEUE, max_attempts=1)
+        await job_queue.reserve(r, QUEUE)
+        await job_queue.fail(r, QUEUE, job_id, "boom")
+        await r.delete(job_queue.job_key(job_id))
+
+        assert not await job_queue.requeue_dead(r, QUEUE, job_id)
+        assert await job_queue.queue_stats(r, QUEUE) == {
+            "pending": 0, "inflight": 0, "delayed": 0, "dead": 0
+        }
+
+    run(scenario())
+
+
+def test_blob_is_kept_out_of_the_job_and_dropped_on_ack(r):
+    async def scenario():
+        job_id = await job_queue.enqueue(r, "noop", {"user_id": "u"}, queue=QUEUE, blob="text")
+        job = await job_queue.get_job(r, job_id)
+        assert job["payload"] == {"user_id": "u", "blob_key": job_queue.blob_key(job_id)}
+        assert await job_queue.get_blob(r, job["payload"]["blob_key"]) == "text"
+        assert 0 < await r.ttl(job_queue.blob_key(job_id)) <= job_queue.JOB_BLOB_TTL_SECONDS
+
+        await job_queue.reserve(r, QUEUE)
+        await job_queue.ack(r, QUEUE, job_id, {"added": 1})
+        job = await job_queue.get_job(r, job_id)
+        assert job["status"] == job_queue.STATUS_DONE
+        assert job["result"] == {"added": 1}
+        assert not await r.exists(job_queue.blob_key(job_id))
+        assert await r.zcard(job_queue.inflight_key(QUEUE)) == 0
+
+    run(scenario())
+
+
+def test_worker_loop_survives_a_failed_ack(r, monkeypatch):
+    async def scenario():
+        handled = []
+
+        async def handler(value):
+            handled.append(value)
+
+        async def broken_ack(*args, **kwargs):
+            raise ConnectionError("redis went away")
+
+        monkeypatch.setitem(job_queue.JOB_HANDLERS, "noop", handler)
+        monkeypatch.setattr(job_queue, "ack", broken_ack)
+        monkeypatch.setattr(job_queue, "JOB_POLL_INTERVAL_SECONDS", 0.01)
+        await job_queue.enqueue(r, "noop", {"value": 1}, queue=QUEUE)
+        await job_queue.enqueue(r, "noop", {"value": 2}, queue=QUEUE)
+        stop = asyncio.Event()
+        worker = asyncio.create_task(job_queue.worker_loop(r, QUEUE, stop))
+        for _ in range(100):
+            if len(handled) == 2:
+                break
+            await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(worker, 1)
+        assert handled == [1, 2]
+
+    run(scenario())
@@ -0,0 +1,51 @@
+import json
+
+from utils.ai.json_extract import JsonObjectExtractor, extract_json_object, parse_json_object
+
+
+def feed_in_chunks(text, size):
+    extractor = JsonObjectExtractor()
+    for offset in range(0, len(text), size):
+        if extractor.feed(text[offset : offset + size]) is not None:
+            break
+    return extractor.result
+
+
+def test_braces_inside_strings_are_ignored():
+    text = 'Sure: {"message": "use {braces} and } freely", "n": {"x": 1}} done'
+    assert extract_json_object(text) == '{"message": "use {braces} and } freely", "n": {"x": 1}}'
+
+
+def test_escaped_quotes_do_not_end_strings():
+    obj = {"message": 'she said \\"}\\" and left', "path": "C:\\\\{dir}\\\\"}
+    text = "prefix " + json.dumps(obj) + " suffix"
+    assert json.loads(extract_json_object(text)) == obj
+
+
+def test_object_split_across_every_chunk_boundary():
+    obj = {"action": "create", "details": {"name": 'a "quoted" {name}', "note": "\\\\"}}
+    encoded = json.dumps(obj)
+    text = "Here you go: " + encoded + "\nAnything else?"
+    for size in range(1, len(text) + 1):
+        assert feed_in_chunks(text, size) == encoded, size
+
+
+def test_incomplete_object_has_no_result():
+    extractor = JsonObjectExtractor()
+    assert extractor.feed('{"a": {"b": "}"') is None
+    assert not extractor.done
+    assert extractor.feed("}") is None
+    assert extractor.feed("}") == '{"a": {"b": "}"}}'
+
+
+def test_parse_fenced_response_with_trailing_prose():
+    text = '```json\n{"action": "response", "details": {"message": "hi } there"}}\n```\nHope that helps {!}'
+    assert parse_json_object(text) == {
+        "action": "response",
+        "details": {"message": "hi } there"},
+    }
+
+
+def test_parse_without_an_object():
+    assert parse_json_object("no json here") is None
+    assert parse_json_object('{"unterminated": "yes"') is None
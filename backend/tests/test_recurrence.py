@@ -0,0 +1,45 @@
+from datetime import date
+
+from utils.general import recurrence
+
+
+def test_current_period_follows_start_date():
+    start = date(2024, 1, 31)
+    assert recurrence.current_period(start, "months", 1, date(2024, 1, 10)) == (
+        date(2024, 1, 31), date(2024, 2, 28)
+    )
+    assert recurrence.current_period(start, "months", 1, date(2024, 3, 30)) == (
+        date(2024, 2, 29), date(2024, 3, 30)
+    )
+    assert recurrence.current_period(start, "days", 3, date(2024, 2, 9)) == (
+        date(2024, 2, 9), date(2024, 2, 11)
+    )
+    assert recurrence.current_period(start, "weeks", 2, date(2024, 2, 13)) == (
+        date(2024, 1, 31), date(2024, 2, 13)
+    )
+
+
+def test_period_completion_expires_with_the_period():
+    start = date(2024, 1, 1)
+    completed = recurrence.add_period(start, "weeks", 1)
+    assert recurrence.is_period_completed(start, "weeks", 1, completed, date(2024, 1, 7))
+    assert not recurrence.is_period_completed(start, "weeks", 1, completed, date(2024, 1, 8))
+    assert not recurrence.is_period_completed(start, "weeks", 1, start, date(2024, 1, 3))
+
+
+def test_non_positive_recurrence_stays_on_the_first_period():
+    start = date(2024, 1, 1)
+    assert recurrence.current_period(start, "days", 0, date(2024, 5, 1))[0] == start
+
+
+def test_completed_until_matches_period_completion():
+    for occurence, x_occurence in (("days", 3), ("weeks", 1), ("months", 1), ("months", 2)):
+        start = date(2024, 1, 31)
+        for offset in range(0, 120, 7):
+            last_completed = date.fromordinal(start.toordinal() - 10 + offset)
+            until = recurrence.completed_until(start, occurence, x_occurence, last_completed)
+            for day_offset in range(-5, 150, 3):
+                today = date.fromordinal(start.toordinal() + day_offset)
+                assert (today < until) == recurrence.is_period_completed(
+                    start, occurence, x_occurence, last_completed, today
+                )
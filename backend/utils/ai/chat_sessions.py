@@ -0,0 +1,82 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+CHAT_WS_MAX_SESSIONS = int(getenv("CHAT_WS_MAX_SESSIONS", 200))
+CHAT_WS_IDLE_TIMEOUT_SECONDS = float(getenv("CHAT_WS_IDLE_TIMEOUT_SECONDS", 600))
+
+
+class ChatSession:
+    def __init__(
+        self, session_id: str, username: str, model_session: Any, sections: Dict[str, str]
+    ):
+        self.session_id = session_id
+        self.username = username
+        self.model_session = model_session
+        self.sections = sections
+        self.mentor: Optional[str] = None
+        self.last_active = time.monotonic()
+        # Snapshot of the player's data as of data version `version`, kept
+        # current from the change log between messages.
+        self.version = 0
+        self.player: Any = None
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.history: List[Any] = []
+
+    def set_context(
+        self, version: int, player: Any, items: Dict[str, Dict[str, Any]], history: List[Any]
+    ):
+        self.version = version
+        self.player = player
+        self.items = items
+        self.history = history
+
+    def item_list(self, item_type: str) -> List[Any]:
+        return list(self.items.get(item_type, {}).values())
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+
+class ChatSessionManager:
+    def __init__(self, max_sessions: int, idle_timeout: float):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, ChatSession] = {}
+
+    def has_capacity(self) -> bool:
+        return len(self._sessions) < self.max_sessions
+
+    def open(
+        self, session_id: str, username: str, model_session: Any, sections: Dict[str, str]
+    ) -> Optional[ChatSession]:
+        if not self.has_capacity():
+            logger.warning(
+                f"Chat session limit reached ({self.max_sessions}), rejecting session for {username}"
+            )
+            return None
+        session = ChatSession(session_id, username, model_session, sections)
+        self._sessions[session_id] = session
+        logger.info(
+            f"Opened chat session {session_id} for {username} ({len(self._sessions)}/{self.max_sessions} open)"
+        )
+        return session
+
+    def close(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session:
+            logger.info(
+                f"Closed chat session {session_id} for {session.username} ({len(self._sessions)}/{self.max_sessions} open)"
+            )
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+
+session_manager = ChatSessionManager(
+    max_sessions=CHAT_WS_MAX_SESSIONS, idle_timeout=CHAT_WS_IDLE_TIMEOUT_SECONDS
+)
@@ -1,63 +1,44 @@
 import json
-import re
-from typing import List
+import logging
+from typing import Dict, List, Optional
 
 from models import pg_models, redis_models
+from utils.general import recurrence
+from utils.ai.json_extract import extract_json_object, parse_json_object
 
-def extract_nested_json_and_remaining(text)->str:
-    start = text.find('{')
-    if start == -1:
-        return None, text
+logger = logging.getLogger(__name__)
 
-    stack = []
-    end = start
+def extract_nested_json_and_remaining(text: str) -> Optional[str]:
+    return extract_json_object(text)
 
-    for i in range(start, len(text)):
-        if text[i] == '{':
-            stack.append('{')
-        elif text[i] == '}':
-            stack.pop()
-            if not stack:
-                end = i
-                break
 
-    if stack:
-        return None, text
+def parseResponseToJson(input_str: str) -> dict:
+    try:
+        return parse_json_object(input_str)
+    except json.JSONDecodeError as e:
+        logger.warning(f"JSON decode error: {e}. Response: {input_str[:500]}")
+        return None
 
-    return text[start:end + 1]
 
-
-def parseResponseToJson(input_str: str) -> dict:    
-    input_str = re.sub(r"```json|```", "", input_str)
-    json_match = extract_nested_json_and_remaining(input_str)
-
-    if json_match:
-        try:
-            json_data = json.loads(json_match)
-            return json_data
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}",input_str)
-            return None
-    return None
-
-
-def get_base_formatted_data(
+def get_context_sections(
     player: redis_models.Player,
     habits: List[redis_models.Habit],
     tasks: List[redis_models.Task],
     routines: List[redis_models.Routine],
     history: List[pg_models.History] = None,
-) -> str:
+) -> Dict[str, str]:
     def format_habits(habits: List[redis_models.Habit]) -> str:
         if not habits:
             return "No habits found.\n"
         lines = []
         for habit in habits:
             completed = "No"
-            if habit.last_completed > habit.start_date:
+            if recurrence.is_period_completed(
+                habit.start_date, habit.occurence, habit.x_occurence, habit.last_completed
+            ):
                 completed = "Yes"
             lines.append(
-                f"Habit ID: {habit.id}, Name: {habit.name}, Aura: {habit.aura}, start_date: {habit.start_date}, Completed: {completed}, x_occurence: {habit.x_occurence}, occurence: {habit.occurence.value}"
+                f"Habit ID: {habit.id}, Name: {habit.name}, Aura: {habit.aura}, start_date: {habit.start_date}, next_due: {habit.next_due}, Completed: {completed}, x_occurence: {habit.x_occurence}, occurence: {habit.occurence.value}"
             )
             lines.append(f"  Current Desc: {habit.description}")
         return "\n".join(lines) + "\n"
@@ -79,11 +60,13 @@ def get_base_formatted_data(
         lines = []
         for routine in routines:
             completed = "No"
-            if routine.last_completed > routine.start_date:
+            if recurrence.is_period_completed(
+                routine.start_date, routine.occurence, routine.x_occurence, routine.last_completed
+            ):
                 completed = "Yes"
-            checklist = json.loads(routine.checklist)
+            checklist = [item.model_dump() for item in routine.checklist]
             lines.append(
-                f"Routine ID: {routine.id}, Name: {routine.name}, aura: {routine.aura}, start_date: {routine.start_date}, Completed: {completed}, x_occurence: {routine.x_occurence},  occurence: {routine.occurence.value}"
+                f"Routine ID: {routine.id}, Name: {routine.name}, aura: {routine.aura}, start_date: {routine.start_date}, next_due: {routine.next_due}, Completed: {completed}, x_occurence: {routine.x_occurence},  occurence: {routine.occurence.value}"
             )
             lines.append(f"  Checklist: {checklist}")
             lines.append(f"  Current Desc: {routine.description}")
@@ -105,23 +88,56 @@ def get_base_formatted_data(
             )
         return "\n".join(lines) + "\n"
 
-    prompt = f"""
+    sections = {
+        "player": f"""
     Here is the context about the player '{player.username}' (Level: {player.level}, Aura: {player.aura}).
     Current Player Description: {player.description}
     Based on the following user profile information:
         - Current Problems: {player.current_problems}
         - Ideal Future: {player.ideal_future}
         - Biggest Fears: {player.biggest_fears}
-        - Past Issues (Optional): {player.past_issues}
+        - Past Issues (Optional): {player.past_issues}""",
+        "habits": f"""
     --- Habits ---
-    {format_habits(habits)}
+    {format_habits(habits)}""",
+        "tasks": f"""
     --- Tasks ---
-    {format_tasks(tasks)}
+    {format_tasks(tasks)}""",
+        "routines": f"""
     --- Routines ---
-    {format_routines(routines)}"""
+    {format_routines(routines)}""",
+    }
     if history:
-        prompt += f"""
+        sections["history"] = f"""
         --- History Log (Recent entries first might be better, but currently ASC) ---
         {format_history(history)}
         """
-    return prompt
+    return sections
+
+
+def get_base_formatted_data(
+    player: redis_models.Player,
+    habits: List[redis_models.Habit],
+    tasks: List[redis_models.Task],
+    routines: List[redis_models.Routine],
+    history: List[pg_models.History] = None,
+) -> str:
+    sections = get_context_sections(player, habits, tasks, routines, history)
+    return "".join(sections.values())
+
+
+def get_context_delta(
+    previous_sections: Dict[str, str], current_sections: Dict[str, str]
+) -> Optional[str]:
+    changed = [
+        section
+        for name, section in current_sections.items()
+        if previous_sections.get(name) != section
+    ]
+    if not changed:
+        return None
+    prompt = """
+    --- Context Update ---
+    The following parts of the player's data changed since they were last shared with you.
+    They replace the earlier versions of the same sections:"""
+    return prompt + "".join(changed)
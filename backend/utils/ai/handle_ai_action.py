@@ -1,23 +1,64 @@
-import json
 import logging
 from sqlalchemy.orm import Session
 import uuid
 from datetime import date, datetime
-from typing import List, Dict, Any, Optional, Tuple
-from pydantic import ValidationError
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from pydantic import BaseModel, ValidationError
 import redis.asyncio as redis
 
-from utils.general import history_logger
+from utils.general import change_tracker, history_logger
 from models import pg_models, redis_models
 from utils.operations import crud_obj
 from routers.tasks import task_key
 from routers.habits import habit_key
-from routers.routines import routine_key
+from utils.database.routine_checklists import routine_key
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
+def build_entity(
+    username: str, entity_type: str, details: Dict[str, Any]
+) -> Tuple[BaseModel, Callable[[str, str], str], pg_models.HistoryType]:
+    details["id"] = str(uuid.uuid4())
+    details["userId"] = username
+
+    if entity_type == "task":
+        if "due_date" not in details:
+            details["due_date"] = date.today()
+        else:
+            details["due_date"] = datetime.strptime(details["due_date"], "%Y-%m-%d").date()
+            if details["due_date"] < date.today():
+                details["due_date"] = date.today()
+
+        if "completed" not in details:
+            details["completed"] = False
+        item_data = redis_models.Task(**redis_models.Task(**details).model_dump())
+        return item_data, task_key, pg_models.HistoryType.TASK
+
+    if entity_type == "habit":
+        if "start_date" not in details:
+            details["start_date"] = date.today()
+        if "last_completed" not in details:
+            details["last_completed"] = date.today()
+
+        item_data = redis_models.Habit(**redis_models.Habit(**details).model_dump())
+        return item_data, habit_key, pg_models.HistoryType.HABIT
+
+    if entity_type == "routine":
+        if "start_date" not in details:
+            details["start_date"] = date.today()
+        if "last_completed" not in details:
+            details["last_completed"] = date.today()
+
+        item_data = redis_models.Routine(
+            **redis_models.Routine(**details).model_dump()
+        )
+        return item_data, routine_key, pg_models.HistoryType.ROUTINE
+
+    raise ValueError(f"Unknown entity type: {entity_type}")
+
+
 async def handle_create_action(
     db: redis.Redis,
     pg_db: Session,
@@ -25,70 +66,21 @@ async def handle_create_action(
     entity_type: str,
     details: Dict[str, Any],
 ) -> Tuple[bool, Any]:
-    details["id"] = str(uuid.uuid4())
-    details["userId"] = username
-
-    model_class: Optional[type] = None
-    key_func: Optional[callable] = None
-    history_type: Optional[pg_models.HistoryType] = None
+    if entity_type not in ("task", "habit", "routine"):
+        return False, f"Unknown entity type: {entity_type}"
 
     try:
-        if entity_type == "task":
-            model_class = redis_models.Task
-            key_func = task_key
-            history_type = pg_models.HistoryType.TASK
-
-            if "due_date" not in details:
-                details["due_date"] = date.today()
-            else:
-                details["due_date"] = datetime.strptime(details["due_date"], "%Y-%m-%d").date()
-                if details["due_date"] < date.today():
-                    details["due_date"] = date.today()
-            
-            if "completed" not in details:
-                details["completed"] = False
-            item_data = redis_models.Task(**redis_models.Task(**details).model_dump())
-
-        elif entity_type == "habit":
-            model_class = redis_models.Habit
-            key_func = habit_key
-            history_type = pg_models.HistoryType.HABIT
-
-            if "start_date" not in details:
-                details["start_date"] = date.today()
-            if "last_completed" not in details:
-                details["last_completed"] = date.today()
-
-            item_data = redis_models.Habit(**redis_models.Habit(**details).model_dump())
-
-        elif entity_type == "routine":
-            model_class = redis_models.Routine
-            key_func = routine_key
-            history_type = pg_models.HistoryType.ROUTINE
-
-            if "checklist" not in details:
-                details["checklist"] = "[]"
-            else:
-                details["checklist"] = json.dumps(details["checklist"])
-
-            if "start_date" not in details:
-                details["start_date"] = date.today()
-            if "last_completed" not in details:
-                details["last_completed"] = date.today()
-
-            item_data = redis_models.Routine(
-                **redis_models.Routine(**details).model_dump()
-            )
-        else:
-            return False, f"Unknown entity type: {entity_type}"
-
+        item_data, key_func, history_type = build_entity(
+            username, entity_type, details
+        )
         created_item = await crud_obj.generic_create_item(
             item_data=item_data,
             current_username=username,
             db=db,
             key_func=key_func,
-            model_class=model_class,
+            model_class=type(item_data),
         )
+        await change_tracker.mark_changed(db, username)
         history_logger.log_history(
             pg_db,
             username,
@@ -140,9 +132,6 @@ async def handle_edit_action(
                     history_type = pg_models.HistoryType.ROUTINE
                     key_func = routine_key
                     model_class = redis_models.Routine
-
-                    if "checklist" in changes:
-                        changes["checklist"] = str(changes["checklist"])
                 else:
                     return False, f"Unknown entity type: {entity_type}"
 
@@ -158,6 +147,7 @@ async def handle_edit_action(
                     key_func=key_func,
                     model_class=model_class,
                 )
+                await change_tracker.mark_changed(db, username)
 
                 history_logger.log_history(
                     pg_db,
@@ -0,0 +1,113 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict
+
+import redis.asyncio as redis
+
+from models import redis_models
+from utils.ai import llm_gateway, prompts
+from utils.ai.data_format import parseResponseToJson
+from utils.ai.handle_ai_action import build_entity
+from utils.database import pg_database, redis_database
+from utils.general import change_tracker, history_logger
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+FEED_PENDING = "pending"
+FEED_RUNNING = "running"
+FEED_DONE = "done"
+FEED_FAILED = "failed"
+FEED_FINISHED = (FEED_DONE, FEED_FAILED)
+# How long a finished feed's status stays readable.
+FEED_STATUS_TTL_SECONDS = int(getenv("FEED_STATUS_TTL_SECONDS", 7 * 24 * 3600))
+
+
+def feed_status_key(username: str) -> str:
+    return f"feed_status:{username}"
+
+
+async def set_feed_status(db: redis.Redis, username: str, status: str, **fields):
+    mapping = {
+        "status": status,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **{name: str(value) for name, value in fields.items()},
+    }
+    key = feed_status_key(username)
+    # Replacing the hash drops fields and any expiry left by an earlier
+    # attempt, so a retried feed does not expire while it runs.
+    async with db.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        if status in FEED_FINISHED:
+            pipe.expire(key, FEED_STATUS_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def get_feed_status(db: redis.Redis, username: str) -> Dict[str, str]:
+    return await db.hgetall(feed_status_key(username))
+
+
+async def generate_initial_feed(username: str):
+    r = await redis_database.get_redis_connection()
+    pg_db = pg_database.SessionLocal()
+    try:
+        player = await redis_database.redis_get(
+            r, f"player:{username}", redis_models.Player
+        )
+        if player is None:
+            logger.warning(f"Skipping initial feed, player {username} no longer exists.")
+            return
+        await set_feed_status(r, username, FEED_RUNNING)
+
+        logger.info(f"Generating initial feed for player: {username}")
+        profile_data = {
+            "current_problems": player.current_problems,
+            "ideal_future": player.ideal_future,
+            "biggest_fears": player.biggest_fears,
+            "past_issues": player.past_issues,
+        }
+        initial_prompt: str = prompts.generate_initial_feed(profile_data, player.mentor)
+        response_text = await llm_gateway.generate(initial_prompt, purpose="initial_feed")
+        feed_objects = (parseResponseToJson(response_text) or {}).get("objects", [])
+
+        creates = {}
+        history_entries = []
+        skipped = 0
+        for feed_object in feed_objects:
+            feed: dict = feed_object
+            entity_type = feed.get("type", None)
+            details = feed.get("details", None)
+            if not entity_type or not details:
+                skipped += 1
+                continue
+            try:
+                item, key_func, history_type = build_entity(username, entity_type, details)
+            except Exception as e:
+                logger.warning(f"Skipping invalid initial feed {entity_type} for {username}: {e}")
+                skipped += 1
+                continue
+            creates[key_func(username, item.id)] = item
+            history_entries.append(
+                (
+                    username,
+                    history_type,
+                    item,
+                    f"{entity_type.capitalize()} created by the initial feed: {item.name}",
+                )
+            )
+
+        if creates:
+            await redis_database.redis_batch_patch(r, [], creates)
+            await change_tracker.mark_changed(r, username)
+        history_logger.log_history_batch(pg_db, history_entries)
+        await set_feed_status(r, username, FEED_DONE, created=len(creates), skipped=skipped)
+        logger.info(f"Initial feed for {username}: created {len(creates)} items, skipped {skipped}.")
+    except Exception as e:
+        logger.error(
+            f"Error generating initial feed for player {username}: {e}",
+            exc_info=True,
+        )
+        await set_feed_status(r, username, FEED_FAILED, error=str(e))
+    finally:
+        pg_db.close()
@@ -0,0 +1,99 @@
+import json
+import re
+from typing import Any, List, Optional
+
+# Everything up to the next structural brace, with complete string literals
+# swallowed whole, is matched in C so the Python loop only wakes up on braces
+# and on a string literal that is cut off at the end of a chunk.
+_UNTIL_BRACE = re.compile(r'[^{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}"]*)*', re.DOTALL)
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+_decoder = json.JSONDecoder()
+
+
+class JsonObjectExtractor:
+    """Finds the first balanced top-level JSON object in text fed in chunks.
+
+    Braces inside string literals (including escaped quotes) are ignored.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._carry = ""
+        self._depth = 0
+        self._in_string = False
+        self.result: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.result is not None:
+            return self.result
+        text = self._carry + chunk
+        self._carry = ""
+        length = len(text)
+        pos = 0
+
+        if self._depth == 0:
+            start = text.find("{")
+            if start == -1:
+                return None
+            self._depth = 1
+            text = text[start:]
+            length = len(text)
+            pos = 1
+
+        while pos < length:
+            if self._in_string:
+                pos = _STRING_BODY.match(text, pos).end()
+                if pos >= length:
+                    break
+                if text[pos] != '"':
+                    # A trailing backslash escapes the first character of the
+                    # next chunk, so hold it back until that chunk arrives.
+                    self._carry = text[pos:]
+                    text = text[:pos]
+                    break
+                self._in_string = False
+                pos += 1
+                continue
+
+            pos = _UNTIL_BRACE.match(text, pos).end()
+            if pos >= length:
+                break
+            char = text[pos]
+            pos += 1
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._chunks.append(text[:pos])
+                    self.result = "".join(self._chunks)
+                    self._chunks = []
+                    return self.result
+
+        self._chunks.append(text)
+        return None
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    return JsonObjectExtractor().feed(text)
+
+
+def parse_json_object(text: str) -> Optional[Any]:
+    start = text.find("{")
+    if start == -1:
+        return None
+    try:
+        return _decoder.raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        pass
+    extracted = extract_json_object(text[start:])
+    if extracted is None:
+        return None
+    return json.loads(extracted)
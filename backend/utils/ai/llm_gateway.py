@@ -0,0 +1,366 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as redis
+from google.api_core import exceptions as google_exceptions
+
+from utils.ai import gemini
+from utils.database import redis_database
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = getenv("LLM_BACKEND", "gemini").lower()
+LLM_TIMEOUT_SECONDS = float(getenv("LLM_TIMEOUT_SECONDS", 60))
+LLM_MAX_RETRIES = int(getenv("LLM_MAX_RETRIES", 3))
+LLM_RETRY_BASE_SECONDS = float(getenv("LLM_RETRY_BASE_SECONDS", 1))
+LLM_RETRY_MAX_SECONDS = float(getenv("LLM_RETRY_MAX_SECONDS", 30))
+LLM_MAX_CONCURRENCY = int(getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_GLOBAL_RATE_PER_MINUTE = int(getenv("LLM_GLOBAL_RATE_PER_MINUTE", 0))
+LLM_GLOBAL_BURST = int(getenv("LLM_GLOBAL_BURST", 10))
+LLM_FAKE_LATENCY_MS = int(getenv("LLM_FAKE_LATENCY_MS", 0))
+
+TOKEN_BUCKET_KEY = "llm:token_bucket"
+
+RATE_LIMIT_EXCEPTIONS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+)
+RETRYABLE_EXCEPTIONS = RATE_LIMIT_EXCEPTIONS + (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+)
+
+# Refills the bucket from the elapsed server time, then takes one token.
+# Returns 0 when a token was taken, otherwise the milliseconds to wait.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_per_ms = tonumber(ARGV[2])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) * refill_per_ms)
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) / refill_per_ms)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill_per_ms) + 1000)
+return wait_ms
+"""
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class LLMRateLimitError(LLMError):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    pass
+
+
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_redis_client: Optional[redis.Redis] = None
+_metrics: Dict[str, Dict[str, float]] = {}
+
+
+def _record(purpose: str, **values: float):
+    stats = _metrics.setdefault(
+        purpose,
+        {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "latency_ms_total": 0,
+            "latency_ms_max": 0,
+            "prompt_tokens": 0,
+            "response_tokens": 0,
+        },
+    )
+    for name, value in values.items():
+        if name == "latency_ms_max":
+            stats[name] = max(stats[name], value)
+        else:
+            stats[name] += value
+
+
+def get_metrics() -> Dict[str, Dict[str, float]]:
+    snapshot = {}
+    for purpose, stats in _metrics.items():
+        snapshot[purpose] = dict(stats)
+        calls = stats["calls"]
+        snapshot[purpose]["latency_ms_avg"] = (
+            round(stats["latency_ms_total"] / calls, 2) if calls else 0
+        )
+    return snapshot
+
+
+async def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = await redis_database.get_redis_connection()
+    return _redis_client
+
+
+async def _acquire_global_token():
+    if LLM_GLOBAL_RATE_PER_MINUTE <= 0:
+        return
+    refill_per_ms = LLM_GLOBAL_RATE_PER_MINUTE / 60000
+    r = await _get_redis()
+    while True:
+        try:
+            wait_ms = await r.eval(
+                TOKEN_BUCKET_SCRIPT,
+                1,
+                TOKEN_BUCKET_KEY,
+                LLM_GLOBAL_BURST,
+                refill_per_ms,
+            )
+        except Exception as e:
+            logger.warning(f"LLM token bucket unavailable, continuing without it: {e}")
+            return
+        if not wait_ms:
+            return
+        await asyncio.sleep(int(wait_ms) / 1000)
+
+
+def _backoff_seconds(attempt: int) -> float:
+    ceiling = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * (2**attempt))
+    return random.uniform(0, ceiling)
+
+
+def _token_counts(response: Any, prompt: str, text: str) -> Dict[str, int]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        return {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "response_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        }
+    return {"prompt_tokens": len(prompt) // 4, "response_tokens": len(text) // 4}
+
+
+async def _call(purpose: str, prompt: str, send, timeout: Optional[float]) -> str:
+    # One deadline covers the whole call: rate-limit waits, retries and
+    # their backoff included.
+    deadline = timeout or LLM_TIMEOUT_SECONDS
+    try:
+        return await asyncio.wait_for(_attempt(purpose, prompt, send), timeout=deadline)
+    except asyncio.TimeoutError:
+        _record(purpose, calls=1, errors=1, timeouts=1)
+        logger.error(f"LLM call '{purpose}' timed out after {deadline}s")
+        raise LLMTimeoutError(f"LLM call '{purpose}' timed out")
+
+
+async def _attempt(purpose: str, prompt: str, send) -> str:
+    attempt = 0
+    while True:
+        # Waiting for a token does not hold a concurrency slot.
+        await _acquire_global_token()
+        async with _semaphore:
+            started = time.perf_counter()
+            try:
+                response = await send()
+            except RETRYABLE_EXCEPTIONS as e:
+                _record(
+                    purpose,
+                    calls=1,
+                    errors=1,
+                    rate_limited=int(isinstance(e, RATE_LIMIT_EXCEPTIONS)),
+                )
+                if attempt >= LLM_MAX_RETRIES:
+                    logger.error(
+                        f"LLM call '{purpose}' failed after {attempt + 1} attempts: {e}"
+                    )
+                    if isinstance(e, RATE_LIMIT_EXCEPTIONS):
+                        raise LLMRateLimitError(str(e)) from e
+                    raise LLMUnavailableError(str(e)) from e
+                error = e
+            except Exception as e:
+                _record(purpose, calls=1, errors=1)
+                raise LLMError(f"LLM call '{purpose}' failed: {e}") from e
+            else:
+                latency_ms = (time.perf_counter() - started) * 1000
+                text = response.text
+                _record(
+                    purpose,
+                    calls=1,
+                    latency_ms_total=latency_ms,
+                    latency_ms_max=latency_ms,
+                    **_token_counts(response, prompt, text),
+                )
+                return text
+
+        delay = _backoff_seconds(attempt)
+        attempt += 1
+        _record(purpose, retries=1)
+        logger.warning(
+            f"LLM call '{purpose}' failed ({error}), retry {attempt}/{LLM_MAX_RETRIES} in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeChatSession:
+    def __init__(self, purpose: str, history: Optional[List[dict]] = None):
+        self.purpose = purpose
+        self.history = list(history or [])
+
+    async def send_message_async(self, message: str) -> FakeResponse:
+        self.history.append({"role": "user", "parts": [{"text": message}]})
+        response = await fake_generate(self.purpose, message)
+        self.history.append({"role": "model", "parts": [{"text": response.text}]})
+        return response
+
+
+def _fake_text(purpose: str, prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    seed = int(digest[:8], 16)
+    today = date.today()
+
+    if purpose == "mentor":
+        mentors = [m.strip() for m in (getenv("MENTORS") or "").split(",") if m.strip()]
+        return mentors[seed % len(mentors)] if mentors else "Shogun"
+
+    if purpose == "chat":
+        message = prompt.split(". Always respond in a valid JSON format")[0]
+        return json.dumps(
+            {
+                "action": "response",
+                "type": "task",
+                "details": {"message": f"[fake:{digest[:8]}] {message[-200:]}"},
+            }
+        )
+
+    if purpose == "initial_feed":
+        checklist = [
+            {"id": f"{digest[:8]}-1", "text": "Start", "completed": False, "level": 0, "children": []}
+        ]
+        return json.dumps(
+            {
+                "objects": [
+                    {
+                        "type": "task",
+                        "details": {
+                            "name": f"Fake task {digest[:6]}",
+                            "due_date": (today + timedelta(days=3)).isoformat(),
+                            "aura": 5,
+                        },
+                    },
+                    {
+                        "type": "habit",
+                        "details": {
+                            "name": f"Fake habit {digest[:6]}",
+                            "aura": 5,
+                            "x_occurence": 1,
+                            "occurence": "days",
+                        },
+                    },
+                    {
+                        "type": "routine",
+                        "details": {
+                            "name": f"Fake routine {digest[:6]}",
+                            "aura": 5,
+                            "x_occurence": 1,
+                            "occurence": "weeks",
+                            "checklist": checklist,
+                        },
+                    },
+                ]
+            }
+        )
+
+    if purpose == "daily_analysis":
+        item_descriptions = {}
+        for kind in ("Task", "Habit", "Routine"):
+            for item_id in re.findall(rf"{kind} ID: ([^,\s]+),", prompt):
+                item_descriptions[f"{kind.lower()}:{item_id}"] = f"Fake insight {digest[:6]}"
+        return json.dumps(
+            {
+                "item_descriptions": item_descriptions,
+                "ai_player_summary": "Fake Title.Keep going.Finish tasks early.Stay consistent",
+                "challenge_task": {
+                    "name": f"Fake challenge {digest[:6]}",
+                    "description": "Complete this and bag that extra aura",
+                    "due_date": (today + timedelta(days=3)).isoformat(),
+                    "aura": 10 + seed % 3 * 5,
+                },
+            }
+        )
+
+    if purpose == "finance":
+        return json.dumps({"transactions": []})
+
+    return json.dumps({"message": f"fake response {digest[:8]}"})
+
+
+async def fake_generate(purpose: str, prompt: str) -> FakeResponse:
+    if LLM_FAKE_LATENCY_MS:
+        await asyncio.sleep(LLM_FAKE_LATENCY_MS / 1000)
+    return FakeResponse(_fake_text(purpose, prompt))
+
+
+def _get_model():
+    model = gemini.get_gemini_model()
+    if model is None:
+        raise LLMError("Gemini model is not configured.")
+    return model
+
+
+async def generate(prompt: str, purpose: str = "generate", timeout: Optional[float] = None) -> str:
+    if LLM_BACKEND == "fake":
+        return await _call(
+            purpose, prompt, lambda: fake_generate(purpose, prompt), timeout
+        )
+    model = _get_model()
+    return await _call(
+        purpose, prompt, lambda: model.generate_content_async(prompt), timeout
+    )
+
+
+class LLMChatSession:
+    def __init__(self, purpose: str, session: Any):
+        self.purpose = purpose
+        self.session = session
+
+    async def send(self, message: str, timeout: Optional[float] = None) -> str:
+        return await _call(
+            self.purpose,
+            message,
+            lambda: self.session.send_message_async(message),
+            timeout,
+        )
+
+
+def start_chat(history: Optional[List[dict]] = None, purpose: str = "chat") -> LLMChatSession:
+    if LLM_BACKEND == "fake":
+        return LLMChatSession(purpose, FakeChatSession(purpose, history))
+    return LLMChatSession(purpose, _get_model().start_chat(history=history or []))
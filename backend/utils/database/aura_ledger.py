@@ -0,0 +1,232 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import redis.asyncio as redis
+
+from models import redis_models
+from utils.database import change_log
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+AURA_LEDGER_MAX_ENTRIES = int(getenv("AURA_LEDGER_MAX_ENTRIES", 1000))
+AURA_LEDGER_KEEP_ENTRIES = int(getenv("AURA_LEDGER_KEEP_ENTRIES", 100))
+AURA_COMPACTION_BATCH_SIZE = int(getenv("AURA_COMPACTION_BATCH_SIZE", 500))
+
+# Players whose balance moved since it was last written back to their JSON.
+DIRTY_KEY = "aura:dirty"
+# The aura-sorted player registry; player_registry reads it, this module
+# keeps it in step with the balances.
+AURA_REGISTRY_KEY = "registry:players:by_aura"
+
+# Applies a delta to the live balance KEYS[1], seeding it from the player
+# JSON KEYS[2] on first use and flooring it at zero. The delta that was
+# actually applied is appended to the ledger stream KEYS[3] and the aura
+# registry KEYS[4] follows the balance. Returns the new balance, or false
+# when the player is gone.
+APPLY_DELTA_SCRIPT = """
+local raw = redis.call('GET', KEYS[2])
+if not raw then
+    return false
+end
+local balance = tonumber(redis.call('GET', KEYS[1]))
+if not balance then
+    balance = tonumber(cjson.decode(raw)['aura']) or 0
+end
+local updated = math.max(0, balance + tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], updated)
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[5], '*',
+    'delta', updated - balance, 'requested', ARGV[1],
+    'reason', ARGV[2], 'source', ARGV[3], 'balance', updated)
+redis.call('ZADD', KEYS[4], updated, ARGV[4])
+redis.call('SADD', KEYS[5], ARGV[4])
+return updated
+"""
+
+# Writes the live balance KEYS[1] back into the player JSON KEYS[2] and
+# trims the ledger KEYS[3], whose older deltas are now part of the stored
+# aura. The balance key stays authoritative, so profile writes racing with
+# compaction cannot roll the aura back.
+COMPACT_SCRIPT = """
+local balance = redis.call('GET', KEYS[1])
+if not balance then
+    return false
+end
+local raw = redis.call('GET', KEYS[2])
+if not raw then
+    redis.call('DEL', KEYS[1], KEYS[3])
+    return false
+end
+local player = cjson.decode(raw)
+player['aura'] = tonumber(balance)
+redis.call('SET', KEYS[2], cjson.encode(player))
+redis.call('XTRIM', KEYS[3], 'MAXLEN', '~', ARGV[1])
+return tonumber(balance)
+"""
+
+
+def balance_key(username: str) -> str:
+    return f"aura:balance:{username}"
+
+
+def ledger_key(username: str) -> str:
+    return f"aura:ledger:{username}"
+
+
+def remove_ledger_commands(pipe: redis.client.Pipeline, username: str):
+    pipe.delete(balance_key(username), ledger_key(username))
+    pipe.srem(DIRTY_KEY, username)
+
+
+async def queue_delta(
+    r: redis.Redis,
+    pipe: redis.client.Pipeline,
+    username: str,
+    delta: int,
+    reason: str,
+    source: Optional[str] = None,
+):
+    apply_delta_script = r.register_script(APPLY_DELTA_SCRIPT)
+    await apply_delta_script(
+        keys=[
+            balance_key(username),
+            f"player:{username}",
+            ledger_key(username),
+            AURA_REGISTRY_KEY,
+            DIRTY_KEY,
+        ],
+        args=[int(delta), reason, source or "", username, AURA_LEDGER_MAX_ENTRIES],
+        client=pipe,
+    )
+    change_log.add_change_commands(pipe, f"player:{username}", change_log.OP_UPSERT)
+
+
+async def apply_delta(
+    r: redis.Redis,
+    username: str,
+    delta: int,
+    reason: str,
+    source: Optional[str] = None,
+) -> Optional[int]:
+    pipe = r.pipeline(transaction=False)
+    await queue_delta(r, pipe, username, delta, reason, source)
+    balance, _ = await pipe.execute()
+    if balance is None:
+        return None
+    return int(balance)
+
+
+async def apply_deltas(
+    r: redis.Redis, deltas: Sequence[Tuple[str, int, str, Optional[str]]]
+) -> Dict[str, int]:
+    # Applies (username, delta, reason, source) entries in one round trip
+    # and returns each player's final balance.
+    if not deltas:
+        return {}
+    pipe = r.pipeline(transaction=False)
+    for username, delta, reason, source in deltas:
+        await queue_delta(r, pipe, username, delta, reason, source)
+    # Each delta queues the script and its change record.
+    results = (await pipe.execute())[::2]
+    balances: Dict[str, int] = {}
+    for (username, _, _, _), balance in zip(deltas, results):
+        if balance is not None:
+            balances[username] = int(balance)
+    return balances
+
+
+async def get_live_auras(
+    r: redis.Redis, usernames: List[str]
+) -> List[Optional[int]]:
+    if not usernames:
+        return []
+    raw = await r.mget([balance_key(username) for username in usernames])
+    return [int(float(value)) if value is not None else None for value in raw]
+
+
+async def merge_live_auras(
+    r: redis.Redis, players: List[redis_models.Player]
+) -> List[redis_models.Player]:
+    balances = await get_live_auras(r, [player.username for player in players])
+    return [
+        player if balance is None else player.model_copy(update={"aura": balance})
+        for player, balance in zip(players, balances)
+    ]
+
+
+async def get_player(r: redis.Redis, username: str) -> Optional[redis_models.Player]:
+    pipe = r.pipeline(transaction=False)
+    pipe.get(f"player:{username}")
+    pipe.get(balance_key(username))
+    raw, balance = await pipe.execute()
+    if raw is None:
+        return None
+    player = redis_models.Player.model_validate_json(raw)
+    if balance is not None:
+        player = player.model_copy(update={"aura": int(float(balance))})
+    return player
+
+
+async def get_ledger(
+    r: redis.Redis, username: str, count: int = 50
+) -> List[Dict[str, Any]]:
+    entries = await r.xrevrange(ledger_key(username), count=count)
+    ledger = []
+    for entry_id, fields in entries:
+        ledger.append(
+            {
+                "id": entry_id,
+                "at": int(entry_id.split("-")[0]),
+                "delta": int(float(fields.get("delta", 0))),
+                "requested": int(float(fields.get("requested", 0))),
+                "reason": fields.get("reason", ""),
+                "source": fields.get("source") or None,
+                "balance": int(float(fields.get("balance", 0))),
+            }
+        )
+    return ledger
+
+
+async def compact_players(r: redis.Redis, usernames: List[str]) -> int:
+    compact_script = r.register_script(COMPACT_SCRIPT)
+    pipe = r.pipeline(transaction=False)
+    for username in usernames:
+        await compact_script(
+            keys=[
+                balance_key(username),
+                f"player:{username}",
+                ledger_key(username),
+            ],
+            args=[AURA_LEDGER_KEEP_ENTRIES],
+            client=pipe,
+        )
+    results = await pipe.execute()
+    return sum(1 for result in results if result is not None)
+
+
+async def has_dirty(r: redis.Redis) -> bool:
+    return await r.scard(DIRTY_KEY) > 0
+
+
+async def compact_dirty(
+    r: redis.Redis, batch_size: int = AURA_COMPACTION_BATCH_SIZE
+) -> Dict[str, Any]:
+    started = time.monotonic()
+    stats: Dict[str, Any] = {"players_processed": 0, "compacted": 0}
+    while True:
+        usernames = await r.spop(DIRTY_KEY, batch_size)
+        if not usernames:
+            break
+        stats["players_processed"] += len(usernames)
+        try:
+            stats["compacted"] += await compact_players(r, usernames)
+        except Exception as e:
+            # Put the batch back so the next run retries it.
+            await r.sadd(DIRTY_KEY, *usernames)
+            logger.error(f"Aura compaction failed for a batch: {e}", exc_info=True)
+            stats["error"] = str(e)
+            break
+    stats["duration_seconds"] = round(time.monotonic() - started, 2)
+    logger.info(f"Aura compaction finished. Stats: {stats}")
+    return stats
@@ -0,0 +1,166 @@
+import json
+import logging
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from models import redis_models
+from utils.general import change_tracker
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_MAX_ENTRIES = int(getenv("CHANGE_LOG_MAX_ENTRIES", 1000))
+CHANGE_LOG_TRIM_SLACK = int(getenv("CHANGE_LOG_TRIM_SLACK", 100))
+# Oldest data version whose changes may have been trimmed from the log; a
+# cursor before it cannot be served as a delta.
+CHANGES_FLOOR_FIELD = "changes_floor"
+LOGGED_PREFIXES = ("task:", "habit:", "routine:", "player:")
+PLAYER_TYPE = "player"
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+ENTITY_MODELS = {
+    "habit": redis_models.Habit,
+    "task": redis_models.Task,
+    "routine": redis_models.Routine,
+}
+
+# Clients send a per-tab id in this header; changes made while handling the
+# request carry it as their origin, so a client can skip the events its own
+# writes caused.
+CLIENT_ID_HEADER = "X-Client-Id"
+CLIENT_ID_MAX_LENGTH = 64
+change_origin: ContextVar[str] = ContextVar("change_origin", default="")
+
+# Bumps the data version in the tracking hash KEYS[1], appends the change
+# to the stream KEYS[2] under the ID "<version>-0", so a version is also a
+# stream cursor, and publishes it on the player's event channel ARGV[8].
+# ARGV[9] is the origin of the change, empty when it has none.
+# Past the cap plus some slack the oldest entries are trimmed and the floor
+# recorded. Returns the new version.
+RECORD_CHANGE_SCRIPT = """
+local version = redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+redis.call('XADD', KEYS[2], version .. '-0', 'op', ARGV[2], 'type', ARGV[3], 'id', ARGV[4], 'origin', ARGV[9])
+redis.call('PUBLISH', ARGV[8], cjson.encode({
+    version = version, op = ARGV[2], type = ARGV[3], id = ARGV[4], origin = ARGV[9]
+}))
+local cap = tonumber(ARGV[5])
+local length = redis.call('XLEN', KEYS[2])
+if length > cap + tonumber(ARGV[6]) then
+    local oldest = redis.call('XRANGE', KEYS[2], '-', '+', 'COUNT', length - cap)
+    local floor = tonumber(string.match(oldest[#oldest][1], '^(%d+)'))
+    redis.call('HSET', KEYS[1], ARGV[7], floor)
+    redis.call('XTRIM', KEYS[2], 'MINID', floor + 1)
+end
+return version
+"""
+
+
+def changes_key(username: str) -> str:
+    return f"changes:{username}"
+
+
+def events_channel(username: str) -> str:
+    return f"events:{username}"
+
+
+def is_logged_key(key: str) -> bool:
+    return key.startswith(LOGGED_PREFIXES)
+
+
+def set_change_origin(client_id: Optional[str]):
+    change_origin.set((client_id or "")[:CLIENT_ID_MAX_LENGTH])
+
+
+def add_change_commands(pipe: redis.client.Pipeline, key: str, op: str):
+    if not is_logged_key(key):
+        return
+    # Item keys are "<type>:<username>:<id>", player keys "player:<username>".
+    parts = key.split(":", 2)
+    if parts[0] == PLAYER_TYPE:
+        entity_type, username, entity_id = PLAYER_TYPE, parts[1], parts[1]
+    else:
+        entity_type, username, entity_id = parts
+    pipe.eval(
+        RECORD_CHANGE_SCRIPT,
+        2,
+        change_tracker.tracking_key(username),
+        changes_key(username),
+        change_tracker.DATA_VERSION_FIELD,
+        op,
+        entity_type,
+        entity_id,
+        CHANGE_LOG_MAX_ENTRIES,
+        CHANGE_LOG_TRIM_SLACK,
+        CHANGES_FLOOR_FIELD,
+        events_channel(username),
+        change_origin.get(),
+    )
+
+
+def parse_entry(entry_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "version": int(entry_id.split("-")[0]),
+        "op": fields.get("op"),
+        "type": fields.get("type"),
+        "id": fields.get("id"),
+        "origin": fields.get("origin") or None,
+    }
+
+
+def parse_event(raw: str) -> Dict[str, Any]:
+    # Published events carry the same fields as a logged entry.
+    event = json.loads(raw)
+    return {
+        "version": int(event["version"]),
+        "op": event.get("op"),
+        "type": event.get("type"),
+        "id": event.get("id"),
+        "origin": event.get("origin") or None,
+    }
+
+
+async def read_entries(
+    r: redis.Redis, username: str, since: int
+) -> Tuple[int, Optional[List[Dict[str, Any]]]]:
+    # Returns the current data version and the changes logged after since,
+    # oldest first, or None when since is outside the retained log.
+    pipe = r.pipeline(transaction=True)
+    pipe.hmget(
+        change_tracker.tracking_key(username),
+        change_tracker.DATA_VERSION_FIELD,
+        CHANGES_FLOOR_FIELD,
+    )
+    pipe.xrange(changes_key(username), f"({since}-0", "+")
+    (version, floor), entries = await pipe.execute()
+    version = int(version or 0)
+    if since > version or since < int(floor or 0):
+        return version, None
+    return version, [parse_entry(entry_id, fields) for entry_id, fields in entries]
+
+
+async def read_changes(
+    r: redis.Redis, username: str, since: int
+) -> Tuple[int, Optional[Dict[Tuple[str, str], str]]]:
+    # Collapses read_entries to the last op per (type, id).
+    version, entries = await read_entries(r, username, since)
+    if entries is None:
+        return version, None
+    changed: Dict[Tuple[str, str], str] = {}
+    for entry in entries:
+        changed[(entry["type"], entry["id"])] = entry["op"]
+    return version, changed
+
+
+def changed_keys(
+    username: str, changed: Dict[Tuple[str, str], str]
+) -> List[Tuple[str, str, str]]:
+    # Item keys for the changed entities; the player is always sent whole.
+    return [
+        (entity_type, entity_id, f"{entity_type}:{username}:{entity_id}")
+        for entity_type, entity_id in changed
+        if entity_type != PLAYER_TYPE
+    ]
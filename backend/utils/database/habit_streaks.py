@@ -0,0 +1,252 @@
+import logging
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+import redis.asyncio as redis
+
+from models import redis_models
+from utils.general import recurrence
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+STREAK_WINDOW_DEFAULT_DAYS = 30
+STREAK_WINDOW_MAX_DAYS = int(getenv("STREAK_WINDOW_MAX_DAYS", 366))
+# How far back streaks are walked; older completions still count towards
+# total_completed_days.
+STREAK_HISTORY_MAX_DAYS = int(getenv("STREAK_HISTORY_MAX_DAYS", 3660))
+
+# One bit per day, offset from a per-habit anchor day that is fixed at the
+# first completion, so refreshing a habit's start_date keeps its history.
+# Kept out of the "habit:" namespace so habit scans never see them.
+STREAK_BITS_PREFIX = "streak:bits:"
+HABIT_KEY_PREFIX = "habit:"
+
+# Sets the bit for day ARGV[3] (an ordinal), or clears every bit from day
+# ARGV[5] up to it, fixing the anchor ARGV[2] on first use. Returns the bit
+# offset, or -1 for days before the anchor.
+MARK_DAY_SCRIPT = """
+local anchor = tonumber(redis.call('HGET', KEYS[2], ARGV[1]))
+if not anchor then
+    anchor = tonumber(ARGV[2])
+    redis.call('HSET', KEYS[2], ARGV[1], anchor)
+end
+local offset = tonumber(ARGV[3]) - anchor
+if offset < 0 then
+    return -1
+end
+if ARGV[4] == '1' then
+    redis.call('SETBIT', KEYS[1], offset, 1)
+else
+    for bit = math.max(tonumber(ARGV[5]) - anchor, 0), offset do
+        redis.call('SETBIT', KEYS[1], bit, 0)
+    end
+end
+return offset
+"""
+
+# Walks the runs of set bits between bit offsets ARGV[1] and ARGV[2] with
+# BITPOS, returning them as a flat list of start, end pairs.
+RUNS_SCRIPT = """
+local last = tonumber(ARGV[2])
+local pos = tonumber(ARGV[1])
+local runs = {}
+while pos <= last do
+    local first_set = redis.call('BITPOS', KEYS[1], 1, pos, last, 'BIT')
+    if first_set < 0 then
+        break
+    end
+    local first_clear = redis.call('BITPOS', KEYS[1], 0, first_set, last, 'BIT')
+    if first_clear < 0 then
+        first_clear = last + 1
+    end
+    runs[#runs + 1] = first_set
+    runs[#runs + 1] = first_clear - 1
+    pos = first_clear
+end
+return runs
+"""
+
+
+def bits_key(username: str, habit_id: str) -> str:
+    return f"{STREAK_BITS_PREFIX}{username}:{habit_id}"
+
+
+def anchors_key(username: str) -> str:
+    return f"streak:anchors:{username}"
+
+
+def is_habit_key(key: str) -> bool:
+    return key.startswith(HABIT_KEY_PREFIX)
+
+
+def remove_streak_commands(pipe: redis.client.Pipeline, key: str):
+    if is_habit_key(key):
+        # Habit keys are "habit:<username>:<id>".
+        _, username, habit_id = key.split(":", 2)
+        pipe.delete(bits_key(username, habit_id))
+        pipe.hdel(anchors_key(username), habit_id)
+
+
+async def queue_mark_day(
+    r: redis.Redis,
+    pipe: redis.client.Pipeline,
+    habit: redis_models.Habit,
+    day: date,
+    done: bool,
+):
+    # Uncompleting clears the whole period up to day, so an earlier
+    # completion in it no longer counts towards the streak.
+    mark_day = r.register_script(MARK_DAY_SCRIPT)
+    anchor = min(habit.start_date, day)
+    first_day, _ = recurrence.current_period(
+        habit.start_date, habit.occurence, habit.x_occurence, day
+    )
+    await mark_day(
+        keys=[bits_key(habit.userId, habit.id), anchors_key(habit.userId)],
+        args=[
+            habit.id,
+            anchor.toordinal(),
+            day.toordinal(),
+            1 if done else 0,
+            first_day.toordinal(),
+        ],
+        client=pipe,
+    )
+
+
+def period_start(habit: redis_models.Habit, index: int) -> date:
+    return recurrence.add_period(habit.start_date, habit.occurence, habit.x_occurence * index)
+
+
+def period_boundaries(
+    habit: redis_models.Habit, first_day: date, last_day: date
+) -> List[date]:
+    # Start days of the habit's periods covering first_day..last_day, plus
+    # the start of the period after last_day. Periods are laid out from
+    # start_date in both directions.
+    if habit.x_occurence <= 0:
+        return []
+    first = recurrence.period_index(habit.start_date, habit.occurence, habit.x_occurence, first_day)
+    last = recurrence.period_index(habit.start_date, habit.occurence, habit.x_occurence, last_day)
+    return [period_start(habit, index) for index in range(first, last + 2)]
+
+
+def completed_periods(
+    runs: List[Tuple[int, int]], boundaries: List[int]
+) -> np.ndarray:
+    # boundaries are bit offsets of period starts, the last one closing the
+    # final period. A period counts as completed when any run overlaps it.
+    starts = np.asarray(boundaries[:-1], dtype=np.int64)
+    ends = np.asarray(boundaries[1:], dtype=np.int64) - 1
+    done = np.zeros(len(starts), dtype=bool)
+    for run_start, run_end in runs:
+        first = max(np.searchsorted(ends, run_start, side="left"), 0)
+        last = np.searchsorted(starts, run_end, side="right")
+        done[first:last] = True
+    return done
+
+
+def longest_true_run(flags: np.ndarray) -> int:
+    if not flags.any():
+        return 0
+    padded = np.concatenate(([0], flags.astype(np.int8), [0]))
+    changes = np.flatnonzero(np.diff(padded))
+    return int((changes[1::2] - changes[::2]).max())
+
+
+def current_true_run(flags: np.ndarray) -> int:
+    # The last period is still open, so an unfinished one does not break
+    # the streak.
+    if len(flags) and not flags[-1]:
+        flags = flags[:-1]
+    if not len(flags) or not flags[-1]:
+        return 0
+    misses = np.flatnonzero(~flags)
+    return int(len(flags) - (misses[-1] + 1 if len(misses) else 0))
+
+
+async def get_streak(
+    r: redis.Redis,
+    habit: redis_models.Habit,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> dict:
+    if habit.x_occurence <= 0:
+        raise ValueError("Habit has no valid recurrence to compute streaks for.")
+    today = date.today()
+    end = end or today
+    start = start or end - timedelta(days=STREAK_WINDOW_DEFAULT_DAYS - 1)
+    if end < start:
+        raise ValueError("Window end must not be before its start.")
+    if end > today + timedelta(days=1):
+        raise ValueError("Window end must not be in the future.")
+    if (end - start).days + 1 > STREAK_WINDOW_MAX_DAYS:
+        raise ValueError(f"Window must not be longer than {STREAK_WINDOW_MAX_DAYS} days.")
+
+    key = bits_key(habit.userId, habit.id)
+    stats = {
+        "habit_id": habit.id,
+        "occurence": habit.occurence,
+        "x_occurence": habit.x_occurence,
+        "current_streak": 0,
+        "longest_streak": 0,
+        "first_completed": None,
+        "last_completed": None,
+        "total_completed_days": 0,
+        "window_start": start,
+        "window_end": end,
+        "window_days": (end - start).days + 1,
+        "window_completed_days": 0,
+        "window_periods": 0,
+        "window_completed_periods": 0,
+        "completion_rate": 0.0,
+    }
+    anchor_ordinal = await r.hget(anchors_key(habit.userId), habit.id)
+    if anchor_ordinal is None:
+        return stats
+    anchor = date.fromordinal(int(anchor_ordinal))
+    last_day = max(today, end)
+    history_start = max(anchor, last_day - timedelta(days=STREAK_HISTORY_MAX_DAYS))
+    history_end = (last_day - anchor).days
+
+    pipe = r.pipeline(transaction=False)
+    pipe.eval(RUNS_SCRIPT, 1, key, (history_start - anchor).days, history_end)
+    pipe.bitcount(key)
+    pipe.bitpos(key, 1)
+    window_first = max((start - anchor).days, 0)
+    window_last = (end - anchor).days
+    if window_last >= 0:
+        pipe.bitcount(key, window_first, window_last, "BIT")
+    flat_runs, total, first_set, *window = await pipe.execute()
+    runs = [(flat_runs[i], flat_runs[i + 1]) for i in range(0, len(flat_runs), 2)]
+
+    boundary_days = period_boundaries(habit, history_start, last_day)
+    boundaries = [(day - anchor).days for day in boundary_days]
+    done = completed_periods(runs, boundaries)
+    # Only periods up to the one containing today count towards streaks.
+    current_index = int(np.searchsorted(boundaries, (today - anchor).days, side="right")) - 1
+    stats["current_streak"] = current_true_run(done[: current_index + 1])
+    stats["longest_streak"] = longest_true_run(done[: current_index + 1])
+    stats["total_completed_days"] = total
+    if runs:
+        stats["first_completed"] = anchor + timedelta(days=first_set)
+        stats["last_completed"] = anchor + timedelta(days=runs[-1][1])
+
+    window_starts = np.asarray(boundaries[:-1])
+    window_ends = np.asarray(boundaries[1:]) - 1
+    # Periods that have not started yet are not counted against the rate.
+    in_window = (
+        (window_ends >= (start - anchor).days)
+        & (window_starts <= window_last)
+        & (window_starts <= (today - anchor).days)
+    )
+    stats["window_completed_days"] = window[0] if window else 0
+    stats["window_periods"] = int(in_window.sum())
+    stats["window_completed_periods"] = int((done & in_window).sum())
+    if stats["window_periods"]:
+        stats["completion_rate"] = round(
+            stats["window_completed_periods"] / stats["window_periods"], 4
+        )
+    return stats
@@ -0,0 +1,153 @@
+import logging
+import uuid
+import zlib
+from datetime import date
+from typing import Optional
+
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from models import redis_models
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+# Open tasks and routines keyed by their item key, scored by the ordinal of
+# the date they fall due, so overdue items are a single range query. The
+# index is split into shards by username so shards can be processed by
+# separate workers.
+DUE_INDEX_SHARDS = int(getenv("DUE_INDEX_SHARDS", 8))
+DUE_INDEX_BUILT_KEY = "due:index:built"
+# Rebuilds fill these and swap them in, so readers never see a partial
+# index. Left over only when a rebuild dies midway.
+DUE_REBUILD_PREFIX = "due:rebuild:"
+DUE_REBUILD_TTL_SECONDS = int(getenv("DUE_REBUILD_TTL_SECONDS", 3600))
+INDEXED_PREFIXES = ("task:", "routine:")
+
+
+def shard_of(username: str, shards: int = DUE_INDEX_SHARDS) -> int:
+    return zlib.crc32(username.encode("utf-8")) % shards
+
+
+def due_index_key(shard: int) -> str:
+    return f"due:index:{shard}"
+
+
+def key_shard(key: str) -> int:
+    # Item keys are "<type>:<username>:<id>".
+    return shard_of(key.split(":", 2)[1])
+
+
+def is_indexed_key(key: str) -> bool:
+    return key.startswith(INDEXED_PREFIXES)
+
+
+def item_due_date(item: BaseModel) -> Optional[date]:
+    if isinstance(item, redis_models.Task):
+        return None if item.completed else item.due_date
+    if isinstance(item, redis_models.Routine):
+        return item.next_due
+    return None
+
+
+def add_index_commands(
+    pipe: redis.client.Pipeline, key: str, item: BaseModel, index_key=due_index_key
+):
+    if not is_indexed_key(key):
+        return
+    due = item_due_date(item)
+    if due is None:
+        pipe.zrem(index_key(key_shard(key)), key)
+    else:
+        pipe.zadd(index_key(key_shard(key)), {key: due.toordinal()})
+
+
+def remove_index_commands(pipe: redis.client.Pipeline, key: str):
+    if is_indexed_key(key):
+        pipe.zrem(due_index_key(key_shard(key)), key)
+
+
+async def get_overdue_keys(r: redis.Redis, shard: int, today: date) -> list:
+    return await r.zrangebyscore(due_index_key(shard), "-inf", today.toordinal() - 1)
+
+
+async def remove_from_index(r: redis.Redis, shard: int, keys: list):
+    if keys:
+        await r.zrem(due_index_key(shard), *keys)
+
+
+async def rebuild_due_index(r: redis.Redis) -> int:
+    # Writes racing with the rebuild land in the live shards and are
+    # replaced by what the scan read; the penalty job re-checks every
+    # overdue entry against the stored item.
+    prefix = f"{DUE_REBUILD_PREFIX}{uuid.uuid4().hex}:"
+
+    def rebuild_key(shard: int) -> str:
+        return f"{prefix}{shard}"
+
+    indexed = 0
+    for item_prefix, model_class in (
+        ("task:", redis_models.Task),
+        ("routine:", redis_models.Routine),
+    ):
+        batch = []
+        async for key in r.scan_iter(match=f"{item_prefix}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                indexed += await _index_keys(r, batch, model_class, rebuild_key)
+                batch = []
+        if batch:
+            indexed += await _index_keys(r, batch, model_class, rebuild_key)
+
+    # Shards left by an earlier, larger shard count.
+    live_keys = {due_index_key(shard) for shard in range(DUE_INDEX_SHARDS)}
+    stale_keys = [
+        key
+        async for key in r.scan_iter(match="due:index:*")
+        if key != DUE_INDEX_BUILT_KEY and key not in live_keys
+    ]
+    pipe = r.pipeline(transaction=False)
+    for shard in range(DUE_INDEX_SHARDS):
+        pipe.exists(rebuild_key(shard))
+    built = await pipe.execute()
+    pipe = r.pipeline(transaction=True)
+    for shard, exists in enumerate(built):
+        if exists:
+            pipe.rename(rebuild_key(shard), due_index_key(shard))
+            pipe.persist(due_index_key(shard))
+        else:
+            pipe.delete(due_index_key(shard))
+    if stale_keys:
+        pipe.delete(*stale_keys)
+    pipe.set(DUE_INDEX_BUILT_KEY, DUE_INDEX_SHARDS)
+    await pipe.execute()
+    logger.info(
+        f"Due-date index rebuilt with {indexed} items across {DUE_INDEX_SHARDS} shards."
+    )
+    return indexed
+
+
+async def _index_keys(r: redis.Redis, keys: list, model_class, index_key) -> int:
+    raw_items = await r.mget(keys)
+    pipe = r.pipeline(transaction=False)
+    indexed = 0
+    for key, raw in zip(keys, raw_items):
+        if raw is None:
+            continue
+        try:
+            item = model_class.model_validate_json(raw)
+        except Exception as e:
+            logger.error(f"Skipping unreadable item {key} while indexing: {e}")
+            continue
+        add_index_commands(pipe, key, item, index_key)
+        indexed += 1
+    for shard in {key_shard(key) for key in keys}:
+        pipe.expire(index_key(shard), DUE_REBUILD_TTL_SECONDS)
+    await pipe.execute()
+    return indexed
+
+
+async def ensure_due_index(r: redis.Redis):
+    # Also rebuilds when the shard count changed since the last build.
+    if await r.get(DUE_INDEX_BUILT_KEY) != str(DUE_INDEX_SHARDS):
+        await rebuild_due_index(r)
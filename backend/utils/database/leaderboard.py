@@ -0,0 +1,63 @@
+import logging
+from typing import List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from models.pydantic_models import LeaderboardEntry
+from utils.database import player_registry
+
+logger = logging.getLogger(__name__)
+
+# The leaderboards are the registry's aura and level sorted sets, which are
+# updated with every player write and by the penalty script.
+LEADERBOARD_FIELDS = (player_registry.SORT_AURA, player_registry.SORT_LEVEL)
+
+
+def leaderboard_key(by: str) -> str:
+    if by not in LEADERBOARD_FIELDS:
+        raise ValueError(f"Unsupported leaderboard: {by}")
+    return player_registry.sorted_registry_key(by)
+
+
+async def _ranked_entries(
+    r: redis.Redis, key: str, entries: List[Tuple[str, float]]
+) -> List[LeaderboardEntry]:
+    # Players with equal scores share a rank ("1, 2, 2, 4"): one more than
+    # the number of players with a strictly higher score.
+    scores = list(dict.fromkeys(score for _, score in entries))
+    pipe = r.pipeline(transaction=False)
+    for score in scores:
+        pipe.zcount(key, f"({score}", "+inf")
+    higher_counts = await pipe.execute()
+    ranks = {score: higher + 1 for score, higher in zip(scores, higher_counts)}
+    return [
+        LeaderboardEntry(rank=ranks[score], username=username, score=int(score))
+        for username, score in entries
+    ]
+
+
+async def get_top(r: redis.Redis, by: str, limit: int) -> List[LeaderboardEntry]:
+    key = leaderboard_key(by)
+    await player_registry.ensure_registry(r)
+    entries = await r.zrange(key, 0, limit - 1, desc=True, withscores=True)
+    return await _ranked_entries(r, key, entries)
+
+
+async def get_standing(
+    r: redis.Redis, by: str, username: str, neighbors: int
+) -> Optional[Tuple[LeaderboardEntry, List[LeaderboardEntry], int]]:
+    key = leaderboard_key(by)
+    await player_registry.ensure_registry(r)
+    pipe = r.pipeline(transaction=False)
+    pipe.zrevrank(key, username)
+    pipe.zscore(key, username)
+    pipe.zcard(key)
+    position, score, total = await pipe.execute()
+    if position is None or score is None:
+        return None
+
+    start = max(0, position - neighbors)
+    entries = await r.zrange(key, start, position + neighbors, desc=True, withscores=True)
+    around = await _ranked_entries(r, key, entries)
+    player_entry = next(entry for entry in around if entry.username == username)
+    return player_entry, around, total
@@ -0,0 +1,347 @@
+import logging
+from datetime import date
+from typing import List, Optional, Tuple
+
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from models import redis_models
+from utils.general import recurrence
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+LIST_SCAN_BATCH = int(getenv("LIST_SCAN_BATCH", 200))
+
+# Per-user secondary indexes over tasks, habits and routines, so filtered
+# and sorted list views only load the items on the requested page. Kept
+# out of the item namespaces so prefix scans never see them.
+LIST_INDEX_PREFIX = "list:"
+LIST_INDEXED_PREFIXES = ("task:", "habit:", "routine:")
+LIST_BUILT_KEY_PREFIX = "list:built:"
+# Bumped whenever the set of index keys changes, to force a rebuild.
+LIST_INDEX_VERSION = "2"
+
+SORT_DUE = "due"
+SORT_AURA = "aura"
+SORT_FIELDS = (SORT_DUE, SORT_AURA)
+OCCURENCES = (recurrence.DAYS, recurrence.WEEKS, recurrence.MONTHS)
+
+# Walks the sort index KEYS[1] from rank ARGV[1] in the order given by
+# ARGV[3], keeping ids that pass the filters, until ARGV[2] are kept (all
+# of them when it is 0):
+# completion state ARGV[6] against KEYS[3], membership of the occurence set
+# KEYS[4] when ARGV[7] is set and a due range ARGV[4]..ARGV[5] against
+# KEYS[2]. For tasks KEYS[3] is the completed set; for recurring items
+# (ARGV[10] set) it scores each id by the day its completion runs out,
+# compared with today's ordinal ARGV[11]. When sorting by due date
+# (ARGV[8]) the walk stops at the end of the range. Returns the kept ids and
+# the last kept score.
+QUERY_SCRIPT = """
+local pos = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local desc = ARGV[3] == '1'
+local due_min = tonumber(ARGV[4])
+local due_max = tonumber(ARGV[5])
+local completed = ARGV[6]
+local by_occurence = ARGV[7] == '1'
+local sorted_by_due = ARGV[8] == '1'
+local batch = tonumber(ARGV[9])
+local recurring = ARGV[10] == '1'
+local today = tonumber(ARGV[11])
+local ids = {}
+local last_score = false
+local done = false
+while not done do
+    local chunk
+    if desc then
+        chunk = redis.call('ZREVRANGE', KEYS[1], pos, pos + batch - 1, 'WITHSCORES')
+    else
+        chunk = redis.call('ZRANGE', KEYS[1], pos, pos + batch - 1, 'WITHSCORES')
+    end
+    if #chunk == 0 then
+        break
+    end
+    for i = 1, #chunk, 2 do
+        local id = chunk[i]
+        local score = tonumber(chunk[i + 1])
+        if sorted_by_due and ((desc and due_min and score < due_min) or (not desc and due_max and score > due_max)) then
+            done = true
+            break
+        end
+        local keep = true
+        if completed ~= '' then
+            local is_completed
+            if recurring then
+                local expires = tonumber(redis.call('ZSCORE', KEYS[3], id))
+                is_completed = expires ~= nil and today < expires
+            else
+                is_completed = redis.call('SISMEMBER', KEYS[3], id) == 1
+            end
+            keep = is_completed == (completed == '1')
+        end
+        if keep and by_occurence then
+            keep = redis.call('SISMEMBER', KEYS[4], id) == 1
+        end
+        if keep and (due_min or due_max) then
+            local due = tonumber(redis.call('ZSCORE', KEYS[2], id))
+            keep = due ~= nil and (not due_min or due >= due_min) and (not due_max or due <= due_max)
+        end
+        if keep then
+            ids[#ids + 1] = id
+            last_score = chunk[i + 1]
+            if #ids == limit then
+                done = true
+                break
+            end
+        end
+    end
+    pos = pos + batch
+end
+return {ids, last_score}
+"""
+
+
+def is_list_indexed_key(key: str) -> bool:
+    return key.startswith(LIST_INDEXED_PREFIXES)
+
+
+def index_key(item_type: str, username: str, name: str) -> str:
+    return f"{LIST_INDEX_PREFIX}{item_type}:{username}:{name}"
+
+
+def sort_key(item_type: str, username: str, sort: str) -> str:
+    return index_key(item_type, username, f"by_{sort}")
+
+
+def completed_key(item_type: str, username: str) -> str:
+    return index_key(item_type, username, "completed")
+
+
+def completed_until_key(item_type: str, username: str) -> str:
+    return index_key(item_type, username, "completed_until")
+
+
+def is_recurring_type(item_type: str) -> bool:
+    return item_type != "task"
+
+
+def occurence_key(item_type: str, username: str, occurence: str) -> str:
+    return index_key(item_type, username, f"occurence:{occurence}")
+
+
+def built_key(username: str) -> str:
+    return f"{LIST_BUILT_KEY_PREFIX}{username}"
+
+
+def item_due(item: BaseModel) -> Optional[date]:
+    if isinstance(item, redis_models.Task):
+        return item.due_date
+    return getattr(item, "next_due", None)
+
+
+def item_completed_until(item: BaseModel) -> date:
+    # Recurring completion depends on the day, so it is indexed as the day
+    # it runs out and decided when the query runs.
+    return recurrence.completed_until(
+        item.start_date, item.occurence, item.x_occurence, item.last_completed
+    )
+
+
+def add_list_index_commands(pipe: redis.client.Pipeline, key: str, item: BaseModel):
+    if not is_list_indexed_key(key):
+        return
+    # Item keys are "<type>:<username>:<id>".
+    item_type, username, item_id = key.split(":", 2)
+    due = item_due(item)
+    if due is not None:
+        pipe.zadd(sort_key(item_type, username, SORT_DUE), {item_id: due.toordinal()})
+    pipe.zadd(sort_key(item_type, username, SORT_AURA), {item_id: item.aura})
+    if isinstance(item, redis_models.Task):
+        if item.completed:
+            pipe.sadd(completed_key(item_type, username), item_id)
+        else:
+            pipe.srem(completed_key(item_type, username), item_id)
+    else:
+        pipe.zadd(
+            completed_until_key(item_type, username),
+            {item_id: item_completed_until(item).toordinal()},
+        )
+    occurence = getattr(item, "occurence", None)
+    if occurence is not None:
+        for other in OCCURENCES:
+            pipe.srem(occurence_key(item_type, username, other), item_id)
+        occurence = str(getattr(occurence, "value", occurence))
+        pipe.sadd(occurence_key(item_type, username, occurence), item_id)
+
+
+def remove_list_index_commands(pipe: redis.client.Pipeline, key: str):
+    if not is_list_indexed_key(key):
+        return
+    item_type, username, item_id = key.split(":", 2)
+    for sort in SORT_FIELDS:
+        pipe.zrem(sort_key(item_type, username, sort), item_id)
+    if not is_recurring_type(item_type):
+        pipe.srem(completed_key(item_type, username), item_id)
+    else:
+        pipe.zrem(completed_until_key(item_type, username), item_id)
+        for occurence in OCCURENCES:
+            pipe.srem(occurence_key(item_type, username, occurence), item_id)
+
+
+async def rebuild_list_index(
+    r: redis.Redis, item_type: str, username: str, model_class
+) -> int:
+    # Only adds entries: writes racing with the rebuild keep the index
+    # current through the write hooks, and ids whose item is gone are
+    # dropped when a query runs into them.
+    indexed = 0
+    batch = []
+    async for key in r.scan_iter(match=f"{item_type}:{username}:*", count=500):
+        batch.append(key)
+        if len(batch) >= 500:
+            indexed += await _index_keys(r, batch, model_class)
+            batch = []
+    if batch:
+        indexed += await _index_keys(r, batch, model_class)
+    if is_recurring_type(item_type):
+        # Left by version 1, which froze recurring completion at write time.
+        await r.delete(completed_key(item_type, username))
+    await r.hset(built_key(username), item_type, LIST_INDEX_VERSION)
+    logger.info(f"List index for {item_type}s of {username} rebuilt with {indexed} items.")
+    return indexed
+
+
+async def _index_keys(r: redis.Redis, keys: List[str], model_class) -> int:
+    raw_items = await r.mget(keys)
+    pipe = r.pipeline(transaction=False)
+    indexed = 0
+    for key, raw in zip(keys, raw_items):
+        if raw is None:
+            continue
+        try:
+            item = model_class.model_validate_json(raw)
+        except Exception as e:
+            logger.error(f"Skipping unreadable item {key} while indexing: {e}")
+            continue
+        add_list_index_commands(pipe, key, item)
+        indexed += 1
+    await pipe.execute()
+    return indexed
+
+
+async def ensure_list_index(r: redis.Redis, item_type: str, username: str, model_class):
+    if await r.hget(built_key(username), item_type) != LIST_INDEX_VERSION:
+        await rebuild_list_index(r, item_type, username, model_class)
+
+
+def encode_cursor(score: float, item_id: str) -> str:
+    return f"{score!r}|{item_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    score, _, item_id = cursor.partition("|")
+    try:
+        return float(score), item_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+async def _start_rank(r: redis.Redis, key: str, cursor: Optional[str], descending: bool) -> int:
+    if not cursor:
+        return 0
+    score, item_id = decode_cursor(cursor)
+    current = await r.zscore(key, item_id)
+    if current is not None and current == score:
+        rank = await (r.zrevrank(key, item_id) if descending else r.zrank(key, item_id))
+        return rank + 1
+    # The cursor's item moved or was deleted since the page was served, so
+    # count where it would sit among the items tied on its old score.
+    ties = await r.zrangebyscore(key, score, score)
+    if descending:
+        start = await r.zcount(key, f"({score}", "+inf")
+        return start + sum(1 for tie in ties if tie > item_id)
+    start = await r.zcount(key, "-inf", f"({score}")
+    return start + sum(1 for tie in ties if tie < item_id)
+
+
+async def query_items(
+    r: redis.Redis,
+    item_type: str,
+    username: str,
+    model_class,
+    completed: Optional[bool] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+    occurence: Optional[str] = None,
+    sort: str = SORT_DUE,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[BaseModel], Optional[str]]:
+    # Without a limit every matching item is returned and there is no
+    # next cursor.
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Unsupported sort field: {sort}")
+    if occurence is not None:
+        if occurence not in OCCURENCES:
+            raise ValueError(f"Unsupported occurence: {occurence}")
+        if "occurence" not in model_class.model_fields:
+            raise ValueError(f"{item_type.capitalize()}s have no occurence to filter on.")
+    if due_from and due_to and due_to < due_from:
+        raise ValueError("due_to must not be before due_from.")
+    await ensure_list_index(r, item_type, username, model_class)
+
+    key = sort_key(item_type, username, sort)
+    recurring = is_recurring_type(item_type)
+    start = await _start_rank(r, key, cursor, descending)
+    if sort == SORT_DUE and not cursor:
+        # Skip straight to the start of the due range.
+        if descending and due_to:
+            start = await r.zcount(key, f"({due_to.toordinal()}", "+inf")
+        elif not descending and due_from:
+            start = await r.zcount(key, "-inf", f"({due_from.toordinal()}")
+
+    ids, last_score = await r.eval(
+        QUERY_SCRIPT,
+        4,
+        key,
+        sort_key(item_type, username, SORT_DUE),
+        completed_until_key(item_type, username) if recurring else completed_key(item_type, username),
+        occurence_key(item_type, username, occurence or recurrence.DAYS),
+        start,
+        limit or 0,
+        1 if descending else 0,
+        due_from.toordinal() if due_from else "",
+        due_to.toordinal() if due_to else "",
+        "" if completed is None else int(completed),
+        1 if occurence else 0,
+        1 if sort == SORT_DUE else 0,
+        LIST_SCAN_BATCH,
+        1 if recurring else 0,
+        date.today().toordinal(),
+    )
+    if not ids:
+        return [], None
+
+    raw_items = await r.mget([f"{item_type}:{username}:{item_id}" for item_id in ids])
+    items = []
+    missing = []
+    for item_id, raw in zip(ids, raw_items):
+        if raw is None:
+            missing.append(item_id)
+            continue
+        try:
+            items.append(model_class.model_validate_json(raw))
+        except Exception as e:
+            logger.error(f"Skipping unreadable {item_type} {item_id} for {username}: {e}")
+    if missing:
+        logger.warning(f"Dropping {len(missing)} stale list index entries for {item_type}s of {username}")
+        pipe = r.pipeline(transaction=False)
+        for item_id in missing:
+            remove_list_index_commands(pipe, f"{item_type}:{username}:{item_id}")
+        await pipe.execute()
+    next_cursor = (
+        encode_cursor(float(last_score), ids[-1]) if limit and len(ids) == limit else None
+    )
+    return items, next_cursor
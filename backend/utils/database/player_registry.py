@@ -0,0 +1,286 @@
+import logging
+import time
+import uuid
+from typing import AsyncIterator, List, Optional, Tuple
+
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from models import redis_models
+from utils.database import aura_ledger
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+PLAYER_PAGE_SIZE = int(getenv("PLAYER_PAGE_SIZE", 200))
+
+# Every username with score 0, so the set is ordered lexicographically and
+# can be walked with ZRANGE BYLEX from the last username seen. Unlike rank
+# offsets, that cursor stays correct while players sign up or leave.
+REGISTRY_KEY = "registry:players"
+REGISTRY_BUILT_KEY = "registry:players:built"
+# Bumped whenever the set of registry keys changes, to force a rebuild.
+REGISTRY_VERSION = "2"
+PLAYER_KEY_PREFIX = "player:"
+# Rebuilds fill these and swap them in, so listings never see a partial
+# registry. Left over only when a rebuild dies midway.
+REGISTRY_REBUILD_PREFIX = "registry:rebuild:"
+REGISTRY_REBUILD_TTL_SECONDS = int(getenv("REGISTRY_REBUILD_TTL_SECONDS", 3600))
+
+# Scored registries used for sorted listings; username sorting uses the
+# lexicographic REGISTRY_KEY itself.
+SORT_USERNAME = "username"
+SORT_AURA = "aura"
+SORT_LEVEL = "level"
+SORT_SIGNUP = "signup"
+SORT_FIELDS = (SORT_USERNAME, SORT_AURA, SORT_LEVEL, SORT_SIGNUP)
+
+
+def sorted_registry_key(sort: str) -> str:
+    return f"registry:players:by_{sort}"
+
+
+def is_player_key(key: str) -> bool:
+    return key.startswith(PLAYER_KEY_PREFIX)
+
+
+def player_key(username: str) -> str:
+    return f"{PLAYER_KEY_PREFIX}{username}"
+
+
+def _registry_commands(
+    pipe: redis.client.Pipeline,
+    player: redis_models.Player,
+    registry_key: str = REGISTRY_KEY,
+    sorted_key=sorted_registry_key,
+):
+    username = player.username
+    pipe.zadd(registry_key, {username: 0})
+    # Aura changes go through the ledger, which keeps this entry current;
+    # the aura on a profile write may predate the live balance.
+    pipe.zadd(sorted_key(SORT_AURA), {username: player.aura}, nx=True)
+    pipe.zadd(sorted_key(SORT_LEVEL), {username: player.level})
+    # Only the first write of a player sets its signup time.
+    pipe.zadd(sorted_registry_key(SORT_SIGNUP), {username: time.time()}, nx=True)
+
+
+def add_registry_commands(pipe: redis.client.Pipeline, key: str, player: BaseModel):
+    if is_player_key(key) and isinstance(player, redis_models.Player):
+        _registry_commands(pipe, player)
+
+
+def remove_registry_commands(pipe: redis.client.Pipeline, key: str):
+    if is_player_key(key):
+        username = key[len(PLAYER_KEY_PREFIX) :]
+        pipe.zrem(REGISTRY_KEY, username)
+        for sort in (SORT_AURA, SORT_LEVEL, SORT_SIGNUP):
+            pipe.zrem(sorted_registry_key(sort), username)
+        aura_ledger.remove_ledger_commands(pipe, username)
+
+
+async def rebuild_registry(r: redis.Redis) -> int:
+    # Signup times are not stored on players, so players that predate the
+    # registry keep their position and new entries get the rebuild time.
+    # Writes racing with the rebuild are replaced by what the scan read
+    # and corrected by the player's next write.
+    prefix = f"{REGISTRY_REBUILD_PREFIX}{uuid.uuid4().hex}:"
+    swaps = {
+        REGISTRY_KEY: f"{prefix}players",
+        **{sorted_registry_key(sort): f"{prefix}by_{sort}" for sort in (SORT_AURA, SORT_LEVEL)},
+    }
+    registered = 0
+    batch = []
+    async for key in r.scan_iter(match=f"{PLAYER_KEY_PREFIX}*", count=500):
+        batch.append(key[len(PLAYER_KEY_PREFIX) :])
+        if len(batch) >= 500:
+            registered += await _register_usernames(r, batch, prefix)
+            batch = []
+    if batch:
+        registered += await _register_usernames(r, batch, prefix)
+
+    pipe = r.pipeline(transaction=False)
+    for rebuilt in swaps.values():
+        pipe.exists(rebuilt)
+    built = await pipe.execute()
+    pipe = r.pipeline(transaction=True)
+    for (live, rebuilt), exists in zip(swaps.items(), built):
+        if exists:
+            pipe.rename(rebuilt, live)
+            pipe.persist(live)
+        else:
+            pipe.delete(live)
+    pipe.set(REGISTRY_BUILT_KEY, REGISTRY_VERSION)
+    await pipe.execute()
+    logger.info(f"Player registry rebuilt with {registered} players.")
+    return registered
+
+
+async def _register_usernames(r: redis.Redis, usernames: List[str], prefix: str) -> int:
+    players = await load_players(r, usernames)
+    pipe = r.pipeline(transaction=False)
+    for player in players:
+        _registry_commands(
+            pipe, player, f"{prefix}players", lambda sort: f"{prefix}by_{sort}"
+        )
+    pipe.expire(f"{prefix}players", REGISTRY_REBUILD_TTL_SECONDS)
+    for sort in (SORT_AURA, SORT_LEVEL):
+        pipe.expire(f"{prefix}by_{sort}", REGISTRY_REBUILD_TTL_SECONDS)
+    await pipe.execute()
+    return len(players)
+
+
+async def ensure_registry(r: redis.Redis):
+    if await r.get(REGISTRY_BUILT_KEY) != REGISTRY_VERSION:
+        await rebuild_registry(r)
+
+
+async def count_players(r: redis.Redis) -> int:
+    await ensure_registry(r)
+    return await r.zcard(REGISTRY_KEY)
+
+
+async def iter_username_pages(
+    r: redis.Redis, page_size: int = PLAYER_PAGE_SIZE, after: Optional[str] = None
+) -> AsyncIterator[List[str]]:
+    await ensure_registry(r)
+    start = f"({after}" if after else "-"
+    while True:
+        usernames = await r.zrange(
+            REGISTRY_KEY, start, "+", bylex=True, offset=0, num=page_size
+        )
+        if not usernames:
+            return
+        yield usernames
+        if len(usernames) < page_size:
+            return
+        start = f"({usernames[-1]}"
+
+
+async def get_username_page(r: redis.Redis, skip: int, limit: int) -> List[str]:
+    await ensure_registry(r)
+    return await r.zrange(REGISTRY_KEY, "-", "+", bylex=True, offset=skip, num=limit)
+
+
+async def load_players(
+    r: redis.Redis, usernames: List[str]
+) -> List[redis_models.Player]:
+    if not usernames:
+        return []
+    pipe = r.pipeline(transaction=False)
+    pipe.mget([player_key(username) for username in usernames])
+    pipe.mget([aura_ledger.balance_key(username) for username in usernames])
+    raw_players, balances = await pipe.execute()
+    players = []
+    for username, raw, balance in zip(usernames, raw_players, balances):
+        if raw is None:
+            continue
+        try:
+            player = redis_models.Player.model_validate_json(raw)
+        except Exception as e:
+            logger.error(f"Skipping unreadable player {username}: {e}")
+            continue
+        if balance is not None:
+            player = player.model_copy(update={"aura": int(float(balance))})
+        players.append(player)
+    return players
+
+
+async def iter_player_pages(
+    r: redis.Redis, page_size: int = PLAYER_PAGE_SIZE
+) -> AsyncIterator[List[redis_models.Player]]:
+    async for usernames in iter_username_pages(r, page_size):
+        players = await load_players(r, usernames)
+        if players:
+            yield players
+
+
+async def iter_all_players(
+    r: redis.Redis, page_size: int = PLAYER_PAGE_SIZE
+) -> AsyncIterator[redis_models.Player]:
+    async for players in iter_player_pages(r, page_size):
+        for player in players:
+            yield player
+
+
+def encode_cursor(score: float, username: str) -> str:
+    return f"{score!r}|{username}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    score, _, username = cursor.partition("|")
+    try:
+        return float(score), username
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+async def _page_by_username(
+    r: redis.Redis, limit: int, cursor: Optional[str], descending: bool, prefix: Optional[str]
+) -> List[str]:
+    # Usernames starting with prefix sort before prefix with its last
+    # character bumped by one.
+    low = f"[{prefix}" if prefix else "-"
+    high = f"({prefix[:-1]}{chr(ord(prefix[-1]) + 1)}" if prefix else "+"
+    if cursor:
+        if descending:
+            high = f"({cursor}"
+        else:
+            low = f"({cursor}"
+    if descending:
+        return await r.zrange(
+            REGISTRY_KEY, high, low, desc=True, bylex=True, offset=0, num=limit
+        )
+    return await r.zrange(REGISTRY_KEY, low, high, bylex=True, offset=0, num=limit)
+
+
+async def _page_by_score(
+    r: redis.Redis, sort: str, limit: int, cursor: Optional[str], descending: bool
+) -> List[Tuple[str, float]]:
+    key = sorted_registry_key(sort)
+    start = 0
+    if cursor:
+        score, username = decode_cursor(cursor)
+        current = await r.zscore(key, username)
+        if current is not None and current == score:
+            rank = await (r.zrevrank(key, username) if descending else r.zrank(key, username))
+            start = rank + 1
+        else:
+            # The cursor's player moved or left since the page was served,
+            # so count where it would sit among the players tied on its old
+            # score. Ties are ordered by username within a score.
+            ties = await r.zrangebyscore(key, score, score)
+            if descending:
+                start = await r.zcount(key, f"({score}", "+inf")
+                start += sum(1 for tie in ties if tie > username)
+            else:
+                start = await r.zcount(key, "-inf", f"({score}")
+                start += sum(1 for tie in ties if tie < username)
+    return await r.zrange(
+        key, start, start + limit - 1, desc=descending, withscores=True
+    )
+
+
+async def get_player_page(
+    r: redis.Redis,
+    sort: str = SORT_USERNAME,
+    descending: bool = False,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+) -> Tuple[List[redis_models.Player], Optional[str]]:
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Unsupported sort field: {sort}")
+    if prefix and sort != SORT_USERNAME:
+        raise ValueError("Prefix search is only supported when sorting by username.")
+    await ensure_registry(r)
+
+    if sort == SORT_USERNAME:
+        usernames = await _page_by_username(r, limit, cursor, descending, prefix)
+        next_cursor = usernames[-1] if len(usernames) == limit else None
+    else:
+        entries = await _page_by_score(r, sort, limit, cursor, descending)
+        usernames = [username for username, _ in entries]
+        next_cursor = (
+            encode_cursor(entries[-1][1], entries[-1][0]) if len(entries) == limit else None
+        )
+    return await load_players(r, usernames), next_cursor
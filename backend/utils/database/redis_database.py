@@ -1,8 +1,12 @@
 import logging
 import redis.asyncio as redis
-from typing import List, Optional, Type, TypeVar, Dict, Any
+from typing import List, Optional, Tuple, Type, TypeVar, Dict, Any
 from pydantic import BaseModel
 
+from models.pydantic_models import BatchWriteReport
+from utils.database import change_log, habit_streaks, item_index, list_index, player_registry
+from utils.general import recurrence
+
 from utils.general.get_env import getenv
 
 logger = logging.getLogger(__name__)
@@ -16,8 +20,47 @@ async def get_redis_connection() -> redis.Redis:
     return redis.Redis(connection_pool=redis_pool)
 
 
+def has_indexes(key: str) -> bool:
+    return (
+        item_index.is_indexed_key(key)
+        or player_registry.is_player_key(key)
+        or habit_streaks.is_habit_key(key)
+        or change_log.is_logged_key(key)
+        or list_index.is_list_indexed_key(key)
+    )
+
+
+def prepare_write(model_instance: BaseModel) -> BaseModel:
+    # next_due follows the schedule as written; reads keep the stored value.
+    if "next_due" in type(model_instance).model_fields:
+        recurrence.set_next_due(model_instance)
+    return model_instance
+
+
+def add_index_commands(pipe: redis.client.Pipeline, key: str, model_instance: BaseModel):
+    item_index.add_index_commands(pipe, key, model_instance)
+    list_index.add_list_index_commands(pipe, key, model_instance)
+    change_log.add_change_commands(pipe, key, change_log.OP_UPSERT)
+    player_registry.add_registry_commands(pipe, key, model_instance)
+
+
+def remove_index_commands(pipe: redis.client.Pipeline, key: str):
+    item_index.remove_index_commands(pipe, key)
+    list_index.remove_list_index_commands(pipe, key)
+    change_log.add_change_commands(pipe, key, change_log.OP_DELETE)
+    player_registry.remove_registry_commands(pipe, key)
+    habit_streaks.remove_streak_commands(pipe, key)
+
+
 async def redis_set(r: redis.Redis, key: str, model_instance: BaseModel):
-    await r.set(key, model_instance.model_dump_json())
+    prepare_write(model_instance)
+    if not has_indexes(key):
+        await r.set(key, model_instance.model_dump_json())
+        return
+    pipe = r.pipeline(transaction=True)
+    pipe.set(key, model_instance.model_dump_json())
+    add_index_commands(pipe, key, model_instance)
+    await pipe.execute()
 
 
 async def redis_get(r: redis.Redis, key: str, model_class: Type[T]) -> Optional[T]:
@@ -29,7 +72,28 @@ async def redis_get(r: redis.Redis, key: str, model_class: Type[T]) -> Optional[
 
 
 async def redis_delete(r: redis.Redis, key: str) -> int:
-    return await r.delete(key)
+    if not has_indexes(key):
+        return await r.delete(key)
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(key)
+    remove_index_commands(pipe, key)
+    deleted, *_ = await pipe.execute()
+    return deleted
+
+
+async def redis_batch_delete(r: redis.Redis, keys: List[str]) -> List[int]:
+    # Deleted count per key, in order, from a single transaction.
+    if not keys:
+        return []
+    pipe = r.pipeline(transaction=True)
+    positions = []
+    for key in keys:
+        positions.append(len(pipe.command_stack))
+        pipe.delete(key)
+        if has_indexes(key):
+            remove_index_commands(pipe, key)
+    results = await pipe.execute()
+    return [results[position] for position in positions]
 
 
 async def redis_scan_keys(r: redis.Redis, match: str) -> List[str]:
@@ -81,3 +145,60 @@ async def redis_update(
     updated_item = model_class.model_validate(item_dict)
     await redis_set(r, key, updated_item)
     return updated_item
+
+
+async def redis_batch_patch(
+    r: redis.Redis,
+    patches: List[Tuple[str, Type[T], Dict[str, Any]]],
+    creates: Optional[Dict[str, BaseModel]] = None,
+    max_attempts: int = 3,
+) -> BatchWriteReport:
+    creates = creates or {}
+    keys = [key for key, _, _ in patches]
+
+    for attempt in range(max_attempts):
+        report = BatchWriteReport()
+        try:
+            async with r.pipeline(transaction=True) as pipe:
+                if keys:
+                    await pipe.watch(*keys)
+                    raw_items = await pipe.mget(keys)
+                else:
+                    raw_items = []
+                pipe.multi()
+
+                for (key, model_class, update_data), raw in zip(patches, raw_items):
+                    if raw is None:
+                        report.missing.append(key)
+                        continue
+                    try:
+                        item_dict = model_class.model_validate_json(raw).model_dump()
+                        for field, value in update_data.items():
+                            if value is not None:
+                                item_dict[field] = value
+                        updated_item = prepare_write(model_class.model_validate(item_dict))
+                    except Exception as e:
+                        report.failed[key] = str(e)
+                        continue
+                    pipe.set(key, updated_item.model_dump_json())
+                    add_index_commands(pipe, key, updated_item)
+                    report.touched.append(key)
+                    report.items[key] = updated_item
+
+                for key, model_instance in creates.items():
+                    prepare_write(model_instance)
+                    pipe.set(key, model_instance.model_dump_json())
+                    add_index_commands(pipe, key, model_instance)
+                    report.touched.append(key)
+                    report.items[key] = model_instance
+
+                if report.touched:
+                    await pipe.execute()
+                else:
+                    await pipe.reset()
+            return report
+        except redis.WatchError:
+            logger.warning(
+                f"Batch patch of {len(keys)} keys raced with another writer, retrying ({attempt + 1}/{max_attempts})"
+            )
+    raise RuntimeError(f"Batch patch of {len(keys)} keys kept conflicting, giving up")
@@ -0,0 +1,177 @@
+import json
+import logging
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter
+
+from models import redis_models
+from utils.database import change_log
+from utils.general import change_tracker
+
+logger = logging.getLogger(__name__)
+
+ChecklistItem = redis_models.ChecklistItem
+T = TypeVar("T")
+CHECKLIST_ADAPTER = TypeAdapter(List[ChecklistItem])
+
+
+def routine_key(username: str, routine_id: str) -> str:
+    return f"routine:{username}:{routine_id}"
+
+
+def find_node(
+    items: List[ChecklistItem], node_id: str
+) -> Optional[Tuple[List[ChecklistItem], int]]:
+    # The list holding the node and its index in it.
+    for index, item in enumerate(items):
+        if item.id == node_id:
+            return items, index
+        found = find_node(item.children, node_id)
+        if found:
+            return found
+    return None
+
+
+def get_node(items: List[ChecklistItem], node_id: str) -> ChecklistItem:
+    found = find_node(items, node_id)
+    if found is None:
+        raise LookupError(f"Checklist item {node_id} not found")
+    siblings, index = found
+    return siblings[index]
+
+
+def set_levels(items: List[ChecklistItem], level: int):
+    for item in items:
+        item.level = level
+        set_levels(item.children, level + 1)
+
+
+def insert_node(
+    checklist: List[ChecklistItem],
+    node: ChecklistItem,
+    parent_id: Optional[str] = None,
+    position: Optional[int] = None,
+):
+    if parent_id:
+        parent = get_node(checklist, parent_id)
+        siblings, level = parent.children, parent.level + 1
+    else:
+        siblings, level = checklist, 0
+    if position is not None and position > len(siblings):
+        raise ValueError(
+            f"Position {position} is out of range for a list of {len(siblings)} items."
+        )
+    set_levels([node], level)
+    siblings.insert(len(siblings) if position is None else position, node)
+
+
+def add_node(
+    checklist: List[ChecklistItem],
+    text: str,
+    completed: bool = False,
+    parent_id: Optional[str] = None,
+    position: Optional[int] = None,
+) -> ChecklistItem:
+    node = ChecklistItem(text=text, completed=completed)
+    insert_node(checklist, node, parent_id, position)
+    return node
+
+
+def update_node(
+    checklist: List[ChecklistItem],
+    node_id: str,
+    text: Optional[str] = None,
+    completed: Optional[bool] = None,
+) -> ChecklistItem:
+    node = get_node(checklist, node_id)
+    if text is not None:
+        node.text = text
+    if completed is not None:
+        node.completed = completed
+    return node
+
+
+def remove_node(checklist: List[ChecklistItem], node_id: str) -> ChecklistItem:
+    found = find_node(checklist, node_id)
+    if found is None:
+        raise LookupError(f"Checklist item {node_id} not found")
+    siblings, index = found
+    return siblings.pop(index)
+
+
+def move_node(
+    checklist: List[ChecklistItem],
+    node_id: str,
+    parent_id: Optional[str] = None,
+    position: Optional[int] = None,
+) -> ChecklistItem:
+    node = get_node(checklist, node_id)
+    if parent_id and (parent_id == node_id or find_node(node.children, parent_id)):
+        raise ValueError("A checklist item cannot be moved under itself.")
+    if parent_id:
+        get_node(checklist, parent_id)
+    siblings, index = find_node(checklist, node_id)
+    level = node.level
+    siblings.pop(index)
+    try:
+        insert_node(checklist, node, parent_id, position)
+    except ValueError:
+        set_levels([node], level)
+        siblings.insert(index, node)
+        raise
+    return node
+
+
+async def update_checklist(
+    r: redis.Redis,
+    username: str,
+    routine_id: str,
+    operation: Callable[[List[ChecklistItem]], T],
+    max_attempts: int = 3,
+) -> Tuple[List[ChecklistItem], T]:
+    # Applies operation to the stored checklist in place of a full routine
+    # update and returns the checklist with the operation's result. Only the
+    # checklist changes, so the routine document is edited as JSON and the
+    # due-date and list indexes are left alone.
+    key = routine_key(username, routine_id)
+    for attempt in range(max_attempts):
+        try:
+            async with r.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                raw = await pipe.get(key)
+                if raw is None:
+                    raise HTTPException(status_code=404, detail="Item not found")
+                document = json.loads(raw)
+                if document.get("userId") != username:
+                    raise HTTPException(
+                        status_code=403, detail="Not authorized to access this item"
+                    )
+                checklist = CHECKLIST_ADAPTER.validate_python(
+                    redis_models.parse_checklist(document.get("checklist") or [])
+                )
+                try:
+                    result = operation(checklist)
+                except LookupError as e:
+                    raise HTTPException(status_code=404, detail=str(e))
+                except ValueError as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+                document["checklist"] = CHECKLIST_ADAPTER.dump_python(checklist, mode="json")
+                pipe.multi()
+                pipe.set(key, json.dumps(document, separators=(",", ":"), ensure_ascii=False))
+                change_log.add_change_commands(pipe, key, change_log.OP_UPSERT)
+                # The change log bumps data_version; this marks the edit for
+                # the daily analysis.
+                change_tracker.queue_mark_changed(pipe, username)
+                await pipe.execute()
+            return checklist, result
+        except redis.WatchError:
+            logger.warning(
+                f"Checklist update of {key} raced with another writer, retrying ({attempt + 1}/{max_attempts})"
+            )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Routine kept changing during the checklist update, try again.",
+    )
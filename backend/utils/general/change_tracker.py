@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from models import redis_models
+
+logger = logging.getLogger(__name__)
+
+
+# "version" counts changes made by the player and drives the daily
+# analysis; "data_version" counts every change to the player's data,
+# including the analysis' own write-back and job updates, and backs the
+# ETags served to clients. Only the change log increments data_version,
+# so every version has a log entry to sync from.
+DATA_VERSION_FIELD = "data_version"
+
+
+def tracking_key(username: str) -> str:
+    return f"tracking:{username}"
+
+
+def queue_mark_changed(pipe: redis.client.Pipeline, username: str):
+    pipe.hincrby(tracking_key(username), "version", 1)
+    pipe.hset(tracking_key(username), "mtime", datetime.now(timezone.utc).isoformat())
+
+
+async def mark_changed(db: redis.Redis, username: str) -> Optional[int]:
+    try:
+        pipe = db.pipeline()
+        queue_mark_changed(pipe, username)
+        version, _ = await pipe.execute()
+        return version
+    except Exception as e:
+        logger.error(f"Failed to mark data changed for {username}: {e}", exc_info=True)
+        return None
+
+
+async def get_data_version(db: redis.Redis, username: str) -> int:
+    return int(await db.hget(tracking_key(username), DATA_VERSION_FIELD) or 0)
+
+
+def make_etag(username: str, data_version: int) -> str:
+    # Weak, since the same version backs several representations.
+    return f'W/"{username}:{data_version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    # Clients may keep the body but must revalidate it on every use.
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+async def check_etag(
+    db: redis.Redis, username: str, if_none_match: Optional[str]
+) -> Tuple[str, bool]:
+    # Read before the data is loaded, so a write racing with the request
+    # can only make the ETag older than the body, never newer.
+    etag = make_etag(username, await get_data_version(db, username))
+    return etag, etag_matches(if_none_match, etag)
+
+
+async def get_tracking(db: redis.Redis, username: str) -> Dict[str, str]:
+    return await db.hgetall(tracking_key(username))
+
+
+async def mark_analyzed(
+    db: redis.Redis, username: str, version: int, fingerprint: str
+):
+    await db.hset(
+        tracking_key(username),
+        mapping={
+            "analyzed_version": version,
+            "analyzed_fingerprint": fingerprint,
+            "analyzed_at": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+
+
+def context_fingerprint(
+    player: redis_models.Player,
+    habits: List[redis_models.Habit],
+    tasks: List[redis_models.Task],
+    routines: List[redis_models.Routine],
+) -> str:
+    # Descriptions are written by the analysis itself, so they are left out
+    # to keep its own output from marking the player as changed.
+    exclude = {"description"}
+    context = {
+        "player": player.model_dump(mode="json", exclude=exclude | {"password"}),
+        "habits": sorted(
+            (h.model_dump(mode="json", exclude=exclude) for h in habits),
+            key=lambda item: item["id"],
+        ),
+        "tasks": sorted(
+            (t.model_dump(mode="json", exclude=exclude) for t in tasks),
+            key=lambda item: item["id"],
+        ),
+        "routines": sorted(
+            (r.model_dump(mode="json", exclude=exclude) for r in routines),
+            key=lambda item: item["id"],
+        ),
+    }
+    encoded = json.dumps(context, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+from utils.database import change_log, redis_database
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+EVENTS_MAX_CONNECTIONS = int(getenv("EVENTS_MAX_CONNECTIONS", 500))
+EVENTS_QUEUE_SIZE = int(getenv("EVENTS_QUEUE_SIZE", 100))
+EVENTS_RECONNECT_DELAY_SECONDS = float(getenv("EVENTS_RECONNECT_DELAY_SECONDS", 1))
+
+# Put on a connection's queue when events may have been lost, either because
+# the client fell behind or the pub/sub connection dropped. The stream then
+# ends and the client reconnects with its Last-Event-ID to replay the gap.
+STREAM_LOST = None
+
+
+class EventConnection:
+    def __init__(self, username: str, queue_size: int):
+        self.username = username
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.lost = False
+
+    def push(self, event: Optional[Dict[str, Any]]):
+        if self.lost:
+            return
+        if event is STREAM_LOST:
+            self.lost = True
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Event queue full for {self.username}, dropping the stream")
+            self.lost = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(STREAM_LOST)
+
+
+class EventHub:
+    # Fans the per-player channels out to this worker's open streams over a
+    # single pub/sub connection. A channel is subscribed while at least one
+    # local stream for that player is open.
+    def __init__(self, max_connections: int, queue_size: int):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._connections: Dict[str, Set[EventConnection]] = {}
+        self._count = 0
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def has_capacity(self) -> bool:
+        return self._count < self.max_connections
+
+    def count(self) -> int:
+        return self._count
+
+    async def open(self, username: str) -> Optional[EventConnection]:
+        async with self._lock:
+            if not self.has_capacity():
+                logger.warning(
+                    f"Event stream limit reached ({self.max_connections}), rejecting stream for {username}"
+                )
+                return None
+            await self._ensure_reader()
+            subscribers = self._connections.setdefault(username, set())
+            if not subscribers:
+                await self._pubsub.subscribe(change_log.events_channel(username))
+            connection = EventConnection(username, self.queue_size)
+            subscribers.add(connection)
+            self._count += 1
+        logger.info(
+            f"Opened event stream for {username} ({self._count}/{self.max_connections} open)"
+        )
+        return connection
+
+    async def close(self, connection: EventConnection):
+        async with self._lock:
+            subscribers = self._connections.get(connection.username)
+            if not subscribers or connection not in subscribers:
+                return
+            subscribers.discard(connection)
+            self._count -= 1
+            if not subscribers:
+                del self._connections[connection.username]
+                if self._pubsub is None:
+                    return
+                try:
+                    await self._pubsub.unsubscribe(
+                        change_log.events_channel(connection.username)
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to unsubscribe events for {connection.username}: {e}")
+        logger.info(
+            f"Closed event stream for {connection.username} ({self._count}/{self.max_connections} open)"
+        )
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        await self._close_pubsub()
+        for subscribers in self._connections.values():
+            for connection in subscribers:
+                connection.push(STREAM_LOST)
+
+    async def _ensure_reader(self):
+        if self._reader and not self._reader.done():
+            return
+        await self._connect()
+        self._reader = asyncio.create_task(self._read())
+
+    async def _connect(self):
+        r = await redis_database.get_redis_connection()
+        self._pubsub = r.pubsub(ignore_subscribe_messages=True)
+        channels = [change_log.events_channel(username) for username in self._connections]
+        if channels:
+            await self._pubsub.subscribe(*channels)
+
+    async def _close_pubsub(self):
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close event pub/sub connection: {e}")
+        self._pubsub = None
+
+    async def _read(self):
+        while True:
+            try:
+                if self._pubsub.connection is None:
+                    # Nothing has been subscribed on this connection yet.
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message is not None:
+                    self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event pub/sub connection failed, reconnecting: {e}")
+                async with self._lock:
+                    # Anything published while disconnected is gone, so every
+                    # open stream has to replay from the change log.
+                    for subscribers in self._connections.values():
+                        for connection in subscribers:
+                            connection.push(STREAM_LOST)
+                    await self._close_pubsub()
+                    await asyncio.sleep(EVENTS_RECONNECT_DELAY_SECONDS)
+                    try:
+                        await self._connect()
+                    except Exception as e:
+                        logger.error(f"Event pub/sub reconnect failed: {e}")
+                        self._reader = None
+                        return
+
+    def _dispatch(self, message: Dict[str, Any]):
+        if message.get("type") != "message":
+            return
+        username = message["channel"].split(":", 1)[1]
+        try:
+            event = change_log.parse_event(message["data"])
+        except Exception as e:
+            logger.error(f"Skipping unreadable event for {username}: {e}")
+            return
+        for connection in list(self._connections.get(username, ())):
+            connection.push(event)
+
+
+event_hub = EventHub(max_connections=EVENTS_MAX_CONNECTIONS, queue_size=EVENTS_QUEUE_SIZE)
@@ -1,7 +1,7 @@
 import logging
 import json
 from sqlalchemy.orm import Session
-from typing import Optional, Any
+from typing import List, Optional, Any, Tuple
 from pydantic import BaseModel
 
 from models.pg_models import History, HistoryType
@@ -9,13 +9,7 @@ from models.pg_models import History, HistoryType
 logger = logging.getLogger(__name__)
 
 
-def log_history(
-    db: Session,
-    user_id: str,
-    history_type: HistoryType,
-    data: Optional[Any] = None,
-    comments: Optional[str] = None,
-):
+def serialize_history_data(data: Optional[Any]) -> Optional[Any]:
     json_data = None
     if data is not None:
         try:
@@ -37,6 +31,17 @@ def log_history(
                 "error": "Unexpected serialization error",
                 "data_repr": repr(data),
             }
+    return json_data
+
+
+def log_history(
+    db: Session,
+    user_id: str,
+    history_type: HistoryType,
+    data: Optional[Any] = None,
+    comments: Optional[str] = None,
+):
+    json_data = serialize_history_data(data)
 
     try:
         history_entry = History(
@@ -48,3 +53,28 @@ def log_history(
     except Exception as e:
         logger.error(f"Failed to log history for user {user_id}: {e}", exc_info=True)
         db.rollback()
+
+
+def log_history_batch(
+    db: Session,
+    entries: List[Tuple[str, HistoryType, Optional[Any], Optional[str]]],
+):
+    if not entries:
+        return
+    try:
+        db.add_all(
+            [
+                History(
+                    user_id=user_id,
+                    type=history_type,
+                    data=serialize_history_data(data),
+                    comments=comments,
+                )
+                for user_id, history_type, data, comments in entries
+            ]
+        )
+        db.commit()
+        logger.info(f"History logged for {len(entries)} entries in one batch")
+    except Exception as e:
+        logger.error(f"Failed to log history batch of {len(entries)}: {e}", exc_info=True)
+        db.rollback()
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import redis.asyncio as redis
+
+from utils.database import redis_database
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_SECONDS = int(getenv("LEADER_LEASE_SECONDS", 30))
+
+# Only the current holder may extend or release the lease.
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+Callback = Callable[[], Optional[Awaitable[None]]]
+
+
+def make_instance_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        name: str,
+        on_elected: Optional[Callback] = None,
+        on_demoted: Optional[Callback] = None,
+        lease_seconds: int = LEADER_LEASE_SECONDS,
+    ):
+        self.key = f"leader:{name}"
+        self.instance_id = make_instance_id()
+        self.lease_ms = lease_seconds * 1000
+        self.renew_interval = lease_seconds / 3
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._redis: Optional[redis.Redis] = None
+
+    async def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = await redis_database.get_redis_connection()
+        return self._redis
+
+    async def _notify(self, callback: Optional[Callback]):
+        if callback is None:
+            return
+        try:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error(f"Leader callback for {self.key} failed: {e}", exc_info=True)
+
+    async def _set_leader(self, is_leader: bool):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        if is_leader:
+            logger.info(f"{self.instance_id} became leader for {self.key}")
+            await self._notify(self.on_elected)
+        else:
+            logger.warning(f"{self.instance_id} lost leadership for {self.key}")
+            await self._notify(self.on_demoted)
+
+    async def try_acquire(self) -> bool:
+        r = await self._get_redis()
+        if self.is_leader:
+            renewed = await r.eval(
+                RENEW_SCRIPT, 1, self.key, self.instance_id, self.lease_ms
+            )
+            if renewed:
+                return True
+        return bool(await r.set(self.key, self.instance_id, nx=True, px=self.lease_ms))
+
+    async def holds_lease(self) -> bool:
+        # Checked right before acting so a process that stalled past its
+        # lease cannot act on stale leadership.
+        if not self.is_leader:
+            return False
+        r = await self._get_redis()
+        return await r.get(self.key) == self.instance_id
+
+    async def current_leader(self) -> Optional[str]:
+        r = await self._get_redis()
+        return await r.get(self.key)
+
+    async def lease_ttl_ms(self) -> int:
+        r = await self._get_redis()
+        return await r.pttl(self.key)
+
+    async def run(self):
+        while not self._stop.is_set():
+            try:
+                await self._set_leader(await self.try_acquire())
+            except Exception as e:
+                logger.error(f"Leader election for {self.key} failed: {e}", exc_info=True)
+                await self._set_leader(False)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.renew_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self.is_leader:
+            try:
+                r = await self._get_redis()
+                await r.eval(RELEASE_SCRIPT, 1, self.key, self.instance_id)
+            except Exception as e:
+                logger.error(f"Failed to release {self.key}: {e}", exc_info=True)
+            await self._set_leader(False)
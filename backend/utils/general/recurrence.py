@@ -0,0 +1,176 @@
+import calendar
+import logging
+from datetime import date, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_AGENDA_OCCURRENCES = 400
+
+# Occurence values as stored on habits and routines. Kept as plain strings
+# (Occurence is a str enum) so the models can import this module.
+DAYS = "days"
+WEEKS = "weeks"
+MONTHS = "months"
+
+
+def add_months(start: date, months: int) -> date:
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def add_period(start: date, occurence: str, x_occurence: int) -> date:
+    if occurence == DAYS:
+        return start + timedelta(days=x_occurence)
+    if occurence == WEEKS:
+        return start + timedelta(weeks=x_occurence)
+    if occurence == MONTHS:
+        return add_months(start, x_occurence)
+    logger.error(f"Unknown occurence type encountered: {occurence}")
+    raise ValueError(f"Unsupported occurrence type: {occurence}")
+
+
+def next_due_date(start_date: date, occurence: str, x_occurence: int) -> date:
+    # The last day of the period that started on start_date.
+    return add_period(start_date, occurence, x_occurence) - timedelta(days=1)
+
+
+def period_index(start_date: date, occurence: str, x_occurence: int, day: date) -> int:
+    # Index of the period containing day, counted from start_date in either
+    # direction. Computed directly rather than by stepping, so a start_date
+    # far from day costs nothing.
+    if occurence == MONTHS:
+        months = (day.year - start_date.year) * 12 + day.month - start_date.month
+        index = months // x_occurence
+        # Clamped month ends can put the estimate one period off.
+        while add_period(start_date, occurence, x_occurence * index) > day:
+            index -= 1
+        while add_period(start_date, occurence, x_occurence * (index + 1)) <= day:
+            index += 1
+        return index
+    length = x_occurence * (7 if occurence == WEEKS else 1)
+    return (day - start_date).days // length
+
+
+def current_period(
+    start_date: date, occurence: str, x_occurence: int, today: date
+) -> Tuple[date, date]:
+    # First and last day of the period containing today, or of the first
+    # period while today is before start_date.
+    index = 0
+    if x_occurence > 0 and today > start_date:
+        index = period_index(start_date, occurence, x_occurence, today)
+    return (
+        add_period(start_date, occurence, x_occurence * index),
+        add_period(start_date, occurence, x_occurence * (index + 1)) - timedelta(days=1),
+    )
+
+
+def is_period_completed(
+    start_date: date,
+    occurence: str,
+    x_occurence: int,
+    last_completed: date,
+    today: Optional[date] = None,
+) -> bool:
+    # Completing a period moves last_completed past that period's start, so
+    # a start_date that was never rolled forward does not keep an old
+    # completion counting.
+    period_start, _ = current_period(start_date, occurence, x_occurence, today or date.today())
+    return last_completed > period_start
+
+
+def completed_until(
+    start_date: date, occurence: str, x_occurence: int, last_completed: date
+) -> date:
+    # The first day on which is_period_completed turns false: the first
+    # period start on or after last_completed.
+    if last_completed <= start_date:
+        return date.min
+    if x_occurence <= 0:
+        return date.max
+    index = period_index(start_date, occurence, x_occurence, last_completed)
+    period_start = add_period(start_date, occurence, x_occurence * index)
+    if period_start == last_completed:
+        return period_start
+    return add_period(start_date, occurence, x_occurence * (index + 1))
+
+
+def set_next_due(item):
+    # Called by every write of a habit or routine; reads keep the stored
+    # value.
+    item.next_due = next_due_date(item.start_date, item.occurence, item.x_occurence)
+    return item
+
+
+def occurrences_between(
+    start_date: date,
+    occurence: str,
+    x_occurence: int,
+    range_start: date,
+    range_end: date,
+    limit: int = MAX_AGENDA_OCCURRENCES,
+) -> List[date]:
+    # Each occurrence is computed from start_date rather than from the
+    # previous one, so a clamped month end (31st -> 28th) does not drift.
+    if x_occurence <= 0:
+        return []
+    dates = []
+    step = 1
+    while len(dates) < limit:
+        due = next_due_date(start_date, occurence, x_occurence * step)
+        if due > range_end:
+            break
+        if due >= range_start:
+            dates.append(due)
+        step += 1
+    return dates
+
+
+def _to_datetime64(dates: Sequence[date]) -> np.ndarray:
+    return np.array([d.isoformat() for d in dates], dtype="datetime64[D]")
+
+
+def bulk_next_due_dates(
+    start_dates: Sequence[date],
+    occurences: Sequence[str],
+    x_occurences: Sequence[int],
+) -> np.ndarray:
+    starts = _to_datetime64(start_dates)
+    steps = np.asarray(x_occurences, dtype=np.int64)
+    kinds = np.array([str(getattr(o, "value", o)) for o in occurences])
+    unknown = ~np.isin(kinds, [DAYS, WEEKS, MONTHS])
+    if unknown.any():
+        raise ValueError(f"Unsupported occurrence types: {set(kinds[unknown])}")
+
+    day_steps = np.where(kinds == WEEKS, steps * 7, steps)
+    due = starts + day_steps.astype("timedelta64[D]")
+
+    months = kinds == MONTHS
+    if months.any():
+        month_starts = starts[months].astype("datetime64[M]")
+        day_offsets = starts[months] - month_starts.astype("datetime64[D]")
+        target_months = month_starts + steps[months].astype("timedelta64[M]")
+        month_ends = (target_months + 1).astype("datetime64[D]") - 1
+        due[months] = np.minimum(
+            target_months.astype("datetime64[D]") + day_offsets, month_ends
+        )
+
+    return due - np.timedelta64(1, "D")
+
+
+def bulk_overdue_mask(
+    start_dates: Sequence[date],
+    occurences: Sequence[str],
+    x_occurences: Sequence[int],
+    today: date,
+) -> np.ndarray:
+    if not len(start_dates):
+        return np.zeros(0, dtype=bool)
+    due = bulk_next_due_dates(start_dates, occurences, x_occurences)
+    return due < np.datetime64(today.isoformat(), "D")
@@ -1,12 +1,87 @@
+import json
 import logging
+from datetime import datetime, timezone
+from typing import Dict
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from utils.jobs import penalise, gemini_analyzer
+from utils.database import aura_ledger, pg_database, redis_database
+from utils.general.leader import LeaderElection
+from utils.jobs import job_runs
 
 logger = logging.getLogger(__name__)
 scheduler = AsyncIOScheduler(timezone="UTC")
 
+LAST_RUNS_KEY = "scheduler:last_runs"
+
+# Scheduler job id -> queue job type it enqueues.
+SCHEDULED_JOB_TYPES = {
+    "overdue_check_job": "overdue_check",
+    "daily_gemini_analysis": "daily_analysis",
+    "aura_compaction_job": "aura_compaction",
+}
+
+
+# Scheduler job id -> check run before enqueueing; when it finds nothing to
+# do the run is skipped, so frequent jobs do not fill job_runs with no-ops.
+SCHEDULED_JOB_PRECHECKS = {
+    "aura_compaction_job": aura_ledger.has_dirty,
+}
+
+
+def resume_jobs():
+    scheduler.resume()
+    logger.info("Scheduler resumed, this process runs scheduled jobs.")
+
+
+def pause_jobs():
+    scheduler.pause()
+    logger.info("Scheduler paused, another process runs scheduled jobs.")
+
+
+# Every process keeps its scheduler paused until it holds the leader lease,
+# so scheduled jobs fire once per deployment instead of once per worker.
+election = LeaderElection("scheduler", on_elected=resume_jobs, on_demoted=pause_jobs)
+
+
+async def enqueue_scheduled_job(job_id: str):
+    # The scheduler only hands work to the queue; the worker process runs it.
+    job_type = SCHEDULED_JOB_TYPES[job_id]
+    pg_db = pg_database.SessionLocal()
+    try:
+        if not await election.holds_lease():
+            logger.warning(f"Scheduler: Skipping {job_id}, leader lease is not held.")
+            return
+        r = await redis_database.get_redis_connection()
+        precheck = SCHEDULED_JOB_PRECHECKS.get(job_id)
+        if precheck and not await precheck(r):
+            logger.debug(f"Scheduler: Skipping {job_id}, nothing to do.")
+            return
+        run = await job_runs.enqueue_run(r, pg_db, job_id, job_type, "scheduler")
+        await r.hset(
+            LAST_RUNS_KEY,
+            job_id,
+            json.dumps(
+                {
+                    "enqueued_at": datetime.now(timezone.utc).isoformat(),
+                    "run_id": str(run.id),
+                    "queued_job_id": run.queued_job_id,
+                    "instance_id": election.instance_id,
+                }
+            ),
+        )
+    except Exception as e:
+        logger.error(f"Scheduler: Failed to enqueue {job_id} job: {e}", exc_info=True)
+    finally:
+        pg_db.close()
+
+
+async def get_last_runs() -> Dict[str, dict]:
+    r = await redis_database.get_redis_connection()
+    last_runs = await r.hgetall(LAST_RUNS_KEY)
+    return {job_id: json.loads(run) for job_id, run in last_runs.items()}
+
 
 def start_scheduler():
     try:
@@ -14,8 +89,9 @@ def start_scheduler():
             logger.info("Overdue check job already scheduled.")
         else:
             scheduler.add_job(
-                penalise.check_overdue_and_penalize,
+                enqueue_scheduled_job,
                 "interval",
+                args=["overdue_check_job"],
                 hours=3,
                 id="overdue_check_job",
                 name="Check for overdue items and penalize aura",
@@ -27,7 +103,8 @@ def start_scheduler():
             logger.info("Daily Gemini analysis job already scheduled.")
         else:
             scheduler.add_job(
-                gemini_analyzer.run_daily_analysis_job,
+                enqueue_scheduled_job,
+                args=["daily_gemini_analysis"],
                 trigger=CronTrigger(hour=2, minute=0, timezone="UTC"),
                 id="daily_gemini_analysis",
                 name="Run daily Gemini analysis for player descriptions",
@@ -35,16 +112,32 @@ def start_scheduler():
             )
             logger.info("Daily Gemini analysis job added (runs daily at 02:00 AM UTC).")
 
+        if scheduler.get_job("aura_compaction_job"):
+            logger.info("Aura compaction job already scheduled.")
+        else:
+            scheduler.add_job(
+                enqueue_scheduled_job,
+                "interval",
+                args=["aura_compaction_job"],
+                minutes=15,
+                id="aura_compaction_job",
+                name="Write live aura balances back to player profiles",
+                replace_existing=True,
+            )
+            logger.info("Aura compaction job added (runs every 15 minutes).")
+
         if not scheduler.running:
-            scheduler.start()
-            logger.info("Scheduler started.")
+            scheduler.start(paused=True)
+            logger.info("Scheduler started (paused until leader election).")
         else:
             logger.info("Scheduler already running.")
+        election.start()
     except Exception as e:
         logger.error(f"Scheduler: Failed to start or add job: {e}", exc_info=True)
 
 
-def stop_scheduler():
+async def stop_scheduler():
+    await election.stop()
     if scheduler.running:
         logger.info("Scheduler shutting down...")
         try:
@@ -1,94 +1,155 @@
+import asyncio
 import logging
-from typing import List
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 import uuid
 import redis.asyncio as redis
-from sqlalchemy.orm import Session
 
 from routers.tasks import task_key
-from utils.operations.crud_func import get_all_players 
 from routers.players import get_all_redis 
-from utils.database import pg_database, redis_database
-from utils.operations.crud_obj import generic_create_item
-from utils.ai.gemini import get_gemini_model
+from utils.database import player_registry, redis_database
+from utils.ai import llm_gateway
 from utils.ai.prompts import get_daily_summary_prompt
 from utils.ai.data_format import get_base_formatted_data, parseResponseToJson
+from utils.general import change_tracker
+from utils.general.get_env import getenv
 from models import redis_models
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+ANALYSIS_CONCURRENCY = int(getenv("ANALYSIS_CONCURRENCY", 4))
+ANALYSIS_PLAYER_TIMEOUT_SECONDS = float(getenv("ANALYSIS_PLAYER_TIMEOUT_SECONDS", 180))
+ANALYSIS_RATE_LIMIT_COOLDOWN_SECONDS = float(
+    getenv("ANALYSIS_RATE_LIMIT_COOLDOWN_SECONDS", 60)
+)
+ANALYSIS_RATE_LIMIT_REQUEUES = int(getenv("ANALYSIS_RATE_LIMIT_REQUEUES", 2))
+ANALYSIS_QUEUE_SIZE = int(getenv("ANALYSIS_QUEUE_SIZE", 100))
+ANALYSIS_PROGRESS_EVERY = int(getenv("ANALYSIS_PROGRESS_EVERY", 25))
+ANALYSIS_CHECKPOINT_TTL_SECONDS = int(getenv("ANALYSIS_CHECKPOINT_TTL_SECONDS", 172800))
+ANALYSIS_MAX_SKIP_DAYS = int(getenv("ANALYSIS_MAX_SKIP_DAYS", 7))
+
+ANALYZED = "analyzed"
+SKIPPED = "skipped"
+FAILED = "failed"
+
 
 async def analyze_player_data(
-    player: redis_models.Player, db: redis.Redis, pg_db: Session
-):
-    gemini_model = get_gemini_model()
+    player: redis_models.Player,
+    db: redis.Redis,
+    force: bool = False,
+    stats: Optional[Dict[str, Any]] = None,
+) -> str:
     logger.info(f"Starting analysis for player: {player.username}")
+    stats = stats if stats is not None else {}
 
     try:
+        tracking = await change_tracker.get_tracking(db, player.username)
+        version = int(tracking.get("version", 0))
+        refresh_due = is_refresh_due(tracking)
+        if (
+            not force
+            and not refresh_due
+            and tracking.get("analyzed_version") == str(version)
+        ):
+            logger.info(f"Skipping analysis for {player.username}: no changes since last run.")
+            return SKIPPED
+
         habits, tasks, routines = await get_all_redis(db, player.username)
+        fingerprint = change_tracker.context_fingerprint(player, habits, tasks, routines)
+        if (
+            not force
+            and not refresh_due
+            and tracking.get("analyzed_fingerprint") == fingerprint
+        ):
+            await change_tracker.mark_analyzed(db, player.username, version, fingerprint)
+            logger.info(f"Skipping analysis for {player.username}: context unchanged.")
+            return SKIPPED
+
         base_prompt = get_base_formatted_data(
             player, habits, tasks, routines
         )
         prompt = get_daily_summary_prompt(base_prompt, player.mentor)
-        response = await gemini_model.generate_content_async(prompt)
-        analysis_result = parseResponseToJson(response.text)
+        response_text = await llm_gateway.generate(prompt, purpose="daily_analysis")
+        analysis_result = parseResponseToJson(response_text)
         item_descriptions: dict = analysis_result.get("item_descriptions", {})
         player_summary: dict = analysis_result.get("ai_player_summary", None)
 
-        for task in tasks:
-            key = f"task:{player.username}:{task.id}"
-            desc = item_descriptions.get(f"task:{task.id}")
-            if desc:
-                await redis_database.redis_update(
-                    db, key, {"description": desc}, redis_models.Task
-                )
-
-        for habit in habits:
-            key = f"habit:{player.username}:{habit.id}"
-            desc = item_descriptions.get(f"habit:{habit.id}")
-            if desc:
-                await redis_database.redis_update(
-                    db, key, {"description": desc}, redis_models.Habit
-                )
-
-        for routine in routines:
-            key = f"routine:{player.username}:{routine.id}"
-            desc = item_descriptions.get(f"routine:{routine.id}")
-            if desc:
-                await redis_database.redis_update(
-                    db, key, {"description": desc}, redis_models.Routine
-                )
+        patches = []
+        for model_class, prefix, items in (
+            (redis_models.Task, "task", tasks),
+            (redis_models.Habit, "habit", habits),
+            (redis_models.Routine, "routine", routines),
+        ):
+            for item in items:
+                desc = item_descriptions.get(f"{prefix}:{item.id}")
+                if desc:
+                    patches.append(
+                        (f"{prefix}:{player.username}:{item.id}", model_class, {"description": desc})
+                    )
         if player_summary:
-            key = f"player:{player.username}"
-            await redis_database.redis_update(
-                db, key, {"description": str(player_summary).replace(".", ",")}, redis_models.Player
+            patches.append(
+                (
+                    f"player:{player.username}",
+                    redis_models.Player,
+                    {"description": str(player_summary).replace(".", ",")},
+                )
             )
 
         challenge_task_data: dict = analysis_result.get("challenge_task", None)
-        await prepare_challenge_task(player.username, challenge_task_data, db)
+        challenge_task = build_challenge_task(player.username, challenge_task_data)
+        creates = {}
+        if challenge_task:
+            creates[task_key(player.username, challenge_task.id)] = challenge_task
+            fingerprint = change_tracker.context_fingerprint(
+                player, habits, tasks + [challenge_task], routines
+            )
+
+        report = await redis_database.redis_batch_patch(db, patches, creates)
+        if report.missing or report.failed:
+            logger.warning(
+                f"Analysis write-back for {player.username}: {len(report.missing)} items vanished, failed: {report.failed}"
+            )
+        logger.info(
+            f"Analysis write-back for {player.username} touched {len(report.touched)} keys in one transaction."
+        )
+        await change_tracker.mark_analyzed(db, player.username, version, fingerprint)
+        stats["keys_touched"] = stats.get("keys_touched", 0) + len(report.touched)
+        return ANALYZED
 
+    except llm_gateway.LLMRateLimitError:
+        raise
     except Exception as e:
         logger.error(
             f"An unexpected error occurred during analysis for player {player.username}: {e}",
             exc_info=True,
         )
+        return FAILED
 
-async def prepare_challenge_task(
-    username: str, challenge_task_data: dict, db: redis.Redis
-):
+
+def is_refresh_due(tracking: Dict[str, str]) -> bool:
+    analyzed_at = tracking.get("analyzed_at")
+    if not analyzed_at:
+        return True
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(analyzed_at)
+    return age.days >= ANALYSIS_MAX_SKIP_DAYS
+
+def build_challenge_task(
+    username: str, challenge_task_data: dict
+) -> Optional[redis_models.Task]:
     if challenge_task_data and isinstance(challenge_task_data, dict):
         try:
-            new_task_id = str(uuid.uuid4())
             task_name = challenge_task_data.get("name")
             due_date = challenge_task_data.get("due_date")
             if not task_name or not due_date:
-                return
+                return None
             task_desc = challenge_task_data.get(
                 "description", "Complete this and bag that extra aura"
             )
             task_aura = challenge_task_data.get("aura", 10)
             new_task = redis_models.Task(
-                id=new_task_id,
+                id=str(uuid.uuid4()),
                 userId=username,
                 name=f"✨ AI Challenge: {task_name}",
                 description=task_desc,
@@ -96,16 +157,10 @@ async def prepare_challenge_task(
                 aura=task_aura,
                 completed=False,
             )
-            await generic_create_item(
-                item_data=new_task,
-                current_username=username,
-                db=db,
-                key_func=task_key,
-                model_class=redis_models.Task,
-            )
             logger.info(
-                f"Prepared AI challenge task '{new_task.name}' for player {username} using generic_create_item."
+                f"Prepared AI challenge task '{new_task.name}' for player {username}."
             )
+            return new_task
 
         except Exception as e:
             logger.error(
@@ -116,24 +171,189 @@ async def prepare_challenge_task(
         logger.warning(
             f"No valid challenge task data received from Gemini for player {username}."
         )
+    return None
+
 
+def checkpoint_key(run_date: str) -> str:
+    return f"job:daily_analysis:{run_date}:done"
 
-async def run_daily_analysis_job():
+
+def progress_key(run_date: str) -> str:
+    return f"job:daily_analysis:{run_date}:progress"
+
+
+async def run_daily_analysis_job(resume: bool = True) -> Dict[str, Any]:
     logger.info("Starting daily Gemini analysis job...")
+    stats: Dict[str, Any] = {
+        "players_total": 0,
+        "analyzed": 0,
+        "skipped_unchanged": 0,
+        "failed": 0,
+        "resumed_skipped": 0,
+        "rate_limited": 0,
+        "keys_touched": 0,
+        "players_processed": 0,
+        "player_errors": {},
+    }
+    started = time.monotonic()
+    run_date = datetime.now(timezone.utc).date().isoformat()
     try:
 
         async with await redis_database.get_redis_connection() as redis_conn:
-            pg_session_local = pg_database.SessionLocal()
             try:
-                players: List[redis_models.Player] = await get_all_players(redis_conn)
-                for player in players:
-                    await analyze_player_data(player, redis_conn, pg_session_local)
+                if not resume:
+                    await redis_conn.delete(checkpoint_key(run_date))
+                stats["players_total"] = await player_registry.count_players(redis_conn)
+
+                # Players are streamed page by page into a bounded queue, so
+                # memory does not grow with the number of players.
+                queue: asyncio.Queue = asyncio.Queue(maxsize=ANALYSIS_QUEUE_SIZE)
+                pacing = {"pause_until": 0.0}
+                workers = [
+                    asyncio.create_task(
+                        analysis_worker(queue, redis_conn, run_date, stats, pacing, started)
+                    )
+                    for _ in range(max(1, ANALYSIS_CONCURRENCY))
+                ]
+                try:
+                    async for players in player_registry.iter_player_pages(redis_conn):
+                        done = await redis_conn.smismember(
+                            checkpoint_key(run_date), [player.username for player in players]
+                        )
+                        for player, is_done in zip(players, done):
+                            if is_done:
+                                stats["resumed_skipped"] += 1
+                                continue
+                            await queue.put(player)
+                    if stats["resumed_skipped"]:
+                        logger.info(
+                            f"Resumed daily analysis for {run_date}: {stats['resumed_skipped']} players were already checkpointed."
+                        )
+                    await queue.join()
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                await report_progress(redis_conn, run_date, stats, started)
             finally:
-                logger.info("Daily Gemini analysis job finished.")
-                pg_session_local.close()
+                stats["players_processed"] = (
+                    stats["analyzed"] + stats["skipped_unchanged"] + stats["failed"]
+                )
+                stats["duration_seconds"] = round(time.monotonic() - started, 2)
+                logger.info(f"Daily Gemini analysis job finished. Stats: {stats}")
 
     except Exception as e:
         logger.error(
             f"An error occurred during the daily Gemini analysis job: {e}",
             exc_info=True,
         )
+        stats["error"] = str(e)
+    return stats
+
+
+def record_player_error(stats: Dict[str, Any], username: str):
+    errors = stats.setdefault("player_errors", {})
+    errors[username] = errors.get(username, 0) + 1
+
+
+async def analyze_with_retries(
+    player: redis_models.Player,
+    db: redis.Redis,
+    stats: Dict[str, Any],
+    pacing: Dict[str, float],
+) -> str:
+    attempt = 0
+    while True:
+        wait = pacing["pause_until"] - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        try:
+            return await asyncio.wait_for(
+                analyze_player_data(player, db, stats=stats),
+                timeout=ANALYSIS_PLAYER_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Analysis for player {player.username} timed out after {ANALYSIS_PLAYER_TIMEOUT_SECONDS}s"
+            )
+            return FAILED
+        except llm_gateway.LLMRateLimitError:
+            stats["rate_limited"] += 1
+            pacing["pause_until"] = max(
+                pacing["pause_until"],
+                time.monotonic() + ANALYSIS_RATE_LIMIT_COOLDOWN_SECONDS,
+            )
+            if attempt >= ANALYSIS_RATE_LIMIT_REQUEUES:
+                return FAILED
+            attempt += 1
+            logger.warning(
+                f"Rate limited analysing {player.username}, pausing workers for {ANALYSIS_RATE_LIMIT_COOLDOWN_SECONDS}s and retrying."
+            )
+
+
+async def analysis_worker(
+    queue: asyncio.Queue,
+    db: redis.Redis,
+    run_date: str,
+    stats: Dict[str, Any],
+    pacing: Dict[str, float],
+    started: float,
+):
+    while True:
+        player = await queue.get()
+        try:
+            outcome = await analyze_with_retries(player, db, stats, pacing)
+
+            if outcome == FAILED:
+                stats["failed"] += 1
+                record_player_error(stats, player.username)
+            else:
+                stats["analyzed" if outcome == ANALYZED else "skipped_unchanged"] += 1
+                pipe = db.pipeline()
+                pipe.sadd(checkpoint_key(run_date), player.username)
+                pipe.expire(checkpoint_key(run_date), ANALYSIS_CHECKPOINT_TTL_SECONDS)
+                await pipe.execute()
+
+            processed = stats["analyzed"] + stats["skipped_unchanged"] + stats["failed"]
+            if processed % ANALYSIS_PROGRESS_EVERY == 0:
+                await report_progress(db, run_date, stats, started)
+        except Exception as e:
+            stats["failed"] += 1
+            record_player_error(stats, player.username)
+            logger.error(
+                f"Analysis worker error for player {player.username}: {e}", exc_info=True
+            )
+        finally:
+            queue.task_done()
+
+
+async def report_progress(
+    db: redis.Redis, run_date: str, stats: Dict[str, Any], started: float
+):
+    processed = stats["analyzed"] + stats["skipped_unchanged"] + stats["failed"]
+    remaining = stats["players_total"] - stats["resumed_skipped"] - processed
+    elapsed = time.monotonic() - started
+    rate = processed / elapsed if elapsed > 0 else 0
+    logger.info(
+        f"Daily analysis progress: {processed} processed ({stats['analyzed']} analyzed, "
+        f"{stats['skipped_unchanged']} skipped unchanged, {stats['failed']} failed), "
+        f"{remaining} remaining, {rate:.2f} players/s"
+    )
+    try:
+        await db.hset(
+            progress_key(run_date),
+            mapping={
+                "players_total": stats["players_total"],
+                "analyzed": stats["analyzed"],
+                "skipped_unchanged": stats["skipped_unchanged"],
+                "failed": stats["failed"],
+                "resumed_skipped": stats["resumed_skipped"],
+                "remaining": remaining,
+                "players_per_second": round(rate, 3),
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        await db.expire(progress_key(run_date), ANALYSIS_CHECKPOINT_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Failed to store daily analysis progress: {e}")
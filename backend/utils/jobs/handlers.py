@@ -0,0 +1,58 @@
+import logging
+from typing import List
+
+from routers.finance import process_statement_text
+from utils.ai import initial_feed
+from utils.database import aura_ledger, pg_database, redis_database
+from utils.jobs import gemini_analyzer, job_queue, penalise
+from utils.jobs.job_queue import register_job
+from utils.jobs.job_runs import tracked_run
+
+logger = logging.getLogger(__name__)
+
+
+@register_job("initial_feed")
+async def run_initial_feed(username: str):
+    await initial_feed.generate_initial_feed(username)
+
+
+@register_job("overdue_check")
+@tracked_run
+async def run_overdue_check():
+    if penalise.PENALTY_FAN_OUT:
+        r = await redis_database.get_redis_connection()
+        return await penalise.fan_out_overdue_check(r)
+    return await penalise.check_overdue_and_penalize()
+
+
+@register_job("overdue_check_shard")
+@tracked_run
+async def run_overdue_check_shard(shards: List[int]):
+    return await penalise.check_overdue_and_penalize(shards=shards)
+
+
+@register_job("daily_analysis")
+@tracked_run
+async def run_daily_analysis(resume: bool = True):
+    return await gemini_analyzer.run_daily_analysis_job(resume=resume)
+
+
+@register_job("aura_compaction")
+@tracked_run
+async def run_aura_compaction():
+    r = await redis_database.get_redis_connection()
+    return await aura_ledger.compact_dirty(r)
+
+
+@register_job("finance_statement")
+async def run_finance_statement(user_id: str, blob_key: str):
+    r = await redis_database.get_redis_connection()
+    raw_text = await job_queue.get_blob(r, blob_key)
+    if raw_text is None:
+        raise RuntimeError("Statement text expired before it was processed.")
+    db = pg_database.SessionLocal()
+    try:
+        result = await process_statement_text(raw_text, user_id, db)
+        return result.model_dump()
+    finally:
+        db.close()
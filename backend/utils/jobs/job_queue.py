@@ -0,0 +1,334 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import redis.asyncio as redis
+
+from utils.database import redis_database
+from utils.general.get_env import getenv
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = "default"
+JOB_MAX_ATTEMPTS = int(getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_VISIBILITY_TIMEOUT_SECONDS = int(getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", 300))
+JOB_RETRY_BASE_SECONDS = int(getenv("JOB_RETRY_BASE_SECONDS", 30))
+JOB_RESULT_TTL_SECONDS = int(getenv("JOB_RESULT_TTL_SECONDS", 604800))
+JOB_DEAD_TTL_SECONDS = int(getenv("JOB_DEAD_TTL_SECONDS", 2592000))
+JOB_DEAD_MAX_LENGTH = int(getenv("JOB_DEAD_MAX_LENGTH", 1000))
+# Bulky job inputs live under their own key for at most this long, so they
+# are never kept around with the job's result or dead-letter record.
+JOB_BLOB_TTL_SECONDS = int(getenv("JOB_BLOB_TTL_SECONDS", 86400))
+JOB_POLL_INTERVAL_SECONDS = float(getenv("JOB_POLL_INTERVAL_SECONDS", 1))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_RETRYING = "retrying"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"
+
+JobHandler = Callable[..., Awaitable[Any]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+# Pops the oldest pending job and marks it in flight until ARGV[1] (ms).
+RESERVE_SCRIPT = """
+local job_id = redis.call('RPOP', KEYS[1])
+if not job_id then
+    return false
+end
+redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+redis.call('HINCRBY', ARGV[2] .. job_id, 'attempts', 1)
+redis.call('HSET', ARGV[2] .. job_id, 'status', 'running', 'started_at', ARGV[3])
+return job_id
+"""
+
+# Moves every member of the sorted set KEYS[1] scored at or before ARGV[1]
+# back onto the pending list KEYS[2]; used for both expired in-flight jobs
+# and delayed retries that became due.
+RELEASE_DUE_SCRIPT = """
+local job_ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, job_id in ipairs(job_ids) do
+    redis.call('ZREM', KEYS[1], job_id)
+    redis.call('LPUSH', KEYS[2], job_id)
+end
+return job_ids
+"""
+
+
+def pending_key(queue: str) -> str:
+    return f"queue:{queue}:pending"
+
+
+def inflight_key(queue: str) -> str:
+    return f"queue:{queue}:inflight"
+
+
+def delayed_key(queue: str) -> str:
+    return f"queue:{queue}:delayed"
+
+
+def dead_key(queue: str) -> str:
+    return f"queue:{queue}:dead"
+
+
+JOB_KEY_PREFIX = "queue:job:"
+BLOB_KEY_PREFIX = "queue:blob:"
+
+
+def job_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}{job_id}"
+
+
+def blob_key(job_id: str) -> str:
+    return f"{BLOB_KEY_PREFIX}{job_id}"
+
+
+def register_job(job_type: str):
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[job_type] = func
+        return func
+
+    return decorator
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def enqueue(
+    r: redis.Redis,
+    job_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+    queue: str = DEFAULT_QUEUE,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    job_id: Optional[str] = None,
+    blob: Optional[str] = None,
+) -> str:
+    # A blob is stored next to the job and handed to the handler as the
+    # blob_key argument; it is deleted once the job is done or dead.
+    job_id = job_id or str(uuid.uuid4())
+    payload = dict(payload or {})
+    pipe = r.pipeline(transaction=True)
+    if blob is not None:
+        payload["blob_key"] = blob_key(job_id)
+        pipe.set(blob_key(job_id), blob, ex=JOB_BLOB_TTL_SECONDS)
+    pipe.hset(
+        job_key(job_id),
+        mapping={
+            "id": job_id,
+            "type": job_type,
+            "queue": queue,
+            "payload": json.dumps(payload),
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "status": STATUS_QUEUED,
+            "created_at": _now_iso(),
+        },
+    )
+    pipe.lpush(pending_key(queue), job_id)
+    await pipe.execute()
+    logger.info(f"Enqueued job {job_id} ({job_type}) on queue '{queue}'")
+    return job_id
+
+
+async def get_job(r: redis.Redis, job_id: str) -> Optional[Dict[str, Any]]:
+    job = await r.hgetall(job_key(job_id))
+    if not job:
+        return None
+    job["payload"] = json.loads(job.get("payload") or "{}")
+    if job.get("result"):
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+async def get_blob(r: redis.Redis, key: str) -> Optional[str]:
+    return await r.get(key)
+
+
+async def reserve(r: redis.Redis, queue: str) -> Optional[str]:
+    deadline = _now_ms() + JOB_VISIBILITY_TIMEOUT_SECONDS * 1000
+    return await r.eval(
+        RESERVE_SCRIPT,
+        2,
+        pending_key(queue),
+        inflight_key(queue),
+        deadline,
+        JOB_KEY_PREFIX,
+        _now_iso(),
+    )
+
+
+async def extend_visibility(r: redis.Redis, queue: str, job_id: str):
+    deadline = _now_ms() + JOB_VISIBILITY_TIMEOUT_SECONDS * 1000
+    await r.zadd(inflight_key(queue), {job_id: deadline}, xx=True)
+
+
+async def ack(r: redis.Redis, queue: str, job_id: str, result: Any = None):
+    pipe = r.pipeline(transaction=True)
+    pipe.zrem(inflight_key(queue), job_id)
+    pipe.hset(
+        job_key(job_id),
+        mapping={
+            "status": STATUS_DONE,
+            "finished_at": _now_iso(),
+            "result": json.dumps(result, default=str),
+        },
+    )
+    pipe.expire(job_key(job_id), JOB_RESULT_TTL_SECONDS)
+    pipe.delete(blob_key(job_id))
+    await pipe.execute()
+
+
+async def fail(r: redis.Redis, queue: str, job_id: str, error: str):
+    job = await r.hmget(job_key(job_id), "attempts", "max_attempts")
+    attempts = int(job[0] or 0)
+    max_attempts = int(job[1] or JOB_MAX_ATTEMPTS)
+
+    pipe = r.pipeline(transaction=True)
+    pipe.zrem(inflight_key(queue), job_id)
+    if attempts >= max_attempts:
+        pipe.lpush(dead_key(queue), job_id)
+        pipe.ltrim(dead_key(queue), 0, JOB_DEAD_MAX_LENGTH - 1)
+        pipe.hset(
+            job_key(job_id),
+            mapping={"status": STATUS_DEAD, "last_error": error, "finished_at": _now_iso()},
+        )
+        pipe.expire(job_key(job_id), JOB_DEAD_TTL_SECONDS)
+        pipe.delete(blob_key(job_id))
+        logger.error(f"Job {job_id} moved to dead-letter after {attempts} attempts: {error}")
+    else:
+        retry_at = _now_ms() + JOB_RETRY_BASE_SECONDS * 1000 * (2 ** (attempts - 1))
+        pipe.zadd(delayed_key(queue), {job_id: retry_at})
+        pipe.hset(job_key(job_id), mapping={"status": STATUS_RETRYING, "last_error": error})
+        logger.warning(f"Job {job_id} failed (attempt {attempts}/{max_attempts}), retrying: {error}")
+    await pipe.execute()
+
+
+async def release_due(r: redis.Redis, queue: str) -> List[str]:
+    now = _now_ms()
+    expired = await r.eval(RELEASE_DUE_SCRIPT, 2, inflight_key(queue), pending_key(queue), now)
+    for job_id in expired:
+        logger.warning(f"Job {job_id} exceeded its visibility timeout, requeued")
+    retried = await r.eval(RELEASE_DUE_SCRIPT, 2, delayed_key(queue), pending_key(queue), now)
+    return list(expired) + list(retried)
+
+
+async def requeue_dead(r: redis.Redis, queue: str, job_id: str) -> bool:
+    removed = await r.lrem(dead_key(queue), 1, job_id)
+    if not removed:
+        return False
+    if not await r.exists(job_key(job_id)):
+        logger.warning(f"Dead job {job_id} expired before it was requeued")
+        return False
+    pipe = r.pipeline(transaction=True)
+    pipe.hset(job_key(job_id), mapping={"status": STATUS_QUEUED, "attempts": 0})
+    pipe.persist(job_key(job_id))
+    pipe.lpush(pending_key(queue), job_id)
+    await pipe.execute()
+    return True
+
+
+async def queue_stats(r: redis.Redis, queue: str = DEFAULT_QUEUE) -> Dict[str, int]:
+    pipe = r.pipeline()
+    pipe.llen(pending_key(queue))
+    pipe.zcard(inflight_key(queue))
+    pipe.zcard(delayed_key(queue))
+    pipe.llen(dead_key(queue))
+    pending, inflight, delayed, dead = await pipe.execute()
+    return {"pending": pending, "inflight": inflight, "delayed": delayed, "dead": dead}
+
+
+async def execute_job(r: redis.Redis, queue: str, job_id: str):
+    job = await get_job(r, job_id)
+    if job is None:
+        logger.error(f"Reserved job {job_id} has no data, dropping it")
+        await r.zrem(inflight_key(queue), job_id)
+        return
+
+    if int(job.get("attempts", 0)) > int(job.get("max_attempts", JOB_MAX_ATTEMPTS)):
+        await fail(r, queue, job_id, "Exceeded max attempts after its worker was lost")
+        return
+
+    handler = JOB_HANDLERS.get(job["type"])
+    if handler is None:
+        await fail(r, queue, job_id, f"No handler registered for job type '{job['type']}'")
+        return
+
+    async def keep_visible():
+        while True:
+            await asyncio.sleep(JOB_VISIBILITY_TIMEOUT_SECONDS / 3)
+            try:
+                await extend_visibility(r, queue, job_id)
+            except Exception as e:
+                logger.error(f"Failed to extend visibility of job {job_id}: {e}")
+
+    heartbeat = asyncio.create_task(keep_visible())
+    started = time.monotonic()
+    try:
+        result = await handler(**job["payload"])
+    except Exception as e:
+        logger.error(f"Job {job_id} ({job['type']}) raised: {e}", exc_info=True)
+        await fail(r, queue, job_id, str(e))
+    else:
+        await ack(r, queue, job_id, result)
+        logger.info(
+            f"Job {job_id} ({job['type']}) done in {time.monotonic() - started:.2f}s"
+        )
+    finally:
+        heartbeat.cancel()
+
+
+async def worker_loop(r: redis.Redis, queue: str, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            job_id = await reserve(r, queue)
+        except Exception as e:
+            logger.error(f"Failed to reserve job from '{queue}': {e}", exc_info=True)
+            job_id = None
+        if job_id is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await execute_job(r, queue, job_id)
+        except Exception as e:
+            # The job stays in flight and is released again once its
+            # visibility timeout passes.
+            logger.error(f"Failed to run job {job_id} from '{queue}': {e}", exc_info=True)
+
+
+async def maintenance_loop(r: redis.Redis, queues: List[str], stop: asyncio.Event):
+    while not stop.is_set():
+        for queue in queues:
+            try:
+                await release_due(r, queue)
+            except Exception as e:
+                logger.error(f"Queue maintenance failed for '{queue}': {e}", exc_info=True)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(queues: List[str], concurrency: int, stop: asyncio.Event):
+    r = await redis_database.get_redis_connection()
+    logger.info(
+        f"Job worker started on queues {queues} with concurrency {concurrency}. Handlers: {sorted(JOB_HANDLERS)}"
+    )
+    tasks = [asyncio.create_task(maintenance_loop(r, queues, stop))]
+    for queue in queues:
+        tasks.extend(
+            asyncio.create_task(worker_loop(r, queue, stop)) for _ in range(concurrency)
+        )
+    await asyncio.gather(*tasks)
+    logger.info("Job worker stopped.")
@@ -0,0 +1,140 @@
+import functools
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as redis
+from sqlalchemy.orm import Session
+
+from models.pg_models import JobRun, JobRunStatus
+from utils.database import pg_database
+from utils.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+def create_run(
+    db: Session, job_id: str, job_type: str, triggered_by: str
+) -> JobRun:
+    run = JobRun(job_id=job_id, job_type=job_type, triggered_by=triggered_by)
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+def set_queued_job(db: Session, run: JobRun, queued_job_id: str):
+    run.queued_job_id = queued_job_id
+    db.commit()
+
+
+async def enqueue_run(
+    r: redis.Redis,
+    db: Session,
+    job_id: str,
+    job_type: str,
+    triggered_by: str,
+    payload: Optional[Dict[str, Any]] = None,
+) -> JobRun:
+    run = create_run(db, job_id, job_type, triggered_by)
+    try:
+        queued_job_id = await job_queue.enqueue(
+            r, job_type, {**(payload or {}), "run_id": str(run.id)}
+        )
+    except Exception as e:
+        run.status = JobRunStatus.FAILED
+        run.error = f"Failed to enqueue: {e}"
+        db.commit()
+        raise
+    set_queued_job(db, run, queued_job_id)
+    return run
+
+
+def get_run(db: Session, run_id: str) -> Optional[JobRun]:
+    try:
+        run_uuid = uuid.UUID(str(run_id))
+    except ValueError:
+        return None
+    return db.query(JobRun).filter(JobRun.id == run_uuid).first()
+
+
+def list_runs(
+    db: Session, job_id: Optional[str] = None, limit: int = 20
+) -> List[JobRun]:
+    query = db.query(JobRun)
+    if job_id:
+        query = query.filter(JobRun.job_id == job_id)
+    return query.order_by(JobRun.created_at.desc()).limit(limit).all()
+
+
+def _mark_started(run_id: str):
+    db = pg_database.SessionLocal()
+    try:
+        run = get_run(db, run_id)
+        if run is None:
+            logger.warning(f"Job run {run_id} not found, running untracked.")
+            return
+        run.status = JobRunStatus.RUNNING
+        run.started_at = datetime.utcnow()
+        run.finished_at = None
+        run.error = None
+        db.commit()
+    finally:
+        db.close()
+
+
+def _mark_finished(
+    run_id: str, duration_ms: int, stats: Optional[Dict[str, Any]], error: Optional[str]
+):
+    stats = stats or {}
+    players_processed = stats.get("players_processed")
+    db = pg_database.SessionLocal()
+    try:
+        run = get_run(db, run_id)
+        if run is None:
+            return
+        run.status = JobRunStatus.FAILED if error else JobRunStatus.SUCCEEDED
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = duration_ms
+        run.players_processed = players_processed
+        run.player_errors = stats.get("player_errors") or {}
+        run.throughput = (
+            round(players_processed / (duration_ms / 1000), 3)
+            if players_processed and duration_ms
+            else None
+        )
+        run.stats = {
+            name: value for name, value in stats.items() if name != "player_errors"
+        }
+        run.error = error
+        db.commit()
+    finally:
+        db.close()
+
+
+def tracked_run(func):
+    # Job handlers wrapped with this accept an optional run_id and record the
+    # outcome of each attempt on that job_runs row.
+    @functools.wraps(func)
+    async def wrapper(run_id: Optional[str] = None, **kwargs):
+        if run_id is None:
+            return await func(**kwargs)
+        _mark_started(run_id)
+        started = time.monotonic()
+        try:
+            stats = await func(**kwargs)
+        except Exception as e:
+            _mark_finished(run_id, int((time.monotonic() - started) * 1000), None, str(e))
+            raise
+        stats = stats if isinstance(stats, dict) else {}
+        _mark_finished(
+            run_id,
+            int((time.monotonic() - started) * 1000),
+            stats,
+            stats.get("error"),
+        )
+        return stats
+
+    return wrapper
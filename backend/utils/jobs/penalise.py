@@ -1,83 +1,297 @@
 import logging
-from datetime import datetime, timedelta, timezone, date
+import time
+from collections import defaultdict
+from datetime import datetime, timezone, date
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
 from sqlalchemy.orm import Session
 
-from utils.database import redis_database, pg_database
+from utils.database import aura_ledger, item_index, player_registry, redis_database, pg_database
 from models import redis_models
-from utils.general.history_logger import log_history, HistoryType
-from utils.operations.crud_func import get_all_players 
-from routers.players import get_all_redis 
+from utils.general import recurrence
+from utils.general.get_env import getenv
+from utils.general.history_logger import log_history_batch, HistoryType
+from utils.jobs import job_runs
 
 logger = logging.getLogger(__name__)
 
+PENALTY_BATCH_SIZE = int(getenv("PENALTY_BATCH_SIZE", 200))
+PENALTY_FAN_OUT = getenv("PENALTY_FAN_OUT", "false").lower() == "true"
+PENALTY_CHECKPOINT_TTL_SECONDS = int(getenv("PENALTY_CHECKPOINT_TTL_SECONDS", 172800))
 
-def calculateNextDueDate(
-    start_date: date, occurence: redis_models.Occurence, x_occurence: int
-) -> date:
-    next_due = datetime.combine(start_date, datetime.min.time())
 
-    if occurence == redis_models.Occurence.DAYS:
-        next_due += timedelta(days=x_occurence)
-    elif occurence == redis_models.Occurence.WEEKS:
-        next_due += timedelta(weeks=x_occurence)
-    elif occurence == redis_models.Occurence.MONTHS:
-        next_due += timedelta(days=x_occurence * 30)
-    else:
-        logger.error(f"Unknown occurence type encountered: {occurence}")
-        raise ValueError(f"Unsupported occurrence type: {occurence}")
-    next_due -= timedelta(days=1)
-    return next_due.date()
+def checkpoint_key(run_date: str) -> str:
+    return f"job:overdue_check:{run_date}:done"
 
 
-async def check_overdue_and_penalize():
-    logger.info(f"Running check & penalize job at {datetime.now(timezone.utc)}")
-    r = await redis_database.get_redis_connection()
-    try:
-        all_players = await get_all_players(r)
-        today = datetime.now().date()
+async def load_overdue_items(
+    r: redis.Redis, shard: int, today: date
+) -> Tuple[Dict[str, List[Any]], List[redis_models.Routine]]:
+    # Returns the items to penalise per player and every routine whose
+    # period has lapsed, completed or not, to be rolled forward.
+    overdue_keys = await item_index.get_overdue_keys(r, shard, today)
+    items_by_player: Dict[str, List[Any]] = defaultdict(list)
+    lapsed: List[redis_models.Routine] = []
+    if not overdue_keys:
+        return items_by_player, lapsed
 
-        for player in all_players:
-            total_penalty = 0
-            current_aura = player.aura
+    raw_items = await r.mget(overdue_keys)
+    stale = []
+    tasks: List[redis_models.Task] = []
+    routines: List[redis_models.Routine] = []
+    for key, raw in zip(overdue_keys, raw_items):
+        if raw is None:
+            stale.append(key)
+            continue
+        try:
+            if key.startswith("task:"):
+                tasks.append(redis_models.Task.model_validate_json(raw))
+            else:
+                routines.append(redis_models.Routine.model_validate_json(raw))
+        except Exception as e:
+            logger.error(f"Penalize Job: Unreadable overdue item {key}: {e}")
 
-            habits, tasks, routines = await get_all_redis(r, player.username)
+    # Index entries are written with the item, but re-check in case the
+    # index was built from data that has since changed.
+    for task in tasks:
+        if task.completed or task.due_date >= today:
+            stale.append(f"task:{task.userId}:{task.id}")
+        else:
+            items_by_player[task.userId].append(task)
 
-            for task in tasks:
-                if not task.completed and task.due_date < today:
-                    total_penalty += 2
+    overdue_mask = recurrence.bulk_overdue_mask(
+        [routine.start_date for routine in routines],
+        [routine.occurence for routine in routines],
+        [routine.x_occurence for routine in routines],
+        today,
+    )
+    for routine, overdue in zip(routines, overdue_mask):
+        if not overdue:
+            stale.append(f"routine:{routine.userId}:{routine.id}")
+            continue
+        lapsed.append(routine)
+        if not recurrence.is_period_completed(
+            routine.start_date,
+            routine.occurence,
+            routine.x_occurence,
+            routine.last_completed,
+            routine.next_due,
+        ):
+            items_by_player[routine.userId].append(routine)
 
-            for routine in routines:
-                next_due_date_str = calculateNextDueDate(
-                    routine.start_date,
-                    routine.occurence,
-                    routine.x_occurence,
-                )
-                if next_due_date_str < today:
-                    penalty = int(routine.aura / 2)
-                    total_penalty += penalty
-
-            if total_penalty > 0:
-                new_aura = max(0, current_aura - total_penalty)
-                await redis_database.redis_update(
-                    r,
-                    f"player:{player.username}",
-                    {"aura": new_aura},
-                    redis_models.Player,
-                )
-                logger.info(
-                    f"Aura penalized by {total_penalty} for overdue/incomplete items. New aura: {new_aura}"
-                )
-                pg_db: Session = pg_database.SessionLocal()
-                log_history(
-                    db=pg_db,
-                    user_id=player.username,
-                    history_type=HistoryType.PLAYER,
-                    data=player,
-                    comments=f"Aura penalized by {total_penalty} for overdue/incomplete items. New aura: {new_aura}",
+    await item_index.remove_from_index(r, shard, stale)
+    return items_by_player, lapsed
+
+
+def reset_checklist(items: List[redis_models.ChecklistItem]) -> List[redis_models.ChecklistItem]:
+    return [
+        item.model_copy(
+            update={"completed": False, "children": reset_checklist(item.children)}
+        )
+        for item in items
+    ]
+
+
+async def roll_forward_routines(
+    r: redis.Redis, routines: List[redis_models.Routine], today: date, max_attempts: int = 3
+) -> int:
+    # Moves lapsed routines on to the period containing today with a fresh
+    # checklist, so each missed period is penalised once and the due index
+    # points at the new deadline. Routines rolled or completed since they
+    # were loaded are left alone.
+    keys = [f"routine:{routine.userId}:{routine.id}" for routine in routines]
+    rolled = 0
+    for offset in range(0, len(keys), PENALTY_BATCH_SIZE):
+        batch = keys[offset : offset + PENALTY_BATCH_SIZE]
+        for attempt in range(max_attempts):
+            try:
+                async with r.pipeline(transaction=True) as pipe:
+                    await pipe.watch(*batch)
+                    raw_items = await pipe.mget(batch)
+                    pipe.multi()
+                    batch_rolled = 0
+                    for key, raw in zip(batch, raw_items):
+                        if raw is None:
+                            continue
+                        routine = redis_models.Routine.model_validate_json(raw)
+                        if routine.next_due >= today:
+                            continue
+                        start, _ = recurrence.current_period(
+                            routine.start_date, routine.occurence, routine.x_occurence, today
+                        )
+                        routine = routine.model_copy(
+                            update={
+                                "start_date": start,
+                                "last_completed": start,
+                                "checklist": reset_checklist(routine.checklist),
+                            }
+                        )
+                        redis_database.prepare_write(routine)
+                        pipe.set(key, routine.model_dump_json())
+                        redis_database.add_index_commands(pipe, key, routine)
+                        batch_rolled += 1
+                    await pipe.execute()
+                rolled += batch_rolled
+                break
+            except redis.WatchError:
+                logger.warning(
+                    f"Penalize Job: Rolling {len(batch)} routines raced with another writer, retrying ({attempt + 1}/{max_attempts})"
                 )
-                pg_db.close()
+        else:
+            logger.error(f"Penalize Job: Gave up rolling {len(batch)} routines forward")
+    return rolled
+
+
+def item_penalty(item: Any) -> int:
+    if isinstance(item, redis_models.Task):
+        return 2
+    return int(item.aura / 2)
+
+
+def item_source(item: Any) -> str:
+    if isinstance(item, redis_models.Task):
+        return f"task:{item.id}"
+    return f"routine:{item.id}"
+
+
+def calculate_penalty(overdue_items: List[Any]) -> int:
+    return sum(item_penalty(item) for item in overdue_items)
+
+
+async def apply_penalties(
+    r: redis.Redis, items_by_player: Dict[str, List[Any]]
+) -> Dict[str, redis_models.Player]:
+    # One ledger entry per overdue item, so each deduction names its source.
+    usernames = list(items_by_player)
+    updated: Dict[str, redis_models.Player] = {}
+    for offset in range(0, len(usernames), PENALTY_BATCH_SIZE):
+        batch = usernames[offset : offset + PENALTY_BATCH_SIZE]
+        deltas = [
+            (username, -item_penalty(item), "overdue_penalty", item_source(item))
+            for username in batch
+            for item in items_by_player[username]
+            if item_penalty(item) > 0
+        ]
+        balances = await aura_ledger.apply_deltas(r, deltas)
+        for player in await player_registry.load_players(r, list(balances)):
+            updated[player.username] = player
+    return updated
+
+
+async def penalize_shard(r: redis.Redis, shard: int, today: date) -> Dict[str, Any]:
+    started = time.monotonic()
+    items_by_player, lapsed = await load_overdue_items(r, shard, today)
+    penalties = {
+        username: calculate_penalty(items)
+        for username, items in items_by_player.items()
+    }
+    penalties = {username: total for username, total in penalties.items() if total > 0}
+    updated = await apply_penalties(
+        r, {username: items_by_player[username] for username in penalties}
+    )
+    rolled = await roll_forward_routines(r, lapsed, today)
+
+    history_entries = []
+    for username, player in updated.items():
+        comment = f"Aura penalized by {penalties[username]} for overdue/incomplete items. New aura: {player.aura}"
+        logger.info(f"{username}: {comment}")
+        history_entries.append((username, HistoryType.PLAYER, player, comment))
+    if history_entries:
+        # The penalties are already on the ledger, so a failed history write
+        # must not fail the shard and get it penalised again.
+        pg_db: Session = pg_database.SessionLocal()
+        try:
+            log_history_batch(pg_db, history_entries)
+        except Exception as e:
+            logger.error(f"Penalize shard {shard}: Failed to log penalty history: {e}", exc_info=True)
+        finally:
+            pg_db.close()
+
+    shard_stats = {
+        "players_processed": len(items_by_player),
+        "penalized": len(updated),
+        "overdue_items": sum(len(items) for items in items_by_player.values()),
+        "routines_rolled": rolled,
+        "duration_ms": int((time.monotonic() - started) * 1000),
+    }
+    logger.info(
+        f"Penalize shard {shard}/{item_index.DUE_INDEX_SHARDS}: {shard_stats['overdue_items']} overdue items, "
+        f"{shard_stats['penalized']} players penalized in {shard_stats['duration_ms']}ms"
+    )
+    return shard_stats
+
+
+async def check_overdue_and_penalize(
+    shards: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    logger.info(f"Running check & penalize job at {datetime.now(timezone.utc)}")
+    stats: Dict[str, Any] = {
+        "players_processed": 0,
+        "penalized": 0,
+        "overdue_items": 0,
+        "routines_rolled": 0,
+        "shards_skipped": 0,
+        "player_errors": {},
+        "shard_ms": {},
+    }
+    started = time.monotonic()
+    r = await redis_database.get_redis_connection()
+    try:
+        await item_index.ensure_due_index(r)
+        today = datetime.now().date()
+        if shards is None:
+            shards = list(range(item_index.DUE_INDEX_SHARDS))
+
+        for shard in shards:
+            # Claimed before any penalty is applied, so a redelivered or
+            # repeated run never penalises a shard twice on the same day.
+            pipe = r.pipeline(transaction=True)
+            pipe.sadd(checkpoint_key(today.isoformat()), shard)
+            pipe.expire(checkpoint_key(today.isoformat()), PENALTY_CHECKPOINT_TTL_SECONDS)
+            claimed, _ = await pipe.execute()
+            if not claimed:
+                stats["shards_skipped"] += 1
+                logger.info(f"Penalize Job: Shard {shard} was already processed on {today}, skipping.")
+                continue
+            try:
+                shard_stats = await penalize_shard(r, shard, today)
+            except Exception as e:
+                stats["shard_errors"] = stats.get("shard_errors", 0) + 1
+                logger.error(f"Penalize Job: Error in shard {shard}: {e}", exc_info=True)
+                # Released so a retry or the next run processes the shard.
+                try:
+                    await r.srem(checkpoint_key(today.isoformat()), shard)
+                except Exception as e:
+                    logger.error(f"Penalize Job: Failed to release shard {shard} for {today}: {e}")
+                continue
+            for name in ("players_processed", "penalized", "overdue_items", "routines_rolled"):
+                stats[name] += shard_stats[name]
+            stats["shard_ms"][str(shard)] = shard_stats["duration_ms"]
 
     except Exception as e:
         logger.error(f"Penalize Job: Error during run: {e}", exc_info=True)
+        stats["error"] = str(e)
+    stats["duration_seconds"] = round(time.monotonic() - started, 2)
+    logger.info(f"Penalize job finished. Stats: {stats}")
+    return stats
+
+
+async def fan_out_overdue_check(r: redis.Redis) -> Dict[str, Any]:
+    # Hands each shard to the queue so several workers can share the run;
+    # every shard gets its own job_runs row.
+    await item_index.ensure_due_index(r)
+    pg_db: Session = pg_database.SessionLocal()
+    try:
+        for shard in range(item_index.DUE_INDEX_SHARDS):
+            await job_runs.enqueue_run(
+                r,
+                pg_db,
+                "overdue_check_shard",
+                "overdue_check_shard",
+                "overdue_check",
+                {"shards": [shard]},
+            )
     finally:
-        pass
+        pg_db.close()
+    return {"shards_enqueued": item_index.DUE_INDEX_SHARDS}
@@ -41,21 +41,24 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 
 
 
+def get_username_from_token(token: str) -> str | None:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
+    username = get_username_from_token(token)
+    if username is None:
         raise credentials_exception
-    return token_data
+    return TokenData(username=username)
 
 async def get_current_username(
     token_data: TokenData = Depends(get_current_user),
@@ -1,10 +1,12 @@
 import logging
-from typing import List, Type
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple, Type
 from fastapi import HTTPException, status
+from pydantic import ValidationError
 import redis.asyncio as redis
 from sqlalchemy.orm import Session
 
-from models import pg_models, redis_models
+from models import pg_models, pydantic_models, redis_models
 
 from utils.operations.crud_types import (
     CreateSchemaType,
@@ -13,10 +15,14 @@ from utils.operations.crud_types import (
     PatternFunc,
     UpdateSchemaType,
 )
-from utils.database import redis_database
+from utils.database import aura_ledger, habit_streaks, redis_database
+from utils.general import change_tracker, recurrence
+from utils.general.get_env import getenv
 
 logger = logging.getLogger(__name__)
 
+BATCH_MAX_ITEMS = int(getenv("BATCH_MAX_ITEMS", 200))
+
 
 async def generic_create_item(
     item_data: CreateSchemaType,
@@ -142,6 +148,256 @@ async def generic_delete_item(
     return None
 
 
+def check_batch_size(entries: List[Any]):
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Batch is empty."
+        )
+    if len(entries) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batches are limited to {BATCH_MAX_ITEMS} items.",
+        )
+
+
+def _error_message(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        )
+    return str(e)
+
+
+async def generic_batch_create(
+    entries: List[Dict[str, Any]],
+    current_username: str,
+    db: redis.Redis,
+    key_func: KeyFunc,
+    model_class: Type[ModelType],
+) -> List[pydantic_models.BatchItemResult]:
+    check_batch_size(entries)
+    results: List[pydantic_models.BatchItemResult] = []
+    creates: Dict[str, ModelType] = {}
+    for entry in entries:
+        entry_id = entry.get("id") if isinstance(entry, dict) else None
+        try:
+            item = model_class.model_validate(entry)
+        except (ValidationError, TypeError, ValueError) as e:
+            results.append(
+                pydantic_models.BatchItemResult(
+                    id=entry_id, status="invalid", detail=_error_message(e)
+                )
+            )
+            continue
+        key = key_func(current_username, item.id)
+        if item.userId != current_username:
+            status_name, detail = "forbidden", "Cannot create item for another user."
+        elif key in creates:
+            status_name, detail = "invalid", "Duplicate id in batch."
+        else:
+            creates[key] = item
+            status_name, detail = "pending", None
+        results.append(
+            pydantic_models.BatchItemResult(id=item.id, status=status_name, detail=detail)
+        )
+
+    # Creating over an existing id would silently replace it.
+    existing = await db.mget(list(creates)) if creates else []
+    for key, raw in zip(list(creates), existing):
+        if raw is not None:
+            del creates[key]
+    report = await redis_database.redis_batch_patch(db, [], creates)
+    for result in results:
+        if result.status != "pending":
+            continue
+        key = key_func(current_username, result.id)
+        if key in report.items:
+            result.status, result.item = "created", report.items[key]
+        else:
+            result.status, result.detail = "conflict", "An item with this id already exists."
+    return results
+
+
+async def generic_batch_update(
+    entries: List[Dict[str, Any]],
+    current_username: str,
+    db: redis.Redis,
+    key_func: KeyFunc,
+    model_class: Type[ModelType],
+    update_model_class: Type[UpdateSchemaType],
+) -> Tuple[List[pydantic_models.BatchItemResult], Dict[str, Dict[str, Any]]]:
+    check_batch_size(entries)
+    results: List[pydantic_models.BatchItemResult] = []
+    patches = []
+    changes: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        entry_id = entry.get("id") if isinstance(entry, dict) else None
+        if not entry_id:
+            results.append(
+                pydantic_models.BatchItemResult(status="invalid", detail="Each update needs an id.")
+            )
+            continue
+        if entry_id in changes:
+            results.append(
+                pydantic_models.BatchItemResult(
+                    id=entry_id, status="invalid", detail="Duplicate id in batch."
+                )
+            )
+            continue
+        try:
+            update = update_model_class.model_validate(
+                {field: value for field, value in entry.items() if field != "id"}
+            )
+        except (ValidationError, TypeError, ValueError) as e:
+            results.append(
+                pydantic_models.BatchItemResult(
+                    id=entry_id, status="invalid", detail=_error_message(e)
+                )
+            )
+            continue
+        changes[entry_id] = update.model_dump(exclude_unset=True)
+        patches.append((key_func(current_username, entry_id), model_class, changes[entry_id]))
+        results.append(pydantic_models.BatchItemResult(id=entry_id, status="pending"))
+
+    report = await redis_database.redis_batch_patch(db, patches)
+    for result in results:
+        if result.status != "pending":
+            continue
+        key = key_func(current_username, result.id)
+        if key in report.items:
+            result.status, result.item = "updated", report.items[key]
+        elif key in report.failed:
+            result.status, result.detail = "invalid", report.failed[key]
+        else:
+            result.status, result.detail = "not_found", "Item not found"
+    return results, changes
+
+
+async def generic_batch_delete(
+    item_ids: List[str],
+    current_username: str,
+    db: redis.Redis,
+    key_func: KeyFunc,
+    model_class: Type[ModelType],
+) -> List[pydantic_models.BatchItemResult]:
+    check_batch_size(item_ids)
+    unique_ids = list(dict.fromkeys(item_ids))
+    keys = [key_func(current_username, item_id) for item_id in unique_ids]
+    raw_items = await db.mget(keys)
+    deleted = await redis_database.redis_batch_delete(db, keys)
+
+    results = []
+    for item_id, raw, count in zip(unique_ids, raw_items, deleted):
+        if not count:
+            results.append(
+                pydantic_models.BatchItemResult(id=item_id, status="not_found", detail="Item not found")
+            )
+            continue
+        try:
+            item = model_class.model_validate_json(raw) if raw else None
+        except ValidationError:
+            item = None
+        results.append(pydantic_models.BatchItemResult(id=item_id, status="deleted", item=item))
+    return results
+
+
+def set_completion(
+    item: ModelType, completed: bool, today: Optional[date] = None
+) -> Optional[ModelType]:
+    # Returns the item in its new state, or None when it is already there.
+    # Recurring items are first moved on to the period containing today;
+    # completing a period sets last_completed to the start of the next one,
+    # as the dashboard has it.
+    if isinstance(item, redis_models.Task):
+        if item.completed == completed:
+            return None
+        return type(item).model_validate({**item.model_dump(), "completed": completed})
+
+    if not hasattr(item, "last_completed"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This item cannot be completed.",
+        )
+    today = today or date.today()
+    if recurrence.is_period_completed(
+        item.start_date, item.occurence, item.x_occurence, item.last_completed, today
+    ) == completed:
+        return None
+    period_start, _ = recurrence.current_period(
+        item.start_date, item.occurence, item.x_occurence, today
+    )
+    last_completed = (
+        recurrence.add_period(period_start, item.occurence, item.x_occurence)
+        if completed
+        else period_start
+    )
+    item_dict = item.model_dump()
+    item_dict.update(start_date=period_start, last_completed=last_completed)
+    return redis_database.prepare_write(type(item).model_validate(item_dict))
+
+
+async def generic_complete_item(
+    item_id: str,
+    completed: bool,
+    current_username: str,
+    db: redis.Redis,
+    key_func: KeyFunc,
+    model_class: Type[ModelType],
+    max_attempts: int = 3,
+) -> Tuple[ModelType, int, Optional[int]]:
+    key = key_func(current_username, item_id)
+    today = date.today()
+
+    for attempt in range(max_attempts):
+        try:
+            async with db.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                raw = await pipe.get(key)
+                if raw is None:
+                    raise HTTPException(status_code=404, detail="Item not found")
+                item = model_class.model_validate_json(raw)
+                if item.userId != current_username:
+                    raise HTTPException(
+                        status_code=403, detail="Not authorized to access this item"
+                    )
+
+                updated_item = set_completion(item, completed, today)
+                if updated_item is None:
+                    await pipe.reset()
+                    player = await aura_ledger.get_player(db, current_username)
+                    return item, 0, player.aura if player else None
+
+                awarded = item.aura if completed else -item.aura
+                pipe.multi()
+                pipe.set(key, updated_item.model_dump_json())
+                await aura_ledger.queue_delta(
+                    db,
+                    pipe,
+                    current_username,
+                    awarded,
+                    "completed" if completed else "uncompleted",
+                    key,
+                )
+                change_tracker.queue_mark_changed(pipe, current_username)
+                if isinstance(updated_item, redis_models.Habit):
+                    await habit_streaks.queue_mark_day(
+                        db, pipe, updated_item, today, completed
+                    )
+                redis_database.add_index_commands(pipe, key, updated_item)
+                results = await pipe.execute()
+            balance = results[1]
+            return updated_item, awarded, int(balance) if balance is not None else None
+        except redis.WatchError:
+            logger.warning(
+                f"Completion of {key} raced with another writer, retrying ({attempt + 1}/{max_attempts})"
+            )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Item kept changing during completion, try again.",
+    )
+
+
 async def get_player_history_records(
     user_id: str, db: Session, limit: int = 25
 ) -> List[pg_models.History]:
@@ -154,9 +410,3 @@ async def get_player_history_records(
     )
     return history_records
 
-
-async def get_all_players(db: redis.Redis) -> List[redis_models.Player]:
-    players = await redis_database.redis_get_all_by_prefix(
-        db, "player:*", redis_models.Player
-    )
-    return players
@@ -1,10 +1,17 @@
 import logging
-from typing import List, Type, Dict
-from fastapi import Depends, status, APIRouter, Body
+from datetime import date
+from typing import Any, List, Optional, Type, Dict
+from fastapi import Depends, HTTPException, status, APIRouter, Body, Query, Request, Response
+from fastapi.responses import JSONResponse
 import redis.asyncio as redis
 from sqlalchemy.orm import Session
 
+from models import pydantic_models
 from utils.operations.crud_func import (
+    generic_batch_create,
+    generic_batch_delete,
+    generic_batch_update,
+    generic_complete_item,
     generic_create_item,
     generic_delete_item,
     generic_read_item,
@@ -12,9 +19,10 @@ from utils.operations.crud_func import (
     generic_update_item,
 )
 
-from utils.database import pg_database, redis_database
+from utils.database import list_index, pg_database, redis_database
 from utils.operations import auth
-from utils.general.history_logger import log_history, HistoryType
+from utils.general.history_logger import log_history, log_history_batch, HistoryType
+from utils.general import change_tracker
 from utils.operations.crud_types import (
     ModelType,
     UpdateSchemaType,
@@ -25,7 +33,7 @@ from utils.operations.crud_types import (
 
 logger = logging.getLogger(__name__)
 
-
+LIST_MAX_LIMIT = 500
 
 
 def create_crud_router(
@@ -48,6 +56,8 @@ def create_crud_router(
         "routines": HistoryType.ROUTINE,
     }
     crud_history_type = history_type_map.get(prefix)
+    # Item keys are "<type>:<username>:<id>".
+    item_type = key_func("", "").split(":", 1)[0]
     if crud_history_type is None:
         logger.warning(
             f"No HistoryType mapping found for CRUD prefix '{prefix}'. History logging will be disabled for this router."
@@ -63,6 +73,7 @@ def create_crud_router(
         created_item = await generic_create_item(
             item_data, current_username, db, key_func, model_class
         )
+        await change_tracker.mark_changed(db, current_username)
         if crud_history_type:
             log_history(
                 db=pg_db,
@@ -73,14 +84,168 @@ def create_crud_router(
             )
         return created_item
 
+    def batch_result(
+        results: List[pydantic_models.BatchItemResult], ok_status: str
+    ) -> pydantic_models.BatchResult:
+        succeeded = sum(1 for result in results if result.status == ok_status)
+        return pydantic_models.BatchResult(
+            succeeded=succeeded, failed=len(results) - succeeded, results=results
+        )
+
+    # Registered before the /{item_id} routes so "batch" is not taken as an id.
+    @router.post("/batch", response_model=pydantic_models.BatchResult)
+    async def batch_create_endpoint(
+        entries: List[Dict[str, Any]] = Body(...),
+        current_username: str = Depends(get_username_dependency),
+        db: redis.Redis = Depends(redis_database.get_redis_connection),
+        pg_db: Session = Depends(pg_database.get_pg_db),
+    ):
+        results = await generic_batch_create(
+            entries, current_username, db, key_func, model_class
+        )
+        created = [result.item for result in results if result.status == "created"]
+        if created:
+            await change_tracker.mark_changed(db, current_username)
+            if crud_history_type:
+                log_history_batch(
+                    pg_db,
+                    [
+                        (current_username, crud_history_type, item, f"Item created: {item.name}")
+                        for item in created
+                    ],
+                )
+        return batch_result(results, "created")
+
+    @router.put("/batch", response_model=pydantic_models.BatchResult)
+    async def batch_update_endpoint(
+        entries: List[Dict[str, Any]] = Body(...),
+        current_username: str = Depends(get_username_dependency),
+        db: redis.Redis = Depends(redis_database.get_redis_connection),
+        pg_db: Session = Depends(pg_database.get_pg_db),
+    ):
+        results, changes = await generic_batch_update(
+            entries, current_username, db, key_func, model_class, update_model_class
+        )
+        updated = [result for result in results if result.status == "updated"]
+        if updated:
+            await change_tracker.mark_changed(db, current_username)
+            if crud_history_type:
+                log_history_batch(
+                    pg_db,
+                    [
+                        (
+                            current_username,
+                            crud_history_type,
+                            result.item,
+                            f"Item updated. Changes: {changes[result.id]}",
+                        )
+                        for result in updated
+                    ],
+                )
+        return batch_result(results, "updated")
+
+    @router.delete("/batch", response_model=pydantic_models.BatchResult)
+    async def batch_delete_endpoint(
+        item_ids: List[str] = Body(...),
+        current_username: str = Depends(get_username_dependency),
+        db: redis.Redis = Depends(redis_database.get_redis_connection),
+        pg_db: Session = Depends(pg_database.get_pg_db),
+    ):
+        results = await generic_batch_delete(
+            item_ids, current_username, db, key_func, model_class
+        )
+        deleted = [result for result in results if result.status == "deleted"]
+        if deleted:
+            await change_tracker.mark_changed(db, current_username)
+            if crud_history_type:
+                log_history_batch(
+                    pg_db,
+                    [
+                        (
+                            current_username,
+                            crud_history_type,
+                            result.item if result.item else {"id": result.id},
+                            f"Item deleted: {result.item.name if result.item else result.id}",
+                        )
+                        for result in deleted
+                    ],
+                )
+        return batch_result(results, "deleted")
+
     @router.get("/", response_model=List[model_class])
     async def read_items_endpoint(
+        request: Request,
+        response: Response,
+        completed: Optional[bool] = None,
+        due_from: Optional[date] = None,
+        due_to: Optional[date] = None,
+        occurence: Optional[str] = Query(
+            None, description=f"One of {', '.join(list_index.OCCURENCES)}"
+        ),
+        sort: Optional[str] = Query(
+            None, description=f"One of {', '.join(list_index.SORT_FIELDS)}"
+        ),
+        order: str = Query("asc", pattern="^(asc|desc)$"),
+        limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
         current_username: str = Depends(get_username_dependency),
         db: redis.Redis = Depends(redis_database.get_redis_connection),
     ):
-        return await generic_read_user_items(
-            current_username, db, pattern_func, model_class
+        projection = None
+        if fields:
+            projection = {field.strip() for field in fields.split(",") if field.strip()}
+            unknown = projection - set(model_class.model_fields)
+            if unknown:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+                )
+            projection.add("id")
+
+        etag, not_modified = await change_tracker.check_etag(
+            db, current_username, request.headers.get("if-none-match")
         )
+        if not_modified:
+            return Response(status_code=304, headers=change_tracker.cache_headers(etag))
+        headers = change_tracker.cache_headers(etag)
+
+        queried = any(
+            param is not None
+            for param in (completed, due_from, due_to, occurence, sort, limit, cursor)
+        )
+        if queried:
+            try:
+                items, next_cursor = await list_index.query_items(
+                    db,
+                    item_type,
+                    current_username,
+                    model_class,
+                    completed=completed,
+                    due_from=due_from,
+                    due_to=due_to,
+                    occurence=occurence,
+                    sort=sort or list_index.SORT_DUE,
+                    descending=order == "desc",
+                    limit=limit,
+                    cursor=cursor,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            if next_cursor:
+                headers["X-Next-Cursor"] = next_cursor
+        else:
+            items = await generic_read_user_items(
+                current_username, db, pattern_func, model_class
+            )
+
+        if projection is not None:
+            return JSONResponse(
+                content=[item.model_dump(mode="json", include=projection) for item in items],
+                headers=headers,
+            )
+        response.headers.update(headers)
+        return items
 
     @router.get("/{item_id}", response_model=model_class)
     async def read_item_endpoint(
@@ -103,6 +268,7 @@ def create_crud_router(
         updated_item = await generic_update_item(
             item_id, item_update, current_username, db, key_func, model_class
         )
+        await change_tracker.mark_changed(db, current_username)
 
         if crud_history_type:
             update_details = item_update.model_dump(exclude_unset=True)
@@ -115,6 +281,30 @@ def create_crud_router(
             )
         return updated_item
 
+    @router.post("/{item_id}/complete", response_model=pydantic_models.CompletionResult)
+    async def complete_item_endpoint(
+        item_id: str,
+        completed: bool = Query(True, description="False undoes a completion"),
+        current_username: str = Depends(get_username_dependency),
+        db: redis.Redis = Depends(redis_database.get_redis_connection),
+        pg_db: Session = Depends(pg_database.get_pg_db),
+    ):
+        item, awarded, aura = await generic_complete_item(
+            item_id, completed, current_username, db, key_func, model_class
+        )
+        if awarded and crud_history_type:
+            action = "completed" if completed else "marked incomplete"
+            log_history(
+                db=pg_db,
+                user_id=current_username,
+                history_type=crud_history_type,
+                data=item,
+                comments=f"Item {action}: {item.name}. Aura {awarded:+d}, now {aura}.",
+            )
+        return pydantic_models.CompletionResult(
+            item=item, completed=completed, awarded=awarded, aura=aura
+        )
+
     @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
     async def delete_item_endpoint(
         item_id: str,
@@ -134,5 +324,6 @@ def create_crud_router(
                 comments=f"Item deleted: {item_to_log.name}",
             )
         await generic_delete_item(item_id, current_username, db, key_func, model_class)
+        await change_tracker.mark_changed(db, current_username)
 
     return router
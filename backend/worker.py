@@ -0,0 +1,36 @@
+import logging
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+import asyncio
+import signal
+
+from models.pg_models import Base
+from utils.database.pg_database import engine
+from utils.general.get_env import getenv
+from utils.jobs import handlers  # noqa: F401 registers the job handlers
+from utils.jobs.job_queue import DEFAULT_QUEUE, run_worker
+
+WORKER_QUEUES = [
+    queue.strip()
+    for queue in getenv("WORKER_QUEUES", DEFAULT_QUEUE).split(",")
+    if queue.strip()
+]
+WORKER_CONCURRENCY = int(getenv("WORKER_CONCURRENCY", 2))
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await run_worker(WORKER_QUEUES, WORKER_CONCURRENCY, stop)
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(main())
@@ -6,6 +6,7 @@ import NotesPopup from "@/components/Misc/notesPopup";
 import Dashboard from "@/components/Dashboard";
 import useDashboardStore from "@/store/dashboardStore";
 import { Button } from "@/components/common/button";
+import { useLiveUpdates } from "@/lib/hooks/useLiveUpdates";
 
 export default function Home() {
   const router = useRouter();
@@ -20,6 +21,8 @@ export default function Home() {
     "loading" | "authenticated" | "unauthenticated"
   >("loading");
 
+  useLiveUpdates(authStatus === "authenticated" && !!player);
+
   useEffect(() => {
     const token = localStorage.getItem("accessToken");
     if (token) {
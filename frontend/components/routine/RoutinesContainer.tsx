@@ -38,7 +38,7 @@ const RoutinesContainer = () => {
   const { addEntity: addRoutine, updateEntity: updateRoutine } =
     useRoutineStore();
 
-  const { player, modifyAura } = useDashboardStore();
+  const { player } = useDashboardStore();
   const inputRef = useRef<HTMLInputElement>(null);
 
   const [routineText, setRoutineText] = useState("");
@@ -12,6 +12,7 @@ import { ChecklistItem } from "@/components/common/checklist-item";
 import useRoutineStore from "@/store/routineStore";
 import { BorderBeam } from "@/components/common/border-beam";
 import useDashboardStore from "@/store/dashboardStore";
+import { updateChecklistItemAPI } from "@/lib/utils/apiUtils";
 
 import {
   calculateNextDueDate,
@@ -61,7 +62,6 @@ export const RoutineItem = ({
   onUpdateChecklist?: (checklist: ChecklistItemData[]) => void;
 }) => {
   const currentTheme = useDashboardStore((state) => state.currentTheme);
-  const { updateEntity: updateRoutine } = useRoutineStore();
   const [isCompleted, setIsCompleted] = useState(false);
   const [checklistState, setChecklistState] = useState<ChecklistItemData[]>([]);
   const [showChecklist, setShowChecklist] = useState(false);
@@ -85,17 +85,31 @@ export const RoutineItem = ({
         });
       };
 
+      const previousChecklistState = checklistState;
       const newChecklistState = updateItemRecursively(checklistState);
 
       setChecklistState(newChecklistState);
 
-      updateRoutine(id, { checklist: newChecklistState });
-
-      if (onUpdateChecklist) {
-        onUpdateChecklist(newChecklistState);
-      }
+      // Only the edited item is sent; the server returns the checklist.
+      updateChecklistItemAPI(id, itemId, updates)
+        .then((result) => {
+          useRoutineStore.setState((state) => ({
+            entities: state.entities.map((routine) =>
+              routine.id === id
+                ? { ...routine, checklist: result.checklist }
+                : routine
+            ),
+          }));
+          if (onUpdateChecklist) {
+            onUpdateChecklist(result.checklist);
+          }
+        })
+        .catch((err) => {
+          console.error("Failed to update checklist item:", err);
+          setChecklistState(previousChecklistState);
+        });
     },
-    [checklistState, id, updateRoutine, onUpdateChecklist]
+    [checklistState, id, onUpdateChecklist]
   );
 
   const renderChecklistItems = useCallback(
@@ -15,10 +15,11 @@ export function useHabits() {
     error,
     setError,
     updateEntity: updateHabit,
+    completeEntity: completeHabit,
     deleteEntity: deleteHabit,
   } = useHabitStore();
 
-  const { modifyAura } = useDashboardStore();
+  const { syncAura } = useDashboardStore();
 
   const sortedHabits = useMemo(() => {
     return [...habits].sort((a: Habit, b: Habit) => {
@@ -46,27 +47,9 @@ export function useHabits() {
       return;
     }
 
-    let updatePayload: Partial<Habit>;
-    if (!completed) {
-      updatePayload = { last_completed: habit.start_date };
-    } else {
-      updatePayload = {
-        last_completed: calculateNextDueDate(
-          habit.start_date,
-          habit.occurence,
-          habit.x_occurence
-        ),
-      };
-    }
-
-    const updatedHabit = await updateHabit(habitId, updatePayload);
-
-    if (updatedHabit) {
-      if (!completed) {
-        modifyAura(-habit.aura);
-      } else {
-        modifyAura(habit.aura);
-      }
+    const result = await completeHabit(habitId, completed);
+    if (result && result.aura !== null) {
+      syncAura(result.aura);
     }
   };
 
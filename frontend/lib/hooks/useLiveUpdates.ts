@@ -0,0 +1,96 @@
+import { useEffect } from "react";
+import useDashboardStore from "@/store/dashboardStore";
+import { API_BASE, CLIENT_ID, getAuthToken } from "@/lib/utils/authUtils";
+import { syncChangesAPI } from "@/lib/utils/apiUtils";
+
+const REFRESH_DELAY_MS = 500;
+
+// Applies changes made elsewhere (another tab, the AI chat or a scheduled
+// job) as a delta from /sync. Changes this tab made itself only move the
+// cursor forward, since the store already holds them. The browser
+// reconnects on its own and resumes from the last event it saw.
+export function useLiveUpdates(enabled: boolean) {
+  const fetchPlayer = useDashboardStore((state) => state.fetchPlayer);
+  const applySync = useDashboardStore((state) => state.applySync);
+
+  useEffect(() => {
+    const token = getAuthToken();
+    if (!enabled || !token || typeof EventSource === "undefined") {
+      return;
+    }
+
+    let cursor: number | null = null;
+    let pendingForeign = false;
+    let refreshTimer: ReturnType<typeof setTimeout> | null = null;
+
+    const refresh = async () => {
+      refreshTimer = null;
+      if (cursor === null) {
+        fetchPlayer();
+        pendingForeign = false;
+        return;
+      }
+      try {
+        const sync = await syncChangesAPI(cursor);
+        applySync(sync);
+        cursor = sync.version;
+        pendingForeign = false;
+      } catch (err) {
+        console.error("Failed to sync changes:", err);
+      }
+    };
+
+    const scheduleRefresh = () => {
+      pendingForeign = true;
+      if (refreshTimer) {
+        clearTimeout(refreshTimer);
+      }
+      refreshTimer = setTimeout(refresh, REFRESH_DELAY_MS);
+    };
+
+    const readVersion = (event: Event): number | null => {
+      try {
+        return JSON.parse((event as MessageEvent).data).version ?? null;
+      } catch {
+        return null;
+      }
+    };
+
+    const onReady = (event: Event) => {
+      cursor = readVersion(event);
+    };
+
+    const onChange = (event: Event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      if (data.origin === CLIENT_ID && !pendingForeign && cursor !== null) {
+        cursor = Math.max(cursor, data.version);
+        return;
+      }
+      scheduleRefresh();
+    };
+
+    const onResync = (event: Event) => {
+      if (refreshTimer) {
+        clearTimeout(refreshTimer);
+        refreshTimer = null;
+      }
+      pendingForeign = false;
+      cursor = readVersion(event);
+      fetchPlayer();
+    };
+
+    const source = new EventSource(
+      `${API_BASE}/events?token=${encodeURIComponent(token)}`
+    );
+    source.addEventListener("ready", onReady);
+    source.addEventListener("change", onChange);
+    source.addEventListener("resync", onResync);
+
+    return () => {
+      if (refreshTimer) {
+        clearTimeout(refreshTimer);
+      }
+      source.close();
+    };
+  }, [enabled, fetchPlayer, applySync]);
+}
@@ -16,10 +16,11 @@ export function useRoutines() {
     error,
     setError,
     updateEntity: updateRoutine,
+    completeEntity: completeRoutine,
     deleteEntity: deleteRoutine,
   } = useRoutineStore();
 
-  const { modifyAura } = useDashboardStore();
+  const { syncAura } = useDashboardStore();
 
   const sortedRoutines = useMemo(() => {
     return [...routines].sort((a: Routine, b: Routine) => {
@@ -47,27 +48,9 @@ export function useRoutines() {
       return;
     }
 
-    let updatePayload: Partial<Routine>;
-    if (!completed) {
-      updatePayload = { last_completed: routine.start_date };
-    } else {
-      updatePayload = {
-        last_completed: calculateNextDueDate(
-          routine.start_date,
-          routine.occurence,
-          routine.x_occurence
-        ),
-      };
-    }
-
-    const updatedRoutine = await updateRoutine(routineId, updatePayload);
-
-    if (updatedRoutine) {
-      if (!completed) {
-        modifyAura(-routine.aura);
-      } else {
-        modifyAura(routine.aura);
-      }
+    const result = await completeRoutine(routineId, completed);
+    if (result && result.aura !== null) {
+      syncAura(result.aura);
     }
   };
 
@@ -11,10 +11,11 @@ export function useTasks() {
     error,
     setError,
     updateEntity: updateTask,
+    completeEntity: completeTask,
     deleteEntity: deleteTask,
   } = useTaskStore();
 
-  const { modifyAura } = useDashboardStore();
+  const { syncAura } = useDashboardStore();
 
   const sortedTasks = useMemo(() => {
     return [...tasks].sort((a: Task, b: Task) => {
@@ -43,17 +44,9 @@ export function useTasks() {
       return;
     }
 
-    const newCompletedState = !task.completed;
-    const updatedTask = await updateTask(taskId, {
-      completed: newCompletedState,
-    });
-
-    if (updatedTask) {
-      if (newCompletedState) {
-        modifyAura(task.aura);
-      } else {
-        modifyAura(-task.aura);
-      }
+    const result = await completeTask(taskId, !task.completed);
+    if (result && result.aura !== null) {
+      syncAura(result.aura);
     }
   };
 
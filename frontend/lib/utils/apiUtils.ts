@@ -1,9 +1,11 @@
 import {
   Player,
   PlayerFullInfo,
+  SyncResponse,
   ChatHistoryEntry,
   VaultData,
   CategorizedTransaction,
+  ChecklistItemData,
 } from "./interfaces";
 import {
   API_BASE,
@@ -73,6 +75,11 @@ export const fetchPlayerFullInfoAPI = async (): Promise<PlayerFullInfo> => {
   return fullInfo;
 };
 
+export const syncChangesAPI = async (since: number): Promise<SyncResponse> => {
+  const response = await fetchWithAuth(`${API_BASE}/sync?since=${since}`);
+  return await handleResponse<SyncResponse>(response);
+};
+
 export const updatePlayer = async (
   player: Partial<Player>
 ): Promise<Player> => {
@@ -112,6 +119,47 @@ export const updateEntityAPI = async <T>(
   return await handleResponse<T>(response);
 };
 
+export const completeEntityAPI = async <T>(
+  entity: string,
+  id: string,
+  completed: boolean
+): Promise<{ item: T; completed: boolean; awarded: number; aura: number | null }> => {
+  const response = await fetchWithAuth(
+    `${API_BASE}/${entity}/${id}/complete?completed=${completed}`,
+    { method: "POST" }
+  );
+  return await handleResponse<{
+    item: T;
+    completed: boolean;
+    awarded: number;
+    aura: number | null;
+  }>(response);
+};
+
+export interface ChecklistResult {
+  routine_id: string;
+  node: ChecklistItemData | null;
+  checklist: ChecklistItemData[];
+}
+
+export const updateChecklistItemAPI = async (
+  routineId: string,
+  itemId: string,
+  updates: Partial<Pick<ChecklistItemData, "text" | "completed">>
+): Promise<ChecklistResult> => {
+  const response = await fetchWithAuth(
+    `${API_BASE}/routines/${routineId}/checklist/${itemId}`,
+    {
+      method: "PATCH",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(updates),
+    }
+  );
+  return await handleResponse<ChecklistResult>(response);
+};
+
 export const deleteEntityAPI = async (
   entity: string,
   id: string
@@ -1,5 +1,12 @@
 export const API_BASE = process.env.NEXT_PUBLIC_API_BASE_URL;
 
+// Identifies this tab on every write, so change events it caused itself
+// can be told apart from changes made elsewhere.
+export const CLIENT_ID =
+  typeof crypto !== "undefined" && typeof crypto.randomUUID === "function"
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 export const getAuthToken = (): string | null => {
   if (typeof window !== "undefined") {
     return localStorage.getItem("accessToken");
@@ -16,6 +23,7 @@ export const fetchWithAuth = async (
   if (token) {
     headers.append("Authorization", `Bearer ${token}`);
   }
+  headers.set("X-Client-Id", CLIENT_ID);
 
   if (options.body && !headers.has("Content-Type")) {
     headers.append("Content-Type", "application/json");
@@ -166,6 +166,21 @@ export function stringToChecklist(str: string): ChecklistItemData[] {
   return JSON.parse(fixSingleQuotedJson(str));
 }
 
+// Checklists arrive as arrays; routines stored before they were structured
+// may still hold a JSON (or Python repr) string.
+export function parseChecklist(value: unknown): ChecklistItemData[] {
+  if (Array.isArray(value)) return value;
+  if (typeof value === "string" && value.trim()) {
+    try {
+      const parsed = stringToChecklist(value);
+      return Array.isArray(parsed) ? parsed : [];
+    } catch (e) {
+      console.error("Failed to parse checklist:", e);
+    }
+  }
+  return [];
+}
+
 export function checklistToString(checklist: ChecklistItemData[]): string {
   return JSON.stringify(checklist);
 }
@@ -64,6 +64,12 @@ export interface PlayerFullInfo {
   routines: Routine[];
 }
 
+export interface SyncResponse extends PlayerFullInfo {
+  version: number;
+  full: boolean;
+  deleted: { type: string; id: string }[];
+}
+
 export interface Routine {
   id?: string;
   name: string;
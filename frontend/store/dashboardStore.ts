@@ -1,11 +1,14 @@
 import { create, StateCreator } from "zustand";
-import { Player, PlayerFullInfo } from "@/lib/utils/interfaces";
+import { Player, PlayerFullInfo, SyncResponse } from "@/lib/utils/interfaces";
 import { ColorTheme, defaultTheme } from "@/lib/utils/colors";
-import { fetchPlayerFullInfoAPI, updatePlayer } from "@/lib/utils/apiUtils";
+import {
+  fetchPlayerFullInfoAPI,
+  updatePlayer,
+} from "@/lib/utils/apiUtils";
 import useTaskStore from "./taskStore";
 import useHabitStore from "./habitStore";
 import useRoutineStore from "./routineStore";
-import { stringToChecklist } from "@/lib/utils/commonUtils";
+import { parseChecklist } from "@/lib/utils/commonUtils";
 
 interface DashboardState {
   activeTab: string;
@@ -16,7 +19,8 @@ interface DashboardState {
 
   setActiveTab: (tab: string) => void;
   fetchPlayer: () => void;
-  modifyAura: (amount: number) => void;
+  applySync: (sync: SyncResponse) => void;
+  syncAura: (aura: number) => void;
   setCurrentTheme: (theme: ColorTheme) => void;
 }
 
@@ -35,7 +39,7 @@ const dashboardStoreCreator: StateCreator<DashboardState> = (set, get) => ({
       var fullPlayerData: PlayerFullInfo = await fetchPlayerFullInfoAPI();
       fullPlayerData.routines = fullPlayerData.routines.map((routine) => ({
         ...routine,
-        checklist: stringToChecklist(routine.checklist.toString()),
+        checklist: parseChecklist(routine.checklist),
       }));
       set({
         player: fullPlayerData.player,
@@ -56,30 +60,60 @@ const dashboardStoreCreator: StateCreator<DashboardState> = (set, get) => ({
     }
   },
 
+  applySync: (sync) => {
+    const routines = sync.routines.map((routine) => ({
+      ...routine,
+      checklist: parseChecklist(routine.checklist),
+    }));
+    set({ player: sync.player });
+    if (sync.full) {
+      useHabitStore.getState().setEntities(sync.habits);
+      useTaskStore.getState().setEntities(sync.tasks);
+      useRoutineStore.getState().setEntities(routines);
+      return;
+    }
+    const merge = <T extends { id?: string }>(
+      current: T[],
+      changed: T[],
+      type: string
+    ): T[] => {
+      const removed = new Set(
+        sync.deleted.filter((t) => t.type === type).map((t) => t.id)
+      );
+      const byId = new Map(changed.map((entity) => [entity.id, entity]));
+      const merged = current
+        .filter((entity) => !removed.has(entity.id ?? ""))
+        .map((entity) => byId.get(entity.id) ?? entity);
+      const known = new Set(current.map((entity) => entity.id));
+      return merged.concat(changed.filter((entity) => !known.has(entity.id)));
+    };
+    const habitStore = useHabitStore.getState();
+    habitStore.setEntities(merge(habitStore.entities, sync.habits, "habit"));
+    const taskStore = useTaskStore.getState();
+    taskStore.setEntities(merge(taskStore.entities, sync.tasks, "task"));
+    const routineStore = useRoutineStore.getState();
+    routineStore.setEntities(merge(routineStore.entities, routines, "routine"));
+  },
+
   setCurrentTheme: (theme) => set({ currentTheme: theme }),
 
-  modifyAura: async (amount) => {
+  syncAura: async (aura) => {
     const currentPlayer = get().player;
     if (!currentPlayer || !currentPlayer.username) return;
 
-    const newAura = currentPlayer.aura + amount;
-    let newPlayer: Partial<Player> = {
-      aura: newAura,
-    };
-    if (newAura >= currentPlayer.level * 100) {
+    let newPlayer: Partial<Player> = { aura };
+    if (aura >= currentPlayer.level * 100) {
       const newLevel = currentPlayer.level + 1;
-      newPlayer = {
-        ...newPlayer,
+      const levelUpdate = {
         level: newLevel,
         description: " You are now level " + newLevel,
       };
-      set({
-        player: { ...currentPlayer, ...newPlayer },
-      });
+      newPlayer = { ...newPlayer, ...levelUpdate };
+      set({ player: { ...currentPlayer, ...newPlayer } });
+      await updatePlayer(levelUpdate);
     } else {
       set({ player: { ...currentPlayer, ...newPlayer } });
     }
-    await updatePlayer({ ...newPlayer });
   },
 });
 
@@ -3,6 +3,7 @@ import { persist, createJSONStorage, PersistOptions } from "zustand/middleware";
 import { toast } from "sonner";
 import {
   addEntityAPI,
+  completeEntityAPI,
   deleteEntityAPI,
   updateEntityAPI,
 } from "@/lib/utils/apiUtils";
@@ -30,6 +31,10 @@ export interface GenericState<T extends Entity> {
     entityUpdate: EntityUpdatePayload<T>
   ) => Promise<T | null>;
   deleteEntity: (id: string) => Promise<boolean>;
+  completeEntity: (
+    id: string,
+    completed: boolean
+  ) => Promise<{ entity: T; aura: number | null } | null>;
 
   [key: string]: any;
 }
@@ -150,6 +155,45 @@ export function createGenericStoreSlice<T extends Entity>(
       }
     },
 
+    completeEntity: async (id, completed) => {
+      if (!id) {
+        const errorMsg = `ID is required to complete ${entityNamePlural}.`;
+        console.error(`completeEntity (${entityNamePlural}) called without ID.`);
+        toast.error(errorMsg);
+
+        return null;
+      }
+      set({ isLoading: true });
+      try {
+        const result = await completeEntityAPI<any>(
+          entityNamePlural,
+          id,
+          completed
+        );
+        const completedEntity = transformResponseFromApi(result.item);
+
+        set((state) => ({
+          entities: state.entities.map((e) =>
+            e.id === id ? { ...e, ...completedEntity } : e
+          ),
+          isLoading: false,
+          error: null,
+        }));
+        return { entity: completedEntity, aura: result.aura };
+      } catch (err) {
+        console.error(`Failed to complete ${entityNamePlural}:`, err);
+        const errorMsg =
+          err instanceof Error ? err.message : "An unknown error occurred";
+        const finalErrorMsg = `Failed to complete ${entityNamePlural.slice(
+          0,
+          -1
+        )}: ${errorMsg}`;
+        set({ error: finalErrorMsg, isLoading: false });
+        toast.error(finalErrorMsg);
+        return null;
+      }
+    },
+
     deleteEntity: async (id) => {
       if (!id) {
         const errorMsg = `ID is required to delete ${entityNamePlural}.`;
@@ -2,8 +2,7 @@ import { Routine, ChecklistItemData } from "@/lib/utils/interfaces";
 import {
   getAuraValue,
   formatDateToDDMMYY,
-  checklistToString,
-  stringToChecklist,
+  parseChecklist,
 } from "@/lib/utils/commonUtils";
 import { createGenericPersistedStore, GenericState } from "./genericStore";
 
@@ -14,35 +13,17 @@ const useRoutineStore = createGenericPersistedStore<Routine>(
     entityNamePlural: "routines",
     persistenceName: "Routine-storage",
 
-    transformPayloadForApi: (payload) => {
-      if (payload.checklist && Array.isArray(payload.checklist)) {
-        return { ...payload, checklist: checklistToString(payload.checklist) };
-      }
-      return payload;
-    },
     transformResponseFromApi: (response) => {
-      if (response.checklist && typeof response.checklist === "string") {
-        return {
-          ...response,
-          checklist: stringToChecklist(response.checklist),
-        };
-      }
-
-      if (!Array.isArray(response.checklist)) {
-        response.checklist = [];
-      }
-      return response as Routine;
+      return {
+        ...response,
+        checklist: parseChecklist(response.checklist),
+      } as Routine;
     },
     transformOnHydrate: (persistedEntities) => {
       if (!Array.isArray(persistedEntities)) return [];
       return persistedEntities.map((r: any) => ({
         ...r,
-        checklist:
-          typeof r.checklist === "string"
-            ? stringToChecklist(r.checklist)
-            : Array.isArray(r.checklist)
-            ? r.checklist
-            : [],
+        checklist: parseChecklist(r.checklist),
 
         start_date: r.start_date,
         last_completed: r.last_completed,